@@ -0,0 +1,74 @@
+from search import PlacementSearch
+
+# Признаки линейной оценки, в порядке весов
+FEATURES = ("lines", "aggregate_height", "holes", "bumpiness", "wells", "row_transitions")
+DEFAULT_WEIGHTS = (0.76, -0.51, -0.36, -0.18, 0.0, 0.0)
+# Таблица положений очищается, когда становится больше этого размера
+TABLE_LIMIT = 50000
+
+
+def evaluate_features(weights, features, lines):
+    """
+    Линейная оценка доски по ее признакам.
+
+    :param weights: One weight per name in ``FEATURES``.
+    :type weights: tuple[float]
+    :param features: Features of the board.
+    :type features: Features
+    :param lines: Lines cleared to reach the board.
+    :type lines: int
+    :returns: The weighted sum, higher is better.
+    :rtype: float
+    """
+    return (weights[0] * lines + weights[1] * features.aggregate_height + weights[2] * features.holes +
+            weights[3] * features.bumpiness + weights[4] * features.wells +
+            weights[5] * features.row_transitions)
+
+
+class HeuristicAgent:
+    """
+    Агент, выбирающий положение блока по линейной оценке признаков доски.
+
+    Агент вызывается один раз на блок и возвращает ходы до выбранного
+    положения; фиксирует блок вызывающий код (см. :func:`tournament.play_game`).
+
+    :param weights: One weight per name in ``FEATURES``.
+    :type weights: tuple[float]
+    :param depth: 1 to place the current block only, 2 to also look at the next one.
+    :type depth: int
+    :ivar search: The placement search with its transposition table.
+    :vartype search: PlacementSearch
+    """
+    def __init__(self, weights=DEFAULT_WEIGHTS, depth=1):
+        if len(weights) != len(FEATURES):
+            raise ValueError(f"expected {len(FEATURES)} weights, got {len(weights)}")
+        self.weights = tuple(weights)
+        self.depth = depth
+        self.search = PlacementSearch()
+
+    def evaluate(self, grid, lines):
+        """
+        Оценка доски после размещения блока.
+
+        :param grid: The board after placement.
+        :type grid: Grid
+        :param lines: Lines cleared by the placements.
+        :type lines: int
+        :returns: The board value.
+        :rtype: float
+        """
+        return evaluate_features(self.weights, grid.features(), lines)
+
+    def __call__(self, game):
+        """
+        Ходы текущего блока до лучшего положения.
+
+        :param game: The game to play.
+        :type game: Game
+        :returns: Moves from ``controls``, empty if the block has no placement.
+        :rtype: tuple[str]
+        """
+        if len(self.search.table) > TABLE_LIMIT:
+            self.search.table.clear()
+        value, line = self.search.best(game, self.evaluate, self.depth)
+        return line[0].path if line else ()
@@ -0,0 +1,117 @@
+import copy
+
+import numpy as np
+
+from grid import BitGrid
+
+
+class ArrayGrid(BitGrid):
+    """
+    Сетка :class:`BitGrid`, цвета ячеек которой хранятся в одном массиве NumPy.
+
+    Массив ``grid`` создается один раз и меняется только на месте, поэтому
+    его представления (см. :meth:`view`) всегда показывают текущую доску без
+    копирования.
+
+    :ivar grid: Cell colors, shape (num_rows, num_cols), dtype uint8.
+    :vartype grid: numpy.ndarray
+    """
+    def __init__(self, num_rows=20, num_cols=10, cell_size=30):
+        super().__init__(num_rows, num_cols, cell_size)
+        self.grid = np.zeros((self.num_rows, self.num_cols), dtype=np.uint8)
+
+    def view(self):
+        """
+        Представление цветов ячеек только для чтения, без копирования.
+
+        :returns: An array sharing memory with ``grid``.
+        :rtype: numpy.ndarray
+        """
+        view = self.grid.view()
+        view.flags.writeable = False
+        return view
+
+    def remove_rows(self, cleared):
+        """
+        Удаление рядов сдвигом массива на месте
+
+        :param cleared: Indices of the rows to remove, in ascending order.
+        :type cleared: list[int]
+        :returns: None
+        :rtype: None
+        """
+        keep = np.ones(self.num_rows, dtype=bool)
+        keep[cleared] = False
+        count = len(cleared)
+        self.grid[count:] = self.grid[keep]
+        self.grid[:count] = 0
+
+    def clear_row(self, row):
+        """
+        Очищение ряда в сетке
+
+        :param row: The row index to clear.
+        :type row: int
+        :returns: None
+        :rtype: None
+        """
+        self.rows[row] = 0
+        self.grid[row] = 0
+        self.recompute_features()
+
+    def move_row_down(self, row, num_rows):
+        """
+        Перемещение рядов и расположенных над ним, на указанное количество рядов
+
+        :param row: The row index to start the movement.
+        :type row: int
+        :param num_rows: The number of rows to move down.
+        :type num_rows: int
+        :returns: None
+        :rtype: None
+        """
+        self.rows[row + num_rows] = self.rows[row]
+        self.grid[row + num_rows] = self.grid[row]
+        self.rows[row] = 0
+        self.grid[row] = 0
+        self.recompute_features()
+
+    def restore(self, state):
+        """
+        Восстановление сетки из снимка с записью цветов в тот же массив
+
+        :param state: A value returned by :meth:`snapshot`.
+        :type state: tuple
+        :returns: None
+        :rtype: None
+        """
+        cells = self.grid
+        super().restore(state)
+        cells[:] = self.grid
+        self.grid = cells
+
+    def reset(self):
+        """
+        Сбросить сетку, установив для всех ячеек значение "empty" (0)
+
+        :returns: None
+        :rtype: None
+        """
+        self.grid.fill(0)
+        self.rows = [0] * self.num_rows
+        self.recompute_features()
+
+    def copy(self):
+        """
+        Независимая копия сетки
+
+        :returns: A grid with the same cells that can be changed separately.
+        :rtype: ArrayGrid
+        """
+        clone = copy.copy(self)
+        clone.grid = self.grid.copy()
+        clone.rows = self.rows[:]
+        clone.heights = self.heights[:]
+        clone.transitions = self.transitions[:]
+        clone.contents = self.contents[:]
+        return clone
@@ -0,0 +1,164 @@
+import logging
+import threading
+from time import perf_counter
+
+import pygame
+
+# Небольшой буфер микшера: звук запаздывает примерно на BUFFER / FREQUENCY секунд
+FREQUENCY = 44100
+BUFFER = 256
+# Каналы, зарезервированные под звуки эффектов
+EFFECT_CHANNELS = 4
+SOUNDS = {"rotate": "Sounds/rotate.ogg", "clear": "Sounds/clear.ogg"}
+MUSIC = "Sounds/music.ogg"
+
+log = logging.getLogger(__name__)
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def pre_init():
+    """
+    Настройка микшера до его инициализации: маленький буфер для малой задержки.
+
+    :returns: None
+    :rtype: None
+    """
+    pygame.mixer.pre_init(FREQUENCY, -16, 2, BUFFER)
+
+
+def load_sounds(sounds=SOUNDS):
+    """
+    Декодирование звуков эффектов; уже загруженные берутся из кеша.
+
+    :param sounds: Files by sound name.
+    :type sounds: dict[str, str]
+    :returns: The sounds by name.
+    :rtype: dict[str, pygame.mixer.Sound]
+    """
+    with _cache_lock:
+        for name, path in sounds.items():
+            if path not in _cache:
+                _cache[path] = pygame.mixer.Sound(path)
+        return {name: _cache[path] for name, path in sounds.items()}
+
+
+class Audio:
+    """
+    Звуковое сопровождение игры, подключаемое к событиям :class:`Game`.
+
+    Звуки эффектов декодируются в фоновом потоке, поэтому создание не
+    задерживает первый кадр; пока звук не готов, он просто не играет.
+    Эффекты играют на зарезервированных каналах по кругу и не ждут
+    свободного канала, а музыка читается потоком при :meth:`start_music`.
+    Если звуковое устройство недоступно, все методы ничего не делают; если
+    звуки не удалось загрузить, ошибка записывается в журнал, а эффекты не играют.
+
+    :param background: Decode the sounds on a background thread.
+    :type background: bool
+    :ivar sounds: Decoded sounds by name, filled by the loader.
+    :vartype sounds: dict[str, pygame.mixer.Sound]
+    :ivar ready: Set when the loader has finished, even if it failed.
+    :vartype ready: threading.Event
+    :ivar load_time: Seconds spent decoding the sounds, None until ``ready`` or if loading failed.
+    :vartype load_time: float or None
+    :ivar enabled: False if the mixer could not be initialized.
+    :vartype enabled: bool
+    """
+    def __init__(self, background=True):
+        self.sounds = {}
+        self.ready = threading.Event()
+        self.load_time = None
+        self.channels = []
+        self.next_channel = 0
+        self.music_started = False
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+        except pygame.error:
+            self.enabled = False
+            self.ready.set()
+            return
+        self.enabled = True
+        pygame.mixer.set_reserved(EFFECT_CHANNELS)
+        self.channels = [pygame.mixer.Channel(index) for index in range(EFFECT_CHANNELS)]
+        if background:
+            threading.Thread(target=self.load, name="sound-loader", daemon=True).start()
+        else:
+            self.load()
+
+    def load(self):
+        """
+        Загрузка звуков эффектов.
+
+        :returns: None
+        :rtype: None
+        """
+        start = perf_counter()
+        try:
+            self.sounds = load_sounds()
+            self.load_time = perf_counter() - start
+        except (pygame.error, OSError):
+            log.exception("could not load the sound effects")
+        finally:
+            self.ready.set()
+
+    def buffer_latency(self):
+        """
+        Задержка вывода звука, заданная размером буфера микшера.
+
+        Это расчетная величина ``BUFFER`` / частота микшера, а не измеренная:
+        задержку драйвера и устройства pygame узнать не позволяет.
+
+        :returns: Seconds, 0 if audio is disabled.
+        :rtype: float
+        """
+        if not self.enabled:
+            return 0.0
+        frequency = pygame.mixer.get_init()[0]
+        return BUFFER / frequency
+
+    def play(self, name):
+        """
+        Проигрывание эффекта на следующем канале пула.
+
+        :param name: The sound name, a key of ``SOUNDS``.
+        :type name: str
+        :returns: None
+        :rtype: None
+        """
+        sound = self.sounds.get(name)
+        if sound is None:
+            return
+        channel = self.channels[self.next_channel]
+        self.next_channel = (self.next_channel + 1) % len(self.channels)
+        channel.play(sound)
+
+    def start_music(self):
+        """
+        Запуск фоновой музыки; файл не декодируется целиком, а читается при проигрывании.
+
+        :returns: None
+        :rtype: None
+        """
+        if not self.enabled or self.music_started:
+            return
+        self.music_started = True
+        pygame.mixer.music.load(MUSIC)
+        pygame.mixer.music.play(-1)
+
+    def attach(self, game):
+        """
+        Подписка звуков на события игры.
+
+        Музыка не запускается здесь, чтобы не задерживать первый кадр; ее
+        включает :meth:`start_music`.
+
+        :param game: The game to play sounds for.
+        :type game: Game
+        :returns: None
+        :rtype: None
+        """
+        game.subscribe("rotate", lambda: self.play("rotate"))
+        game.subscribe("clear", lambda rows_cleared: self.play("clear"))
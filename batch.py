@@ -0,0 +1,274 @@
+import numpy as np
+from block import SPAWN_COLUMN, default_spawn_column
+from blocks import BLOCKS
+
+NOOP, LEFT, RIGHT, ROTATE, DOWN = range(5)
+
+# Очки за 0-4 удаленных ряда, как в Game.update_score
+LINE_SCORES = np.array([0, 100, 300, 500, 0], dtype=np.int64)
+
+
+def _build_tables():
+    """
+    Построение таблиц форм, индексируемых id блока, из классов blocks.py.
+
+    :returns: Cell offsets of shape (8, 4, 4, 2), rotation counts and spawn offsets.
+    :rtype: tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]
+    """
+    cells = np.zeros((8, 4, 4, 2), dtype=np.int64)
+    rotations = np.ones(8, dtype=np.int64)
+    spawn = np.zeros((8, 2), dtype=np.int64)
+    for block_class in BLOCKS:
+        block = block_class()
+        rotations[block.id] = len(block.shapes)
+        spawn[block.id] = block.row_offset, block.column_offset
+        for rotation in range(4):
+            cells[block.id, rotation] = block.shapes[rotation % len(block.shapes)].offsets
+    return cells, rotations, spawn
+
+
+CELLS, ROTATIONS, SPAWN = _build_tables()
+
+
+class BatchGame:
+    """
+    N независимых игр, которые обновляются одновременно векторными операциями NumPy.
+
+    Правила совпадают с :class:`Game`: смещения и вращение без отскоков,
+    фиксация блока при невозможности сдвинуть его вниз, удаление рядов
+    (кроме верхнего) и подсчет очков как в :meth:`Game.update_score`.
+
+    :param num_games: The number of boards in the batch.
+    :type num_games: int
+    :param seed: Seed for the per-board 7-bag randomizers.
+    :type seed: int or None
+    :param num_rows: The number of rows of every board.
+    :type num_rows: int
+    :param num_cols: The number of columns of every board.
+    :type num_cols: int
+    :ivar boards: Cell colors of all boards, shape (N, rows, cols).
+    :vartype boards: numpy.ndarray
+    :ivar kind: Id of the falling block on every board.
+    :vartype kind: numpy.ndarray
+    :ivar rotation: Rotation state of the falling block.
+    :vartype rotation: numpy.ndarray
+    :ivar row: Row offset of the falling block.
+    :vartype row: numpy.ndarray
+    :ivar column: Column offset of the falling block.
+    :vartype column: numpy.ndarray
+    :ivar next_kind: Id of the next block on every board.
+    :vartype next_kind: numpy.ndarray
+    :ivar score: Score of every board.
+    :vartype score: numpy.ndarray
+    :ivar game_over: Game over flag of every board.
+    :vartype game_over: numpy.ndarray
+    """
+    def __init__(self, num_games, seed=None, num_rows=20, num_cols=10):
+        self.num_games = num_games
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        # блоки появляются по центру доски, как в Game
+        self.spawn_shift = default_spawn_column(num_cols) - SPAWN_COLUMN
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros((num_games, num_rows, num_cols), dtype=np.uint8)
+        self.kind = np.zeros(num_games, dtype=np.int64)
+        self.rotation = np.zeros(num_games, dtype=np.int64)
+        self.row = np.zeros(num_games, dtype=np.int64)
+        self.column = np.zeros(num_games, dtype=np.int64)
+        self.next_kind = np.zeros(num_games, dtype=np.int64)
+        self.score = np.zeros(num_games, dtype=np.int64)
+        self.game_over = np.zeros(num_games, dtype=bool)
+        self.bags = np.zeros((num_games, 7), dtype=np.int64)
+        self.bag_position = np.full(num_games, 7, dtype=np.int64)
+        self.reset()
+
+    def reset(self, indices=None):
+        """
+        Сброс выбранных досок к начальному состоянию.
+
+        :param indices: Boards to reset, all boards by default.
+        :type indices: numpy.ndarray or None
+        :returns: None
+        :rtype: None
+        """
+        if indices is None:
+            indices = np.arange(self.num_games)
+        indices = np.asarray(indices)
+        self.boards[indices] = 0
+        self.score[indices] = 0
+        self.game_over[indices] = False
+        self.bag_position[indices] = 7
+        self._spawn(indices, self._draw(indices))
+        self.next_kind[indices] = self._draw(indices)
+
+    def observation(self):
+        """
+        Доски всех игр без копирования.
+
+        :returns: The ``boards`` array itself, shape (N, rows, cols).
+        :rtype: numpy.ndarray
+        """
+        return self.boards
+
+    def _draw(self, indices):
+        """
+        Выдача следующего блока из 7-мешка каждой выбранной доски.
+
+        :param indices: Boards to draw a block for.
+        :type indices: numpy.ndarray
+        :returns: Block ids drawn for every board.
+        :rtype: numpy.ndarray
+        """
+        empty = indices[self.bag_position[indices] == 7]
+        if len(empty):
+            ids = np.tile(np.arange(1, 8), (len(empty), 1))
+            self.bags[empty] = self.rng.permuted(ids, axis=1)
+            self.bag_position[empty] = 0
+        kinds = self.bags[indices, self.bag_position[indices]]
+        self.bag_position[indices] += 1
+        return kinds
+
+    def _spawn(self, indices, kinds):
+        """
+        Размещение новых блоков в начальной позиции.
+
+        :param indices: Boards that receive a new block.
+        :type indices: numpy.ndarray
+        :param kinds: Ids of the new blocks.
+        :type kinds: numpy.ndarray
+        :returns: None
+        :rtype: None
+        """
+        self.kind[indices] = kinds
+        self.rotation[indices] = 0
+        self.row[indices] = SPAWN[kinds, 0]
+        self.column[indices] = SPAWN[kinds, 1] + self.spawn_shift
+
+    def fits(self, indices, rotation, row, column):
+        """
+        Проверка, помещаются ли блоки выбранных досок в заданную позицию.
+
+        :param indices: Boards to check.
+        :type indices: numpy.ndarray
+        :param rotation: Candidate rotation state per board.
+        :type rotation: numpy.ndarray
+        :param row: Candidate row offset per board.
+        :type row: numpy.ndarray
+        :param column: Candidate column offset per board.
+        :type column: numpy.ndarray
+        :returns: Boolean array, True where the placement is inside and empty.
+        :rtype: numpy.ndarray
+        """
+        cells = CELLS[self.kind[indices], rotation]
+        rows = cells[:, :, 0] + row[:, None]
+        columns = cells[:, :, 1] + column[:, None]
+        inside = ((rows >= 0) & (rows < self.num_rows) & (columns >= 0) & (columns < self.num_cols)).all(axis=1)
+        values = self.boards[indices[:, None], np.clip(rows, 0, self.num_rows - 1),
+                             np.clip(columns, 0, self.num_cols - 1)]
+        return inside & (values == 0).all(axis=1)
+
+    def _shift(self, indices, columns):
+        """
+        Сдвиг блоков по горизонтали, если новая позиция свободна.
+
+        :param indices: Boards to move.
+        :type indices: numpy.ndarray
+        :param columns: The number of columns to move by.
+        :type columns: int
+        :returns: None
+        :rtype: None
+        """
+        column = self.column[indices] + columns
+        ok = self.fits(indices, self.rotation[indices], self.row[indices], column)
+        self.column[indices[ok]] = column[ok]
+
+    def _rotate(self, indices):
+        """
+        Вращение блоков по часовой стрелке, если новая позиция свободна.
+
+        :param indices: Boards to rotate.
+        :type indices: numpy.ndarray
+        :returns: None
+        :rtype: None
+        """
+        rotation = (self.rotation[indices] + 1) % ROTATIONS[self.kind[indices]]
+        ok = self.fits(indices, rotation, self.row[indices], self.column[indices])
+        self.rotation[indices[ok]] = rotation[ok]
+
+    def _move_down(self, indices, lines):
+        """
+        Перемещение блоков вниз и фиксация тех, что уже не могут опуститься.
+
+        :param indices: Boards to move.
+        :type indices: numpy.ndarray
+        :param lines: Per-board counter of cleared lines, updated in place.
+        :type lines: numpy.ndarray
+        :returns: None
+        :rtype: None
+        """
+        row = self.row[indices] + 1
+        ok = self.fits(indices, self.rotation[indices], row, self.column[indices])
+        self.row[indices[ok]] = row[ok]
+        locked = indices[~ok]
+        if len(locked):
+            lines[locked] += self._lock(locked)
+
+    def _lock(self, indices):
+        """
+        Фиксация блоков, удаление заполненных рядов и выдача следующих блоков.
+
+        :param indices: Boards whose blocks are locked.
+        :type indices: numpy.ndarray
+        :returns: The number of rows cleared on every board.
+        :rtype: numpy.ndarray
+        """
+        kinds = self.kind[indices]
+        cells = CELLS[kinds, self.rotation[indices]]
+        rows = cells[:, :, 0] + self.row[indices, None]
+        columns = cells[:, :, 1] + self.column[indices, None]
+        self.boards[indices[:, None], rows, columns] = kinds[:, None]
+
+        full = (self.boards[indices] != 0).all(axis=2)
+        full[:, 0] = False  # ряд 0 не проверяется, как и в Grid.clear_full_rows
+        cleared = full.sum(axis=1)
+        rows_cleared = cleared > 0
+        if rows_cleared.any():
+            boards = indices[rows_cleared]
+            full = full[rows_cleared]
+            # полные ряды поднимаются наверх и обнуляются, остальные сохраняют порядок
+            order = np.argsort(~full, axis=1, kind="stable")
+            shifted = np.take_along_axis(self.boards[boards], order[:, :, None], axis=1)
+            shifted[np.arange(self.num_rows)[None, :] < cleared[rows_cleared][:, None]] = 0
+            self.boards[boards] = shifted
+        self.score[indices] += LINE_SCORES[cleared]
+
+        self._spawn(indices, self.next_kind[indices])
+        self.next_kind[indices] = self._draw(indices)
+        blocked = ~self.fits(indices, self.rotation[indices], self.row[indices], self.column[indices])
+        self.game_over[indices[blocked]] = True
+        return cleared
+
+    def step(self, actions, gravity=True):
+        """
+        Применение действий ко всем доскам и один шаг гравитации.
+
+        :param actions: One of NOOP, LEFT, RIGHT, ROTATE, DOWN per board.
+        :type actions: numpy.ndarray
+        :param gravity: Whether to move every block down after the actions.
+        :type gravity: bool
+        :returns: Score gained and rows cleared on every board during the step.
+        :rtype: tuple[numpy.ndarray, numpy.ndarray]
+        """
+        actions = np.asarray(actions)
+        score = self.score.copy()
+        lines = np.zeros(self.num_games, dtype=np.int64)
+        active = ~self.game_over
+        self._shift(np.flatnonzero(active & (actions == LEFT)), -1)
+        self._shift(np.flatnonzero(active & (actions == RIGHT)), 1)
+        self._rotate(np.flatnonzero(active & (actions == ROTATE)))
+        down = np.flatnonzero(active & (actions == DOWN))
+        self._move_down(down, lines)
+        self.score[down] += 1
+        if gravity:
+            self._move_down(np.flatnonzero(~self.game_over), lines)
+        return self.score - score, lines
@@ -0,0 +1,368 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+from time import perf_counter
+
+from game import Game
+from grid import BitGrid
+
+# Текущий результат считается регрессией, если он медленнее базового на эту долю
+TOLERANCE = 0.25
+REPEATS = 5
+
+BENCHMARKS = {}
+
+
+def benchmark(name, ops):
+    """
+    Регистрация функции замера под именем.
+
+    Функция вызывается с числом операций и возвращает затраченное время в
+    секундах; подготовка данных внутри нее в замер не входит.
+
+    :param name: The benchmark name used in results and baselines.
+    :type name: str
+    :param ops: Operations per repeat.
+    :type ops: int
+    :returns: The decorator.
+    :rtype: callable
+    """
+    def register(function):
+        BENCHMARKS[name] = (function, ops)
+        return function
+    return register
+
+
+def synthetic_grid(full_rows, num_rows=20, num_cols=10):
+    """
+    Доска с заданным числом полных рядов снизу и неровной кучей над ними.
+
+    :param full_rows: The number of full rows, 0-4.
+    :type full_rows: int
+    :param num_rows: The number of rows of the board.
+    :type num_rows: int
+    :param num_cols: The number of columns of the board.
+    :type num_cols: int
+    :returns: The board.
+    :rtype: BitGrid
+    """
+    grid = BitGrid(num_rows, num_cols)
+    for row in range(grid.num_rows - 8, grid.num_rows):
+        for column in range(grid.num_cols):
+            if row >= grid.num_rows - full_rows or (row * 7 + column * 3) % 5:
+                grid.set_cell(row, column, 1 + (row + column) % 7)
+    return grid
+
+
+@benchmark("block.get_cell_positions", 200000)
+def bench_get_cell_positions(ops):
+    """
+    Замер ``Block.get_cell_positions`` падающего блока.
+
+    :param ops: The number of operations.
+    :type ops: int
+    :returns: Elapsed seconds.
+    :rtype: float
+    """
+    block = Game(seed=0).current_block
+    get_cell_positions = block.get_cell_positions
+    start = perf_counter()
+    for _ in range(ops):
+        get_cell_positions()
+    return perf_counter() - start
+
+
+@benchmark("game.block_fits", 200000)
+def bench_block_fits(ops):
+    """
+    Замер ``Game.block_fits`` в начальной позиции.
+
+    :param ops: The number of operations.
+    :type ops: int
+    :returns: Elapsed seconds.
+    :rtype: float
+    """
+    game = Game(seed=0)
+    block_fits = game.block_fits
+    start = perf_counter()
+    for _ in range(ops):
+        block_fits()
+    return perf_counter() - start
+
+
+@benchmark("game.block_inside", 200000)
+def bench_block_inside(ops):
+    """
+    Замер ``Game.block_inside`` в начальной позиции.
+
+    :param ops: The number of operations.
+    :type ops: int
+    :returns: Elapsed seconds.
+    :rtype: float
+    """
+    game = Game(seed=0)
+    block_inside = game.block_inside
+    start = perf_counter()
+    for _ in range(ops):
+        block_inside()
+    return perf_counter() - start
+
+
+def bench_clear_full_rows(full_rows, num_rows=20, num_cols=10):
+    """
+    Замер ``clear_full_rows`` на копиях синтетической доски, созданных до замера.
+
+    :param full_rows: The number of full rows on the board.
+    :type full_rows: int
+    :param num_rows: The number of rows of the board.
+    :type num_rows: int
+    :param num_cols: The number of columns of the board.
+    :type num_cols: int
+    :returns: The benchmark function.
+    :rtype: callable
+    """
+    def run(ops):
+        template = synthetic_grid(full_rows, num_rows, num_cols)
+        grids = [template.copy() for _ in range(ops)]
+        start = perf_counter()
+        for grid in grids:
+            grid.clear_full_rows()
+        return perf_counter() - start
+    return run
+
+
+for _full_rows in range(5):
+    benchmark(f"grid.clear_full_rows[{_full_rows}]", 20000)(bench_clear_full_rows(_full_rows))
+benchmark("grid.clear_full_rows[4, 1000x400]", 200)(bench_clear_full_rows(4, 1000, 400))
+
+
+@benchmark("game.lock_block", 20000)
+def bench_lock_block(ops):
+    """
+    Замер ``Game.lock_block`` блока, опущенного на дно пустой доски.
+
+    :param ops: The number of operations.
+    :type ops: int
+    :returns: Elapsed seconds.
+    :rtype: float
+    """
+    game = Game(seed=0)
+    game.current_block.move(game.drop_distance(), 0)
+    state = game.snapshot()
+    restore = game.restore
+    lock_block = game.lock_block
+    # время восстановления снимка вычитается из общего
+    start = perf_counter()
+    for _ in range(ops):
+        restore(state)
+    overhead = perf_counter() - start
+    start = perf_counter()
+    for _ in range(ops):
+        restore(state)
+        lock_block()
+    return max(0.0, perf_counter() - start - overhead)
+
+
+@benchmark("headless.game_200_pieces", 3)
+def bench_headless_games(ops):
+    """
+    Партии эвристического агента по 200 блоков без окна, с зернами 0, 1, ...
+
+    :param ops: The number of operations.
+    :type ops: int
+    :returns: Elapsed seconds.
+    :rtype: float
+    """
+    from agents import HeuristicAgent
+    from tournament import play_game
+    start = perf_counter()
+    for seed in range(ops):
+        play_game(HeuristicAgent(), seed, max_pieces=200)
+    return perf_counter() - start
+
+
+def offscreen_screen():
+    """
+    Поверхность размера окна игры без окна, с драйвером SDL ``dummy``.
+
+    :returns: The surface to draw on.
+    :rtype: pygame.Surface
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    # приветствие pygame иначе попадает в JSON на stdout
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    pygame.display.init()
+    pygame.font.init()
+    return pygame.display.set_mode((500, 620))
+
+
+@benchmark("game.draw", 500)
+def bench_game_draw(ops):
+    """
+    Время кадра ``Game.draw`` на поверхности без окна.
+
+    :param ops: The number of operations.
+    :type ops: int
+    :returns: Elapsed seconds.
+    :rtype: float
+    """
+    screen = offscreen_screen()
+    game = Game(seed=0)
+    for _ in range(30):
+        game.hard_drop()
+    start = perf_counter()
+    for _ in range(ops):
+        game.draw(screen)
+    return perf_counter() - start
+
+
+@benchmark("renderer.render", 2000)
+def bench_renderer(ops):
+    """
+    Время кадра ``Renderer.render`` при сдвигах блока.
+
+    :param ops: The number of operations.
+    :type ops: int
+    :returns: Elapsed seconds.
+    :rtype: float
+    """
+    import pygame
+    from renderer import Renderer
+    screen = offscreen_screen()
+    game = Game(seed=0)
+    renderer = Renderer(game, screen, pygame.font.Font(None, 40))
+    renderer.render()
+    moves = (game.move_left, game.move_right)
+    start = perf_counter()
+    for index in range(ops):
+        moves[index % 2]()
+        renderer.render()
+    return perf_counter() - start
+
+
+@benchmark("wall.render[64]", 200)
+def bench_wall(ops):
+    """
+    Время кадра стены из 64 досок, на каждой из которых сдвинулся блок.
+
+    :param ops: The number of operations.
+    :type ops: int
+    :returns: Elapsed seconds.
+    :rtype: float
+    """
+    import pygame
+    from wall import SpectatorWall
+    offscreen_screen()
+    games = [Game(seed=seed) for seed in range(64)]
+    for game in games:
+        for _ in range(10):
+            game.hard_drop()
+    wall = SpectatorWall(pygame.Surface((1280, 720)), games, pygame.font.Font(None, 18))
+    wall.render()
+    start = perf_counter()
+    for index in range(ops):
+        for game in games:
+            (game.move_left if index % 2 else game.move_right)()
+        wall.render()
+    return perf_counter() - start
+
+
+def run(names=None, repeats=REPEATS, scale=1.0):
+    """
+    Запуск замеров.
+
+    :param names: Benchmarks to run, all by default.
+    :type names: list[str] or None
+    :param repeats: Repeats per benchmark; the fastest one is reported.
+    :type repeats: int
+    :param scale: Multiplier of the operation counts, for quick runs.
+    :type scale: float
+    :returns: Per benchmark: ``seconds_per_op`` (the best repeat), ``median`` and ``ops``.
+    :rtype: dict[str, dict]
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        function, ops = BENCHMARKS[name]
+        ops = max(1, int(ops * scale))
+        times = [function(ops) / ops for _ in range(repeats)]
+        results[name] = {"seconds_per_op": min(times), "median": statistics.median(times), "ops": ops}
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Сравнение с базовыми результатами.
+
+    :param results: Results of :func:`run`.
+    :type results: dict[str, dict]
+    :param baseline: Earlier results, either as returned by :func:`run` or a saved report.
+    :type baseline: dict
+    :param tolerance: Allowed slowdown as a fraction.
+    :type tolerance: float
+    :returns: Regressions as (name, baseline seconds, current seconds, ratio).
+    :rtype: list[tuple[str, float, float, float]]
+    """
+    baseline = baseline.get("results", baseline)
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["seconds_per_op"]
+        ratio = result["seconds_per_op"] / before if before > 0 else 1.0
+        if ratio > 1 + tolerance:
+            regressions.append((name, before, result["seconds_per_op"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    """
+    Запуск замеров из командной строки.
+
+    :param argv: Command-line arguments, ``sys.argv[1:]`` by default.
+    :type argv: list[str] or None
+    :returns: 1 if any benchmark regressed against the baseline, otherwise 0.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the engine hot paths and rendering.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all by default")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier of the operation counts")
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    parser.add_argument("--baseline", default=None, help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown fraction")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    results = run(args.names, args.repeats, args.scale)
+    report = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    for name, result in results.items():
+        print(f"{name:32} {result['seconds_per_op'] * 1e6:12.3f} us/op", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before * 1e6:.3f} -> {after * 1e6:.3f} us/op ({ratio:.2f}x)",
+                  file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
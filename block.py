@@ -1,23 +1,120 @@
 from colors import Colors
-import pygame
 from position import Position
 
+# Левый столбец области появления блоков (``spawn_offset``) на доске из 10 столбцов
+SPAWN_COLUMN = 3
+
+
+def default_spawn_column(num_cols):
+    """
+    Левый столбец области появления блоков шириной 4 по центру доски.
+
+    :param num_cols: The number of columns of the board.
+    :type num_cols: int
+    :returns: The spawn column, ``SPAWN_COLUMN`` for a 10-column board.
+    :rtype: int
+    """
+    return (num_cols - 4) // 2
+
+
+class Shape:
+    """
+    Неизменяемое описание одного поворота блока, вычисляется один раз при импорте.
+
+    :param cells: Cell positions of the rotation relative to the block origin.
+    :type cells: tuple[Position]
+    :ivar offsets: Cell offsets as (row, column) tuples.
+    :vartype offsets: tuple[tuple[int, int]]
+    :ivar row_masks: Pairs of (row, bitmask) where bit 0 is column ``min_column``.
+    :vartype row_masks: tuple[tuple[int, int]]
+    :ivar min_row: Topmost row offset of the rotation.
+    :vartype min_row: int
+    :ivar max_row: Bottom row offset of the rotation.
+    :vartype max_row: int
+    :ivar min_column: Leftmost column offset of the rotation.
+    :vartype min_column: int
+    :ivar max_column: Rightmost column offset of the rotation.
+    :vartype max_column: int
+    :ivar height: Number of rows spanned by the rotation.
+    :vartype height: int
+    :ivar width: Number of columns spanned by the rotation.
+    :vartype width: int
+    :ivar bottoms: Pairs of (column, lowest row) offsets, one per occupied column.
+    :vartype bottoms: tuple[tuple[int, int]]
+    """
+    __slots__ = ("cells", "offsets", "row_masks", "min_row", "max_row", "min_column", "max_column",
+                 "height", "width", "bottoms")
+
+    def __init__(self, cells):
+        self.cells = tuple(cells)
+        self.offsets = tuple((position.row, position.column) for position in self.cells)
+        self.min_row = min(row for row, column in self.offsets)
+        self.max_row = max(row for row, column in self.offsets)
+        self.min_column = min(column for row, column in self.offsets)
+        self.max_column = max(column for row, column in self.offsets)
+        self.height = self.max_row - self.min_row + 1
+        self.width = self.max_column - self.min_column + 1
+        masks = {}
+        for row, column in self.offsets:
+            masks[row] = masks.get(row, 0) | 1 << (column - self.min_column)
+        self.row_masks = tuple(sorted(masks.items()))
+        bottoms = {}
+        for row, column in self.offsets:
+            bottoms[column] = max(bottoms.get(column, row), row)
+        self.bottoms = tuple(sorted(bottoms.items()))
+
 
 class Block:
     """
     Представляет блок.
 
+    Таблицы форм (:attr:`cells`, :attr:`shapes`) общие для всех экземпляров
+    класса и строятся при объявлении подкласса.
+
     :param id: The identifier of the block.
     :type id: int
     """
+    # Подклассы в blocks.py не объявляют __slots__ и сохраняют __dict__,
+    # чтобы их экземпляры можно было патчить в тестах.
+    __slots__ = ("id", "row_offset", "column_offset", "rotation_state")
+    cells = {}
+    shapes = ()
+    spawn_offset = (0, 0)
+    cell_size = 30
+    colors = Colors.get_cell_colors()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.shapes = tuple(Shape(cls.cells[rotation]) for rotation in range(len(cls.cells)))
+
     def __init__(self, id):
         self.id = id
-        self.cells = {}
-        self.cell_size = 30
         self.row_offset = 0
         self.column_offset = 0
         self.rotation_state = 0
-        self.colors = Colors.get_cell_colors()
+
+    @property
+    def shape(self):
+        """
+        Форма текущего поворота блока.
+
+        :returns: The precomputed shape of the current rotation.
+        :rtype: Shape
+        """
+        return self.shapes[self.rotation_state]
+
+    def spawn(self, column_shift=0):
+        """
+        Возврат блока в начальное положение: нулевой поворот и смещение ``spawn_offset``.
+
+        :param column_shift: Columns to add to the spawn offset, for boards whose spawn
+            column differs from ``SPAWN_COLUMN``.
+        :type column_shift: int
+        :returns: None
+        """
+        self.rotation_state = 0
+        self.row_offset, self.column_offset = self.spawn_offset
+        self.column_offset += column_shift
 
     def move(self, rows, columns):
         """
@@ -37,12 +134,10 @@ class Block:
         :returns: List of Position objects representing cell positions.
         :rtype: list[Position]
         """
-        tiles = self.cells[self.rotation_state]
-        moved_tiles = []
-        for position in tiles:
-            position = Position(position.row + self.row_offset, position.column + self.column_offset)
-            moved_tiles.append(position)
-        return moved_tiles
+        row_offset = self.row_offset
+        column_offset = self.column_offset
+        return [Position(row + row_offset, column + column_offset)
+                for row, column in self.shapes[self.rotation_state].offsets]
 
     def rotate(self):
         """
@@ -50,7 +145,7 @@ class Block:
         :returns: None
         """
         self.rotation_state += 1
-        if self.rotation_state == len(self.cells):
+        if self.rotation_state == len(self.shapes):
             self.rotation_state = 0
 
     def undo_rotation(self):
@@ -61,9 +156,9 @@ class Block:
         """
         self.rotation_state -= 1
         if self.rotation_state == -1:
-            self.rotation_state = len(self.cells) - 1
+            self.rotation_state = len(self.shapes) - 1
 
-    def draw(self, screen, offset_x, offset_y):
+    def draw(self, screen, offset_x, offset_y, ghost=False, cell_size=None):
         """
         Вырисовка блоков на экране
 
@@ -73,9 +168,16 @@ class Block:
         :type offset_x: int
         :param offset_y: The y-coordinate offset for drawing.
         :type offset_y: int
+        :param ghost: Draw the dimmed ghost tiles instead of the block tiles.
+        :type ghost: bool
+        :param cell_size: The cell size in pixels, ``cell_size`` of the class by default.
+        :type cell_size: int or None
         """
-        tiles = self.get_cell_positions()
-        for tile in tiles:
-            tile_rect = pygame.Rect(offset_x + tile.column * self.cell_size,
-                                    offset_y + tile.row * self.cell_size, self.cell_size - 1, self.cell_size - 1)
-            pygame.draw.rect(screen, self.colors[self.id], tile_rect)
+        from tiles import atlas_for
+        size = cell_size or self.cell_size
+        atlas = atlas_for(size, self.colors)
+        tile = (atlas.ghosts if ghost else atlas.tiles)[self.id]
+        x = offset_x + self.column_offset * size
+        y = offset_y + self.row_offset * size
+        screen.blits([(tile, (x + column * size, y + row * size))
+                      for row, column in self.shapes[self.rotation_state].offsets], False)
@@ -9,15 +9,17 @@ class LBlock(Block):
     :param id: The identifier of the block.
     :type id: int
     """
+    cells = {
+        0: (Position(0, 2), Position(1, 0), Position(1, 1), Position(1, 2)),
+        1: (Position(0, 1), Position(1, 1), Position(2, 1), Position(2, 2)),
+        2: (Position(1, 0), Position(1, 1), Position(1, 2), Position(2, 0)),
+        3: (Position(0, 0), Position(0, 1), Position(1, 1), Position(2, 1)),
+    }
+    spawn_offset = (0, 3)
+
     def __init__(self):
         super().__init__(id=1)
-        self.cells = {
-            0: [Position(0, 2), Position(1, 0), Position(1, 1), Position(1, 2)],
-            1: [Position(0, 1), Position(1, 1), Position(2, 1), Position(2, 2)],
-            2: [Position(1, 0), Position(1, 1), Position(1, 2), Position(2, 0)],
-            3: [Position(0, 0), Position(0, 1), Position(1, 1), Position(2, 1)]
-        }
-        self.move(0, 3)
+        self.spawn()
 
 
 class JBlock(Block):
@@ -27,15 +29,17 @@ class JBlock(Block):
     :param id: The identifier of the block.
     :type id: int
     """
+    cells = {
+        0: (Position(0, 0), Position(1, 0), Position(1, 1), Position(1, 2)),
+        1: (Position(0, 1), Position(0, 2), Position(1, 1), Position(2, 1)),
+        2: (Position(1, 0), Position(1, 1), Position(1, 2), Position(2, 2)),
+        3: (Position(0, 1), Position(1, 1), Position(2, 0), Position(2, 1)),
+    }
+    spawn_offset = (0, 3)
+
     def __init__(self):
         super().__init__(id=2)
-        self.cells = {
-            0: [Position(0, 0), Position(1, 0), Position(1, 1), Position(1, 2)],
-            1: [Position(0, 1), Position(0, 2), Position(1, 1), Position(2, 1)],
-            2: [Position(1, 0), Position(1, 1), Position(1, 2), Position(2, 2)],
-            3: [Position(0, 1), Position(1, 1), Position(2, 0), Position(2, 1)]
-        }
-        self.move(0, 3)
+        self.spawn()
 
 
 class IBlock(Block):
@@ -45,15 +49,17 @@ class IBlock(Block):
     :param id: The identifier of the block.
     :type id: int
     """
+    cells = {
+        0: (Position(1, 0), Position(1, 1), Position(1, 2), Position(1, 3)),
+        1: (Position(0, 2), Position(1, 2), Position(2, 2), Position(3, 2)),
+        2: (Position(2, 0), Position(2, 1), Position(2, 2), Position(2, 3)),
+        3: (Position(0, 1), Position(1, 1), Position(2, 1), Position(3, 1)),
+    }
+    spawn_offset = (-1, 3)
+
     def __init__(self):
         super().__init__(id=3)
-        self.cells = {
-            0: [Position(1, 0), Position(1, 1), Position(1, 2), Position(1, 3)],
-            1: [Position(0, 2), Position(1, 2), Position(2, 2), Position(3, 2)],
-            2: [Position(2, 0), Position(2, 1), Position(2, 2), Position(2, 3)],
-            3: [Position(0, 1), Position(1, 1), Position(2, 1), Position(3, 1)]
-        }
-        self.move(-1, 3)
+        self.spawn()
 
 
 class OBlock(Block):
@@ -63,12 +69,14 @@ class OBlock(Block):
     :param id: The identifier of the block.
     :type id: int
     """
+    cells = {
+        0: (Position(0, 0), Position(0, 1), Position(1, 0), Position(1, 1)),
+    }
+    spawn_offset = (0, 4)
+
     def __init__(self):
         super().__init__(id=4)
-        self.cells = {
-            0: [Position(0, 0), Position(0, 1), Position(1, 0), Position(1, 1)]
-        }
-        self.move(0, 4)
+        self.spawn()
 
 
 class SBlock(Block):
@@ -78,15 +86,17 @@ class SBlock(Block):
     :param id: The identifier of the block.
     :type id: int
     """
+    cells = {
+        0: (Position(0, 1), Position(0, 2), Position(1, 0), Position(1, 1)),
+        1: (Position(0, 1), Position(1, 1), Position(1, 2), Position(2, 2)),
+        2: (Position(1, 1), Position(1, 2), Position(2, 0), Position(2, 1)),
+        3: (Position(0, 0), Position(1, 0), Position(1, 1), Position(2, 1)),
+    }
+    spawn_offset = (0, 3)
+
     def __init__(self):
         super().__init__(id=5)
-        self.cells = {
-            0: [Position(0, 1), Position(0, 2), Position(1, 0), Position(1, 1)],
-            1: [Position(0, 1), Position(1, 1), Position(1, 2), Position(2, 2)],
-            2: [Position(1, 1), Position(1, 2), Position(2, 0), Position(2, 1)],
-            3: [Position(0, 0), Position(1, 0), Position(1, 1), Position(2, 1)]
-        }
-        self.move(0, 3)
+        self.spawn()
 
 
 class TBlock(Block):
@@ -96,15 +106,17 @@ class TBlock(Block):
     :param id: The identifier of the block.
     :type id: int
     """
+    cells = {
+        0: (Position(0, 1), Position(1, 0), Position(1, 1), Position(1, 2)),
+        1: (Position(0, 1), Position(1, 1), Position(1, 2), Position(2, 1)),
+        2: (Position(1, 0), Position(1, 1), Position(1, 2), Position(2, 1)),
+        3: (Position(0, 1), Position(1, 0), Position(1, 1), Position(2, 1)),
+    }
+    spawn_offset = (0, 3)
+
     def __init__(self):
         super().__init__(id=6)
-        self.cells = {
-            0: [Position(0, 1), Position(1, 0), Position(1, 1), Position(1, 2)],
-            1: [Position(0, 1), Position(1, 1), Position(1, 2), Position(2, 1)],
-            2: [Position(1, 0), Position(1, 1), Position(1, 2), Position(2, 1)],
-            3: [Position(0, 1), Position(1, 0), Position(1, 1), Position(2, 1)]
-        }
-        self.move(0, 3)
+        self.spawn()
 
 
 class ZBlock(Block):
@@ -114,12 +126,17 @@ class ZBlock(Block):
     :param id: The identifier of the block.
     :type id: int
     """
+    cells = {
+        0: (Position(0, 0), Position(0, 1), Position(1, 1), Position(1, 2)),
+        1: (Position(0, 2), Position(1, 1), Position(1, 2), Position(2, 1)),
+        2: (Position(1, 0), Position(1, 1), Position(2, 1), Position(2, 2)),
+        3: (Position(0, 1), Position(1, 0), Position(1, 1), Position(2, 0)),
+    }
+    spawn_offset = (0, 3)
+
     def __init__(self):
         super().__init__(id=7)
-        self.cells = {
-            0: [Position(0, 0), Position(0, 1), Position(1, 1), Position(1, 2)],
-            1: [Position(0, 2), Position(1, 1), Position(1, 2), Position(2, 1)],
-            2: [Position(1, 0), Position(1, 1), Position(2, 1), Position(2, 2)],
-            3: [Position(0, 1), Position(1, 0), Position(1, 1), Position(2, 0)]
-        }
-        self.move(0, 3)
+        self.spawn()
+
+
+BLOCKS = (IBlock, JBlock, LBlock, OBlock, SBlock, TBlock, ZBlock)
@@ -10,6 +10,7 @@ class Colors:
     - `purple`: RGB tuple representing purple color.
     - `cyan`: RGB tuple representing cyan color.
     - `blue`: RGB tuple representing blue color.
+    - `grey`: RGB tuple representing grey color, used for garbage rows.
     - `white`: RGB tuple representing white color.
     - `dark_blue`: RGB tuple representing dark blue color.
     - `light_blue`: RGB tuple representing light blue color.
@@ -25,6 +26,7 @@ class Colors:
     purple = (166, 0, 247)
     cyan = (21, 204, 209)
     blue = (13, 64, 216)
+    grey = (128, 128, 128)
     white = (255, 255, 255)
     dark_blue = (44, 44, 127)
     light_blue = (59, 85, 162)
@@ -37,4 +39,4 @@ class Colors:
         :returns: List of RGB tuples representing various cell colors.
         :rtype: list
         """
-        return [cls.dark_grey, cls.green, cls.red, cls.orange, cls.yellow, cls.purple, cls.cyan, cls.blue]
+        return [cls.dark_grey, cls.green, cls.red, cls.orange, cls.yellow, cls.purple, cls.cyan, cls.blue, cls.grey]
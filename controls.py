@@ -0,0 +1,167 @@
+from time import perf_counter
+
+LEFT, RIGHT, DOWN, ROTATE, HARD_DROP = "left", "right", "down", "rotate", "hard_drop"
+# Действия, которые повторяются при удержании клавиши
+REPEATING = (LEFT, RIGHT, DOWN)
+
+
+class InputHandler:
+    """
+    Буфер ввода с отметками времени, задержкой автоповтора (DAS) и частотой повтора (ARR).
+
+    Нажатия и отпускания записываются с временем высокоточных часов, а
+    :meth:`poll` выдает все действия, включая автоповторы, с их настоящими
+    отметками времени, чтобы симуляция применяла их в правильном порядке
+    относительно гравитации, а не с точностью до кадра.
+
+    :param das: Delay in seconds between a press and the first repeat.
+    :type das: float
+    :param arr: Interval in seconds between repeats, must be positive.
+    :type arr: float
+    :param clock: Function returning the current time in seconds.
+    :type clock: callable
+    :ivar held: Held actions mapped to the time of their next repeat.
+    :vartype held: dict[str, float]
+    :ivar buffer: Pressed actions not yet returned by :meth:`poll`, as (timestamp, action).
+    :vartype buffer: list[tuple[float, str]]
+    :ivar horizontal: The horizontal direction that repeats, the last one pressed.
+    :vartype horizontal: str or None
+    """
+    def __init__(self, das=0.17, arr=0.05, clock=perf_counter):
+        if arr <= 0:
+            raise ValueError("arr must be positive")
+        self.das = das
+        self.arr = arr
+        self.clock = clock
+        self.held = {}
+        self.buffer = []
+        self.horizontal = None
+
+    def press(self, action, timestamp=None):
+        """
+        Нажатие клавиши: действие выполняется сразу и начинает заряжать автоповтор.
+
+        :param action: One of ``LEFT``, ``RIGHT``, ``DOWN`` or ``ROTATE``.
+        :type action: str
+        :param timestamp: Time of the press, the current time by default.
+        :type timestamp: float or None
+        :returns: None
+        :rtype: None
+        """
+        if timestamp is None:
+            timestamp = self.clock()
+        self.buffer.append((timestamp, action))
+        if action in REPEATING:
+            self.held[action] = timestamp + self.das
+            if action in (LEFT, RIGHT):
+                self.horizontal = action
+
+    def release(self, action, timestamp=None):
+        """
+        Отпускание клавиши: повторы после момента отпускания отменяются.
+
+        :param action: The released action.
+        :type action: str
+        :param timestamp: Time of the release, the current time by default.
+        :type timestamp: float or None
+        :returns: None
+        :rtype: None
+        """
+        if timestamp is None:
+            timestamp = self.clock()
+        if action not in self.held:
+            return
+        self.buffer.extend(self.repeats(action, timestamp))
+        del self.held[action]
+        if action == self.horizontal:
+            other = RIGHT if action == LEFT else LEFT
+            self.horizontal = other if other in self.held else None
+            if self.horizontal:
+                # оставшееся направление заряжается заново с момента отпускания
+                self.held[other] = timestamp + self.das
+
+    def repeats(self, action, until):
+        """
+        Автоповторы удерживаемого действия до заданного момента.
+
+        :param action: A held action.
+        :type action: str
+        :param until: Repeats up to and including this time are produced.
+        :type until: float
+        :returns: The repeats as (timestamp, action).
+        :rtype: list[tuple[float, str]]
+        """
+        if action in (LEFT, RIGHT) and action != self.horizontal:
+            return []
+        repeats = []
+        moment = self.held[action]
+        while moment <= until:
+            repeats.append((moment, action))
+            moment += self.arr
+        self.held[action] = moment
+        return repeats
+
+    def poll(self, until=None):
+        """
+        Выдача всех действий, произошедших до заданного момента, в порядке времени.
+
+        :param until: The end of the polled interval, the current time by default.
+        :type until: float or None
+        :returns: Actions as (timestamp, action), sorted by timestamp.
+        :rtype: list[tuple[float, str]]
+        """
+        if until is None:
+            until = self.clock()
+        actions = [item for item in self.buffer if item[0] <= until]
+        self.buffer = [item for item in self.buffer if item[0] > until]
+        for action in list(self.held):
+            actions.extend(self.repeats(action, until))
+        actions.sort(key=lambda item: item[0])
+        return actions
+
+    def next_time(self):
+        """
+        Время следующего автоповтора или отложенного действия.
+
+        :returns: The earliest pending timestamp, None if nothing is pending.
+        :rtype: float or None
+        """
+        times = [moment for action, moment in self.held.items()
+                 if action not in (LEFT, RIGHT) or action == self.horizontal]
+        times.extend(item[0] for item in self.buffer)
+        return min(times) if times else None
+
+    def clear(self):
+        """
+        Сброс удерживаемых клавиш и буфера.
+
+        :returns: None
+        :rtype: None
+        """
+        self.held.clear()
+        self.buffer.clear()
+        self.horizontal = None
+
+
+def apply_action(game, action):
+    """
+    Применение действия ввода к игре.
+
+    :param game: The game to control.
+    :type game: Game
+    :param action: One of ``LEFT``, ``RIGHT``, ``DOWN``, ``ROTATE`` or ``HARD_DROP``.
+    :type action: str
+    :returns: None
+    :rtype: None
+    """
+    if action == LEFT:
+        game.move_left()
+    elif action == RIGHT:
+        game.move_right()
+    elif action == DOWN:
+        game.move_down()
+        game.update_score(0, 1)
+    elif action == ROTATE:
+        game.rotate()
+    elif action == HARD_DROP:
+        game.update_score(0, 2 * game.hard_drop())
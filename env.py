@@ -0,0 +1,155 @@
+from arraygrid import ArrayGrid
+from controls import LEFT, RIGHT, DOWN, ROTATE, HARD_DROP, apply_action
+from game import Game
+from search import PlacementSearch
+
+PRIMITIVE, PLACEMENT = "primitive", "placement"
+NOOP = "noop"
+# Индекс действия в режиме PRIMITIVE - позиция в этом кортеже
+PRIMITIVE_ACTIONS = (NOOP, LEFT, RIGHT, ROTATE, DOWN, HARD_DROP)
+# Таблица положений очищается, когда становится больше этого размера
+TABLE_LIMIT = 50000
+
+
+class TetrisEnv:
+    """
+    Среда для обучения с подкреплением в стиле Gym поверх :class:`Game`.
+
+    В режиме ``PRIMITIVE`` действие - индекс в ``PRIMITIVE_ACTIONS``, после
+    которого блок опускается гравитацией. В режиме ``PLACEMENT`` действие -
+    индекс конечного положения текущего блока в :meth:`legal_actions`; блок
+    проходит путь до него и фиксируется.
+
+    Доска в наблюдении - представление массива :class:`ArrayGrid` только
+    для чтения: оно создается один раз, не копируется на каждом шаге и
+    всегда показывает текущее состояние.
+
+    :param mode: ``PRIMITIVE`` or ``PLACEMENT``.
+    :type mode: str
+    :param gravity: In ``PRIMITIVE`` mode, move the block down after every action.
+    :type gravity: bool
+    :param max_steps: End the episode after this many steps, no limit by default.
+    :type max_steps: int or None
+    :raises ValueError: If the mode is unknown.
+    :ivar game: The current game, replaced by :meth:`reset`.
+    :vartype game: Game
+    :ivar board: Read-only view of the cell colors, shape (rows, cols), dtype uint8.
+    :vartype board: numpy.ndarray
+    """
+    def __init__(self, mode=PRIMITIVE, gravity=True, max_steps=None):
+        if mode not in (PRIMITIVE, PLACEMENT):
+            raise ValueError(f"unknown action mode {mode!r}")
+        self.mode = mode
+        self.gravity = gravity
+        self.max_steps = max_steps
+        self.search = PlacementSearch()
+        self.grid = ArrayGrid()
+        self.board = self.grid.view()
+        self.game = None
+        self.steps = 0
+        self.lines = 0
+        self.placements = None
+        self.reset()
+
+    def reset(self, seed=None):
+        """
+        Начало нового эпизода.
+
+        Сетка и представление ``board`` переиспользуются, меняется только игра.
+
+        :param seed: Seed of the block randomizer, None for a random one.
+        :type seed: int or None
+        :returns: The first observation.
+        :rtype: dict
+        """
+        self.grid.reset()
+        self.game = Game(self.grid, seed)
+        self.game.subscribe("clear", self.on_clear)
+        self.steps = 0
+        self.lines = 0
+        self.placements = None
+        return self.observation()
+
+    def on_clear(self, rows_cleared):
+        """
+        Подсчет удаленных рядов за эпизод.
+
+        :param rows_cleared: The number of rows cleared.
+        :type rows_cleared: int
+        :returns: None
+        :rtype: None
+        """
+        self.lines += rows_cleared
+
+    def observation(self):
+        """
+        Наблюдение: доска без копирования и состояние текущего и следующего блока.
+
+        :returns: ``board`` (the shared array), ``current_block``, ``rotation``,
+            ``position`` as (row offset, column offset) and ``next_block``.
+        :rtype: dict
+        """
+        block = self.game.current_block
+        return {"board": self.board, "current_block": block.id, "rotation": block.rotation_state,
+                "position": (block.row_offset, block.column_offset), "next_block": self.game.next_block.id}
+
+    def legal_actions(self):
+        """
+        Допустимые действия в текущем состоянии.
+
+        :returns: Action indices in ``PRIMITIVE`` mode, reachable placements of the
+            current block in ``PLACEMENT`` mode (the action is the index in this list).
+        :rtype: range or list[Placement]
+        """
+        if self.mode == PRIMITIVE:
+            return range(len(PRIMITIVE_ACTIONS))
+        if self.placements is None:
+            if len(self.search.table) > TABLE_LIMIT:
+                self.search.table.clear()
+            self.placements = self.search.placements(self.grid, self.game.current_block)
+        return self.placements
+
+    def action_count(self):
+        """
+        Размер пространства действий в текущем состоянии.
+
+        :returns: The number of legal actions.
+        :rtype: int
+        """
+        return len(self.legal_actions())
+
+    def step(self, action):
+        """
+        Выполнение действия.
+
+        :param action: Index of the action, see :meth:`legal_actions`.
+        :type action: int
+        :raises ValueError: If the action is out of range or the episode is over.
+        :returns: Observation, reward (score gained), done flag and info with ``lines``,
+            ``steps`` and ``score``.
+        :rtype: tuple[dict, int, bool, dict]
+        """
+        game = self.game
+        if game.game_over:
+            raise ValueError("episode is over, call reset()")
+        actions = self.legal_actions()
+        if not 0 <= action < len(actions):
+            raise ValueError(f"action {action} out of range 0..{len(actions) - 1}")
+        score = game.score
+        block = game.current_block
+        if self.mode == PRIMITIVE:
+            move = PRIMITIVE_ACTIONS[action]
+            if move != NOOP:
+                apply_action(game, move)
+            if self.gravity and not game.game_over and game.current_block is block:
+                game.move_down()
+        else:
+            for move in actions[action].path:
+                apply_action(game, move)
+            apply_action(game, HARD_DROP)
+        if game.current_block is not block:
+            self.placements = None
+        self.steps += 1
+        done = game.game_over or (self.max_steps is not None and self.steps >= self.max_steps)
+        info = {"lines": self.lines, "steps": self.steps, "score": game.score}
+        return self.observation(), game.score - score, done, info
@@ -0,0 +1,318 @@
+import argparse
+import os
+import sys
+from bisect import bisect_right
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from time import perf_counter
+
+# рендер идет на обычных поверхностях, окно не нужно
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+from renderer import Renderer, fit_cell_size, window_size
+from replay import Replay, ReplayPlayer
+
+PNG, RAW = "png", "raw"
+FPS = 30
+# Кадры RAW копятся в памяти и пишутся одним вызовом, когда их больше этого размера
+BATCH_BYTES = 8 << 20
+# Сохранение PNG идет в фоновых потоках; рендер ждет, если в очереди больше кадров
+PNG_THREADS = 2
+PNG_QUEUE = 16
+
+ExportResult = namedtuple("ExportResult", "source output frames rendered size duration")
+ExportResult.__doc__ = """
+Итог экспорта одного журнала.
+
+:ivar source: The replay file.
+:ivar output: The written file (RAW) or directory (PNG).
+:ivar frames: Frames in the video, including repeated ones.
+:ivar rendered: Frames that differed from the previous one and were drawn.
+:ivar size: Frame size in pixels as (width, height).
+:ivar duration: Wall-clock seconds spent on the export.
+"""
+
+
+def frame_positions(replay, fps=FPS):
+    """
+    Число событий журнала, примененных к каждому кадру видео.
+
+    Кадр ``k`` показывает состояние после всех событий с временем не позже
+    ``k / fps`` секунд.
+
+    :param replay: The parsed log.
+    :type replay: Replay
+    :param fps: Frames per second.
+    :type fps: int
+    :returns: The event count of every frame.
+    :rtype: list[int]
+    """
+    times = replay.times
+    if not times:
+        return [0]
+    count = times[-1] * fps // 1000 + 1
+    return [bisect_right(times, frame * 1000 / fps) for frame in range(count)]
+
+
+class RawWriter:
+    """
+    Запись кадров подряд в файл RGB24 без сжатия, например для ``ffmpeg -f rawvideo``.
+
+    Повторный кадр не перекодируется: дописываются байты предыдущего.
+
+    :param path: The output file, ``"-"`` for standard output.
+    :type path: str
+    """
+    def __init__(self, path):
+        self.file = sys.stdout.buffer if path == "-" else open(path, "wb")
+        self.buffer = bytearray()
+        self.last = None
+
+    def write(self, surface):
+        """
+        Запись нового кадра.
+
+        :param surface: The frame.
+        :type surface: pygame.Surface
+        :returns: None
+        :rtype: None
+        """
+        self.last = pygame.image.tobytes(surface, "RGB")
+        self.append(self.last)
+
+    def repeat(self):
+        """
+        Повтор предыдущего кадра.
+
+        :returns: None
+        :rtype: None
+        """
+        self.append(self.last)
+
+    def append(self, frame):
+        """
+        Добавление байтов кадра в пакет и запись пакета, если он заполнен.
+
+        :param frame: The frame bytes.
+        :type frame: bytes
+        :returns: None
+        :rtype: None
+        """
+        self.buffer += frame
+        if len(self.buffer) >= BATCH_BYTES:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+    def close(self):
+        """
+        Запись остатка и закрытие файла.
+
+        :returns: None
+        :rtype: None
+        """
+        self.file.write(self.buffer)
+        self.buffer.clear()
+        if self.file is sys.stdout.buffer:
+            self.file.flush()
+        else:
+            self.file.close()
+
+
+class PngWriter:
+    """
+    Запись только изменившихся кадров в PNG и списка для ``ffmpeg -f concat``.
+
+    Файл ``frames.ffconcat`` перечисляет кадры с длительностями, так что
+    пропущенные повторы не теряются при сборке видео.
+
+    :param directory: The output directory, created if needed.
+    :type directory: str
+    :param fps: Frames per second.
+    :type fps: int
+    """
+    def __init__(self, directory, fps=FPS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fps = fps
+        self.names = []
+        self.counts = []
+        self.pool = ThreadPoolExecutor(PNG_THREADS)
+        self.pending = []
+
+    def write(self, surface):
+        """
+        Сохранение нового кадра в фоновом потоке.
+
+        :param surface: The frame; a copy is saved, so it can be drawn on right away.
+        :type surface: pygame.Surface
+        :returns: None
+        :rtype: None
+        """
+        name = f"frame_{len(self.names):06d}.png"
+        self.names.append(name)
+        self.counts.append(1)
+        if len(self.pending) >= PNG_QUEUE:
+            self.pending.pop(0).result()
+        self.pending.append(self.pool.submit(pygame.image.save, surface.copy(),
+                                             os.path.join(self.directory, name)))
+
+    def repeat(self):
+        """
+        Удлинение показа предыдущего кадра.
+
+        :returns: None
+        :rtype: None
+        """
+        self.counts[-1] += 1
+
+    def close(self):
+        """
+        Ожидание сохранения кадров и запись ``frames.ffconcat``.
+
+        :returns: None
+        :rtype: None
+        """
+        for future in self.pending:
+            future.result()
+        self.pool.shutdown()
+        with open(os.path.join(self.directory, "frames.ffconcat"), "w") as file:
+            file.write("ffconcat version 1.0\n")
+            for name, count in zip(self.names, self.counts):
+                file.write(f"file {name}\nduration {count / self.fps:.6f}\n")
+            if self.names:
+                # последний кадр повторяется, иначе concat не учитывает его длительность
+                file.write(f"file {self.names[-1]}\n")
+
+
+def export_replay(source, output, fmt=PNG, fps=FPS, max_frames=None):
+    """
+    Рендер журнала игры в кадры без окна.
+
+    Кадры рисует :class:`Renderer` на обычной поверхности теми же плитками и
+    блоками, что и в игре. Если рендерер не изменил ни одной области, кадр
+    не рисуется и не кодируется заново.
+
+    :param source: The replay file.
+    :type source: str
+    :param output: The RAW file or the PNG directory.
+    :type output: str
+    :param fmt: ``PNG`` or ``RAW``.
+    :type fmt: str
+    :param fps: Frames per second.
+    :type fps: int
+    :param max_frames: Export at most this many frames.
+    :type max_frames: int or None
+    :raises ValueError: If the format is unknown or the file is not a replay.
+    :returns: The result of the export.
+    :rtype: ExportResult
+    """
+    if fmt not in (PNG, RAW):
+        raise ValueError(f"unknown frame format {fmt!r}")
+    start = perf_counter()
+    with open(source, "rb") as file:
+        replay = Replay(file.read())
+    positions = frame_positions(replay, fps)[:max_frames]
+    pygame.font.init()
+    player = ReplayPlayer(replay, cell_size=fit_cell_size(replay.num_rows, replay.num_cols))
+    game = player.game
+    surface = pygame.Surface(window_size(game.grid))
+    renderer = Renderer(game, surface, pygame.font.Font(None, 40))
+    writer = PngWriter(output, fps) if fmt == PNG else RawWriter(output)
+    rendered = 0
+    try:
+        for position in positions:
+            player.seek(position)
+            if renderer.render() or not rendered:
+                writer.write(surface)
+                rendered += 1
+            else:
+                writer.repeat()
+    finally:
+        writer.close()
+    return ExportResult(source, output, len(positions), rendered, surface.get_size(), perf_counter() - start)
+
+
+def export_many(sources, output_dir, fmt=PNG, fps=FPS, max_frames=None, workers=None):
+    """
+    Экспорт многих журналов на пуле процессов; результаты выдаются по мере готовности.
+
+    Для ``a/b.replay`` создается ``output_dir/b.rgb`` (RAW) или каталог ``output_dir/b`` (PNG),
+    поэтому имена журналов без расширения не должны совпадать.
+
+    :param sources: The replay files.
+    :type sources: iterable[str]
+    :param output_dir: The directory for the outputs, created if needed.
+    :type output_dir: str
+    :param fmt: ``PNG`` or ``RAW``.
+    :type fmt: str
+    :param fps: Frames per second.
+    :type fps: int
+    :param max_frames: Export at most this many frames per replay.
+    :type max_frames: int or None
+    :param workers: The number of processes, ``os.cpu_count()`` by default; 1 renders in
+        this process.
+    :type workers: int or None
+    :raises ValueError: If two replays would be written to the same output.
+    :returns: Results in completion order.
+    :rtype: iterator[ExportResult]
+    """
+    sources = list(sources)
+    names = {}
+    for source in sources:
+        name = os.path.splitext(os.path.basename(source))[0]
+        if name in names:
+            raise ValueError(f"{names[name]} and {source} would both be exported as {name!r}")
+        names[name] = source
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for name, source in names.items():
+        jobs.append((source, os.path.join(output_dir, name + (".rgb" if fmt == RAW else "")), fmt, fps,
+                     max_frames))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield export_replay(*job)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        futures = [executor.submit(export_replay, *job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None):
+    """
+    Экспорт журналов из командной строки.
+
+    :param argv: Command-line arguments, ``sys.argv[1:]`` by default.
+    :type argv: list[str] or None
+    :returns: The exit status.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Render replays to PNG frames or raw RGB video without a window.")
+    parser.add_argument("replays", nargs="+", help="replay files written by the game")
+    parser.add_argument("--output", default="frames", help="output directory")
+    parser.add_argument("--format", default=PNG, choices=(PNG, RAW))
+    parser.add_argument("--fps", type=int, default=FPS)
+    parser.add_argument("--max-frames", type=int, default=None, help="frame limit per replay")
+    parser.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    args = parser.parse_args(argv)
+
+    results = export_many(args.replays, args.output, args.format, args.fps, args.max_frames, args.workers)
+    try:
+        for result in results:
+            width, height = result.size
+            print(f"{result.source} -> {result.output}: {result.frames} frames, {result.rendered} drawn, "
+                  f"{result.frames / result.duration:.0f} frames/s", file=sys.stderr)
+            if args.format == RAW:
+                print(f"  ffmpeg -f rawvideo -pix_fmt rgb24 -s {width}x{height} -r {args.fps} -i {result.output} "
+                      f"clip.mp4", file=sys.stderr)
+    except ValueError as error:
+        parser.error(str(error))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
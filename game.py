@@ -1,17 +1,30 @@
-from grid import Grid
+from grid import BitGrid
+from block import Block, SPAWN_COLUMN, default_spawn_column
 from blocks import *
-import random
-import pygame
+from randomizer import BagRandomizer
+from zobrist import CURRENT, NEXT
+
+# Версия правил игры, увеличивается при любом изменении, влияющем на повторы
+RULES_VERSION = 3
 
 
 class Game:
     """
        Основная механика игры
 
+       :param grid: Board backend to use, a new :class:`BitGrid` by default.
+       :type grid: Grid
+       :param seed: Seed of the block randomizer, None for a random one.
+       :type seed: int or None
+       :param spawn_column: Left column of the 4-wide spawn area, centered by default.
+       :type spawn_column: int or None
+       :raises ValueError: If the spawn area does not fit on the board.
        :ivar grid: The grid object managing the game board.
        :vartype grid: Grid
-       :ivar blocks: List of available blocks for the game.
-       :vartype blocks: list
+       :ivar randomizer: The per-game 7-bag block generator.
+       :vartype randomizer: BagRandomizer
+       :ivar pool: Two reusable block instances per block id.
+       :vartype pool: dict[int, tuple[Block, Block]]
        :ivar current_block: The current falling block.
        :vartype current_block: Block
        :ivar next_block: The next block to fall after the current one.
@@ -20,24 +33,56 @@ class Game:
        :vartype game_over: bool
        :ivar score: The player's current score.
        :vartype score: int
-       :ivar rotate_sound: Sound for block rotation.
-       :vartype rotate_sound: pygame.mixer.Sound
-       :ivar clear_sound: Sound for clearing rows.
-       :vartype clear_sound: pygame.mixer.Sound
+       :ivar listeners: Callbacks subscribed to game events, keyed by event name.
+       :vartype listeners: dict[str, list]
+
+       Ядро игры не зависит от pygame: звук и отрисовка подключаются через
+       :meth:`subscribe`. События: ``"rotate"``, ``"lock"``, ``"clear"`` (число
+       рядов), ``"garbage"`` (число рядов и столбец дыры), ``"game_over"`` и ``"reset"``.
        """
 
-    def __init__(self):
-        self.grid = Grid()
-        self.blocks = [IBlock(), JBlock(), LBlock(), OBlock(), SBlock(), TBlock(), ZBlock()]
+    def __init__(self, grid=None, seed=None, spawn_column=None):
+        self.grid = grid if grid is not None else BitGrid()
+        if spawn_column is None:
+            spawn_column = default_spawn_column(self.grid.num_cols)
+        if not 0 <= spawn_column <= self.grid.num_cols - 4:
+            raise ValueError(f"spawn column must be between 0 and {self.grid.num_cols - 4}, got {spawn_column}")
+        self.spawn_shift = spawn_column - SPAWN_COLUMN
+        self.randomizer = BagRandomizer(seed)
+        # текущий и следующий блок могут быть одного вида, поэтому по два экземпляра
+        self.pool = {block_class().id: (block_class(), block_class()) for block_class in BLOCKS}
+        self.current_block = None
+        self.next_block = None
         self.current_block = self.get_random_block()
         self.next_block = self.get_random_block()
         self.game_over = False
         self.score = 0
-        self.rotate_sound = pygame.mixer.Sound("Sounds/rotate.ogg")
-        self.clear_sound = pygame.mixer.Sound("Sounds/clear.ogg")
+        self.listeners = {}
+
+    def subscribe(self, event, callback):
+        """
+        Подписка на событие игры.
+
+        :param event: The event name, e.g. ``"rotate"`` or ``"clear"``.
+        :type event: str
+        :param callback: Called with the event arguments when the event fires.
+        :type callback: callable
+        :returns: None
+        :rtype: None
+        """
+        self.listeners.setdefault(event, []).append(callback)
+
+    def emit(self, event, *args):
+        """
+        Оповещение подписчиков о событии.
 
-        pygame.mixer.music.load("Sounds/music.ogg")
-        pygame.mixer.music.play(-1)
+        :param event: The event name.
+        :type event: str
+        :returns: None
+        :rtype: None
+        """
+        for callback in self.listeners.get(event, ()):
+            callback(*args)
 
     def update_score(self, lines_cleared, move_down_points):
         """
@@ -58,6 +103,16 @@ class Game:
             self.score += 500
         self.score += move_down_points
 
+    @property
+    def blocks(self):
+        """
+        Блоки, оставшиеся в текущем мешке.
+
+        :returns: Pooled blocks for the ids not yet drawn from the bag.
+        :rtype: list[Block]
+        """
+        return [self.pool[kind][0] for kind in self.randomizer.bag()]
+
     def get_random_block(self):
         """
                 Получение блока случайным образом
@@ -65,12 +120,33 @@ class Game:
                 :returns: A random block object.
                 :rtype: Block
                 """
-        if len(self.blocks) == 0:
-            self.blocks = [IBlock(), JBlock(), LBlock(), OBlock(), SBlock(), TBlock(), ZBlock()]
-        block = random.choice(self.blocks)
-        self.blocks.remove(block)
+        return self.take_block(self.randomizer.next())
+
+    def take_block(self, kind):
+        """
+        Выдача свободного блока из пула в начальном положении.
+
+        :param kind: The block id.
+        :type kind: int
+        :returns: A pooled block that is neither the current nor the next block.
+        :rtype: Block
+        """
+        first, second = self.pool[kind]
+        block = second if first is self.current_block or first is self.next_block else first
+        block.spawn(self.spawn_shift)
         return block
 
+    def upcoming(self, count):
+        """
+        Просмотр блоков, которые выпадут после ``next_block``.
+
+        :param count: The number of blocks to look ahead.
+        :type count: int
+        :returns: Block ids in the order they will be drawn.
+        :rtype: list[int]
+        """
+        return self.randomizer.peek(count)
+
     def move_left(self):
         """
                 Перемещение блока влево, если он не находится у стены.
@@ -108,6 +184,37 @@ class Game:
             self.current_block.move(-1, 0)
             self.lock_block()
 
+    def drop_distance(self):
+        """
+        Число рядов, на которое текущий блок может упасть.
+
+        :returns: The distance to the landing position.
+        :rtype: int
+        """
+        block = self.current_block
+        return self.grid.drop_distance(block.shapes[block.rotation_state], block.row_offset, block.column_offset)
+
+    def ghost_position(self):
+        """
+        Смещение по рядам, на котором текущий блок зафиксируется при сбросе.
+
+        :returns: The row offset of the landing position.
+        :rtype: int
+        """
+        return self.current_block.row_offset + self.drop_distance()
+
+    def hard_drop(self):
+        """
+        Мгновенный сброс текущего блока на место приземления и его фиксация.
+
+        :returns: The number of rows the block fell.
+        :rtype: int
+        """
+        distance = self.drop_distance()
+        self.current_block.move(distance, 0)
+        self.lock_block()
+        return distance
+
     def lock_block(self):
         """
         Фиксация текущего блока на месте, обновление счета играка, и удаление заполненных строк сетки
@@ -117,15 +224,44 @@ class Game:
         """
         tiles = self.current_block.get_cell_positions()
         for position in tiles:
-            self.grid.grid[position.row][position.column] = self.current_block.id
+            self.grid.set_cell(position.row, position.column, self.current_block.id)
+        self.emit("lock")
         self.current_block = self.next_block
         self.next_block = self.get_random_block()
         rows_cleared = self.grid.clear_full_rows()
         if rows_cleared > 0:
-            self.clear_sound.play()
+            self.emit("clear", rows_cleared)
             self.update_score(rows_cleared, 0)
         if self.block_fits() == False:
             self.game_over = True
+            self.emit("game_over")
+
+    def receive_garbage(self, count, hole):
+        """
+        Добавление мусорных рядов снизу; падающий блок поднимается вместе с доской.
+
+        Игра заканчивается, если занятые ячейки вытолкнуты за верх сетки или
+        блоку некуда подняться.
+
+        :param count: The number of garbage rows.
+        :type count: int
+        :param hole: The empty column of the garbage rows.
+        :type hole: int
+        :returns: None
+        :rtype: None
+        """
+        if count <= 0 or self.game_over:
+            return
+        overflow = self.grid.add_garbage(count, hole)
+        block = self.current_block
+        lifted = 0
+        while not self.block_fits() and lifted < count:
+            block.move(-1, 0)
+            lifted += 1
+        self.emit("garbage", count, hole)
+        if overflow or not self.block_fits():
+            self.game_over = True
+            self.emit("game_over")
 
     def reset(self):
         """
@@ -135,10 +271,76 @@ class Game:
         :rtype: None
         """
         self.grid.reset()
-        self.blocks = [IBlock(), JBlock(), LBlock(), OBlock(), SBlock(), TBlock(), ZBlock()]
+        self.randomizer.new_bag()
+        self.current_block = None
+        self.next_block = None
         self.current_block = self.get_random_block()
         self.next_block = self.get_random_block()
         self.score = 0
+        self.emit("reset")
+
+    def zobrist_hash(self):
+        """
+        64-битный хеш Зобриста состояния игры: сетка, текущий и следующий блок, мешок.
+
+        Хеш сетки поддерживается инкрементально, остальные слагаемые
+        вычисляются за O(1).
+
+        :returns: The hash of the game state.
+        :rtype: int
+        """
+        zobrist = self.grid.zobrist
+        key = (self.grid.zobrist_hash() ^ zobrist.block(self.current_block, CURRENT) ^
+               zobrist.block(self.next_block, NEXT))
+        for kind in self.randomizer.bag():
+            key ^= zobrist.bag[kind]
+        return key
+
+    def snapshot(self):
+        """
+        Снимок полного состояния игры из неизменяемых значений, без deepcopy.
+
+        :returns: State that can be passed to :meth:`restore`.
+        :rtype: tuple
+        """
+        current, following = self.current_block, self.next_block
+        return (self.grid.snapshot(),
+                (current.id, current.rotation_state, current.row_offset, current.column_offset),
+                (following.id, following.rotation_state, following.row_offset, following.column_offset),
+                self.randomizer.state(), self.score, self.game_over)
+
+    def restore(self, state):
+        """
+        Возврат игры к снимку.
+
+        :param state: A value returned by :meth:`snapshot`.
+        :type state: tuple
+        :returns: None
+        :rtype: None
+        """
+        grid, current, following, randomizer, self.score, self.game_over = state
+        self.grid.restore(grid)
+        self.randomizer.set_state(randomizer)
+        self.current_block = None
+        self.next_block = None
+        self.current_block = self.restore_block(current)
+        self.next_block = self.restore_block(following)
+
+    def restore_block(self, state):
+        """
+        Выдача блока из пула с сохраненным поворотом и смещениями.
+
+        :param state: Block id, rotation state, row offset and column offset.
+        :type state: tuple
+        :returns: The restored block.
+        :rtype: Block
+        """
+        kind, rotation_state, row_offset, column_offset = state
+        block = self.take_block(kind)
+        block.rotation_state = rotation_state
+        block.row_offset = row_offset
+        block.column_offset = column_offset
+        return block
 
     def block_fits(self):
         """
@@ -147,11 +349,7 @@ class Game:
         :returns: Boolean indicating if the block fits.
         :rtype: bool
         """
-        tiles = self.current_block.get_cell_positions()
-        for tile in tiles:
-            if self.grid.is_empty(tile.row, tile.column) == False:
-                return False
-        return True
+        return self.grid.fits(self.current_block)
 
     def rotate(self):
         """
@@ -165,7 +363,7 @@ class Game:
         if self.block_inside() == False or self.block_fits() == False:
             self.current_block.undo_rotation()
         else:
-            self.rotate_sound.play()
+            self.emit("rotate")
 
     def block_inside(self):
         """
@@ -174,11 +372,8 @@ class Game:
         :returns: Boolean indicating if the block is inside.
         :rtype: bool
         """
-        tiles = self.current_block.get_cell_positions()
-        for tile in tiles:
-            if self.grid.is_inside(tile.row, tile.column) == False:
-                return False
-        return True
+        block = self.current_block
+        return self.grid.shape_inside(block.shapes[block.rotation_state], block.row_offset, block.column_offset)
 
     def draw(self, screen):
         """
@@ -189,12 +384,28 @@ class Game:
         :returns: None
         :rtype: None
         """
+        from renderer import PREVIEW_CELL_SIZE
+        size = self.grid.cell_size
         self.grid.draw(screen)
-        self.current_block.draw(screen, 11, 11)
+        self.current_block.draw(screen, 11, 11 + self.drop_distance() * size, ghost=True, cell_size=size)
+        self.current_block.draw(screen, 11, 11, cell_size=size)
+        self.next_block.draw(screen, *self.preview_offset(), cell_size=PREVIEW_CELL_SIZE)
 
+    def preview_offset(self):
+        """
+        Смещение для отрисовки следующего блока в панели "Next".
+
+        Блок в панели рисуется с ячейками ``renderer.PREVIEW_CELL_SIZE``, а
+        панель сдвинута вправо на разницу ширины доски и доски 20x10, поэтому
+        смещение учитывает этот сдвиг и сдвиг столбца появления.
+
+        :returns: The (x, y) drawing offset of ``next_block``.
+        :rtype: tuple[int, int]
+        """
+        from renderer import PREVIEW_CELL_SIZE, panel_shift
+        shift = panel_shift(self.grid) - self.spawn_shift * PREVIEW_CELL_SIZE
         if self.next_block.id == 3:
-            self.next_block.draw(screen, 255, 290)
+            return 255 + shift, 290
         elif self.next_block.id == 4:
-            self.next_block.draw(screen, 255, 280)
-        else:
-            self.next_block.draw(screen, 270, 270)
+            return 255 + shift, 280
+        return 270 + shift, 270
@@ -1,14 +1,75 @@
-import pygame
+import copy
+from collections import namedtuple
+
 from colors import Colors
+from zobrist import table_for
+
+# Значение ячеек мусорных рядов, которые присылает соперник
+GARBAGE = 8
+
+Features = namedtuple("Features", ["heights", "aggregate_height", "holes", "bumpiness", "wells",
+                                   "row_transitions"])
+Features.__doc__ = """
+Признаки доски для оценки положения блока.
+
+- `heights`: Height of every column.
+- `aggregate_height`: Sum of the column heights.
+- `holes`: Empty cells with a filled cell somewhere above them.
+- `bumpiness`: Sum of absolute height differences of neighbouring columns.
+- `wells`: Sum of well depths, a well being a column lower than both neighbours (walls count as full).
+- `row_transitions`: Filled/empty changes along every row, walls counted as filled.
+"""
+
+
+def make_features(heights, holes, row_transitions, num_rows):
+    """
+    Построение вектора признаков по высотам столбцов.
+
+    :param heights: Height of every column.
+    :type heights: list[int]
+    :param holes: The number of holes on the board.
+    :type holes: int
+    :param row_transitions: Total row transitions on the board.
+    :type row_transitions: int
+    :param num_rows: The number of rows, used as the height of the walls.
+    :type num_rows: int
+    :returns: The feature vector.
+    :rtype: Features
+    """
+    bumpiness = 0
+    wells = 0
+    last = len(heights) - 1
+    for column, height in enumerate(heights):
+        left = heights[column - 1] if column > 0 else num_rows
+        right = heights[column + 1] if column < last else num_rows
+        if column < last:
+            bumpiness += abs(height - right)
+        depth = min(left, right) - height
+        if depth > 0:
+            wells += depth
+    return Features(tuple(heights), sum(heights), holes, bumpiness, wells, row_transitions)
 
 
 class Grid:
-    def __init__(self):
-        self.num_rows = 20
-        self.num_cols = 10
-        self.cell_size = 30
+    """
+    Игровое поле: цвета ячеек по рядам.
+
+    :param num_rows: The number of rows.
+    :type num_rows: int
+    :param num_cols: The number of columns.
+    :type num_cols: int
+    :param cell_size: The size of a cell on screen in pixels.
+    :type cell_size: int
+    """
+    def __init__(self, num_rows=20, num_cols=10, cell_size=30):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.cell_size = cell_size
         self.grid = [[0 for j in range(self.num_cols)] for i in range(self.num_rows)]
         self.colors = Colors.get_cell_colors()
+        self.zobrist = table_for(self.num_rows, self.num_cols)
+        # индексы рядов, удаленных последним вызовом clear_full_rows, по возрастанию
+        self.cleared_rows = []
 
     def print_grid(self):
         """
@@ -52,6 +113,87 @@ class Grid:
             return True
         return False
 
+    def set_cell(self, row, column, value):
+        """
+        Запись значения в ячейку сетки
+
+        :param row: The row index of the cell.
+        :type row: int
+        :param column: The column index of the cell.
+        :type column: int
+        :param value: The block id to store, 0 for an empty cell.
+        :type value: int
+        :returns: None
+        :rtype: None
+        """
+        self.grid[row][column] = value
+
+    def shape_inside(self, shape, row_offset, column_offset):
+        """
+        Проверка нахождения формы блока в границах сетки
+
+        :param shape: The block rotation to check.
+        :type shape: Shape
+        :param row_offset: The row offset of the block.
+        :type row_offset: int
+        :param column_offset: The column offset of the block.
+        :type column_offset: int
+        :returns: Boolean indicating if every cell of the shape is inside.
+        :rtype: bool
+        """
+        return (row_offset + shape.min_row >= 0 and row_offset + shape.max_row < self.num_rows and
+                column_offset + shape.min_column >= 0 and column_offset + shape.max_column < self.num_cols)
+
+    def can_place(self, shape, row_offset, column_offset):
+        """
+        Проверка, что форма блока помещается в сетку и не пересекает занятые ячейки
+
+        :param shape: The block rotation to check.
+        :type shape: Shape
+        :param row_offset: The row offset of the block.
+        :type row_offset: int
+        :param column_offset: The column offset of the block.
+        :type column_offset: int
+        :returns: Boolean indicating if the placement is valid.
+        :rtype: bool
+        """
+        if not self.shape_inside(shape, row_offset, column_offset):
+            return False
+        grid = self.grid
+        for row, column in shape.offsets:
+            if grid[row + row_offset][column + column_offset] != 0:
+                return False
+        return True
+
+    def drop_distance(self, shape, row_offset, column_offset):
+        """
+        На сколько рядов блок может опуститься до столкновения
+
+        :param shape: The block rotation, at a valid placement.
+        :type shape: Shape
+        :param row_offset: The row offset of the block.
+        :type row_offset: int
+        :param column_offset: The column offset of the block.
+        :type column_offset: int
+        :returns: The number of rows to the landing position.
+        :rtype: int
+        """
+        distance = 0
+        while self.can_place(shape, row_offset + distance + 1, column_offset):
+            distance += 1
+        return distance
+
+    def fits(self, block):
+        """
+        Проверка, что блок помещается в сетку на своей текущей позиции
+
+        :param block: The block to check.
+        :type block: Block
+        :returns: Boolean indicating if the block fits.
+        :rtype: bool
+        """
+        return self.can_place(block.shapes[block.rotation_state], block.row_offset, block.column_offset)
+
     def is_row_full(self, row):
         """
         Проверка полного заполнения ряда в сетке
@@ -97,17 +239,178 @@ class Grid:
         """
         Очищение заполненных рядов в сетке, и соответствующе переместите вниз
 
+        Время пропорционально числу рядов, а не ячеек: удаленные ряды
+        вырезаются из списка, сверху добавляются пустые.
+
+        :returns: The number of rows cleared, their indices are kept in ``cleared_rows``.
+        :rtype: int
+        """
+        # ряд 0 не проверяется; ряды вырезаются целиком, без переноса ячеек по одной
+        cleared = [row for row in range(1, self.num_rows) if self.is_row_full(row)]
+        self.cleared_rows = cleared
+        if cleared:
+            self.remove_rows(cleared)
+        return len(cleared)
+
+    def remove_rows(self, cleared):
+        """
+        Удаление рядов из цветов ячеек с добавлением пустых рядов сверху
+
+        :param cleared: Indices of the rows to remove, in ascending order.
+        :type cleared: list[int]
+        :returns: None
+        :rtype: None
+        """
+        for row in cleared:
+            del self.grid[row]
+            self.grid.insert(0, [0] * self.num_cols)
+
+    def add_garbage(self, count, hole):
+        """
+        Сдвиг доски вверх и добавление снизу мусорных рядов с одной дырой
+
+        :param count: The number of garbage rows.
+        :type count: int
+        :param hole: The empty column of the garbage rows.
+        :type hole: int
+        :returns: True if filled cells were pushed out over the top.
+        :rtype: bool
+        """
+        if count <= 0:
+            return False
+        count = min(count, self.num_rows)
+        overflow = any(self.grid[row][column] for row in range(count) for column in range(self.num_cols))
+        self.grid[:self.num_rows - count] = self.grid[count:]
+        self.grid[self.num_rows - count:] = [[0 if column == hole else GARBAGE for column in range(self.num_cols)]
+                                             for _ in range(count)]
+        return overflow
+
+    def place(self, shape, row_offset, column_offset, value):
+        """
+        Фиксация формы блока на сетке и удаление заполненных рядов
+
+        :param shape: The block rotation to place.
+        :type shape: Shape
+        :param row_offset: The row offset of the block.
+        :type row_offset: int
+        :param column_offset: The column offset of the block.
+        :type column_offset: int
+        :param value: The block id to store in the cells.
+        :type value: int
         :returns: The number of rows cleared.
         :rtype: int
         """
-        completed = 0
-        for row in range(self.num_rows - 1, 0, -1):
-            if self.is_row_full(row):
-                self.clear_row(row)
-                completed += 1
-            elif completed > 0:
-                self.move_row_down(row, completed)
-        return completed
+        for row, column in shape.offsets:
+            self.set_cell(row + row_offset, column + column_offset, value)
+        return self.clear_full_rows()
+
+    def copy(self):
+        """
+        Независимая копия сетки
+
+        :returns: A grid with the same cells that can be changed separately.
+        :rtype: Grid
+        """
+        clone = copy.copy(self)
+        clone.grid = [row[:] for row in self.grid]
+        return clone
+
+    def occupancy_key(self):
+        """
+        Хешируемый ключ занятых ячеек сетки, без учета цветов
+
+        :returns: One bitmask per row.
+        :rtype: tuple[int]
+        """
+        return tuple(sum(1 << column for column, value in enumerate(row) if value) for row in self.grid)
+
+    def features(self):
+        """
+        Признаки доски, вычисленные полным просмотром сетки
+
+        :returns: The feature vector of the board.
+        :rtype: Features
+        """
+        heights = [0] * self.num_cols
+        holes = 0
+        transitions = 0
+        for row in range(self.num_rows):
+            previous = 1
+            for column, value in enumerate(self.grid[row]):
+                filled = 1 if value else 0
+                transitions += filled != previous
+                previous = filled
+                if filled and heights[column] == 0:
+                    heights[column] = self.num_rows - row
+                elif not filled and heights[column] > 0:
+                    holes += 1
+            transitions += previous != 1
+        return make_features(heights, holes, transitions, self.num_rows)
+
+    def features_after(self, shape, row_offset, column_offset):
+        """
+        Признаки доски после гипотетической фиксации блока, без изменения сетки
+
+        :param shape: The block rotation to place.
+        :type shape: Shape
+        :param row_offset: The row offset of the block.
+        :type row_offset: int
+        :param column_offset: The column offset of the block.
+        :type column_offset: int
+        :returns: The number of rows the placement clears and the resulting features.
+        :rtype: tuple[int, Features]
+        """
+        board = self.copy()
+        lines = board.place(shape, row_offset, column_offset, 1)
+        return lines, board.features()
+
+    def zobrist_hash(self):
+        """
+        64-битный хеш Зобриста всех ячеек сетки
+
+        :returns: XOR of the row keys of every row, see :class:`ZobristTable`.
+        :rtype: int
+        """
+        key = 0
+        for row in range(self.num_rows):
+            key ^= self.zobrist.row(row, self.row_content(row))
+        return key
+
+    def row_content(self, row):
+        """
+        Ключ содержимого ряда: XOR ключей его заполненных ячеек
+
+        :param row: The row index.
+        :type row: int
+        :returns: The 64-bit content key, 0 for an empty row.
+        :rtype: int
+        """
+        cell = self.zobrist.cell
+        content = 0
+        for column, value in enumerate(self.grid[row]):
+            if value:
+                content ^= cell(column, int(value))
+        return content
+
+    def snapshot(self):
+        """
+        Неизменяемый снимок содержимого сетки
+
+        :returns: State that can be passed to :meth:`restore`.
+        :rtype: tuple
+        """
+        return tuple(map(tuple, self.grid))
+
+    def restore(self, state):
+        """
+        Восстановление сетки из снимка
+
+        :param state: A value returned by :meth:`snapshot`.
+        :type state: tuple
+        :returns: None
+        :rtype: None
+        """
+        self.grid = [list(row) for row in state]
 
     def reset(self):
         """
@@ -129,9 +432,446 @@ class Grid:
         :returns: None
         :rtype: None
         """
-        for row in range(self.num_rows):
-            for column in range(self.num_cols):
-                cell_value = self.grid[row][column]
-                cell_rect = pygame.Rect(column * self.cell_size + 11, row * self.cell_size + 11,
-                                        self.cell_size - 1, self.cell_size - 1)
-                pygame.draw.rect(screen, self.colors[cell_value], cell_rect)
+        from tiles import atlas_for
+        tiles = atlas_for(self.cell_size, self.colors).tiles
+        size = self.cell_size
+        screen.blits([(tiles[cell_value], (column * size + 11, row * size + 11))
+                      for row, cells in enumerate(self.grid) for column, cell_value in enumerate(cells)],
+                     False)
+
+
+class BitGrid(Grid):
+    """
+    Сетка, хранящая каждый ряд как битовую маску занятости.
+
+    Цвета ячеек по-прежнему доступны через ``grid[row][column]``, но запись
+    должна идти через :meth:`set_cell`, иначе маски рассинхронизируются.
+    Высоты столбцов, число дыр, переходы по рядам и хеш Зобриста
+    обновляются инкрементально при фиксации блоков и удалении рядов.
+
+    :ivar rows: Occupancy bitmask per row, bit ``column`` set for a filled cell.
+    :vartype rows: list[int]
+    :ivar full_mask: Bitmask of a completely filled row.
+    :vartype full_mask: int
+    :ivar heights: Height of every column.
+    :vartype heights: list[int]
+    :ivar holes: The number of holes on the board.
+    :vartype holes: int
+    :ivar transitions: Row transitions of every row.
+    :vartype transitions: list[int]
+    :ivar row_transitions: Total row transitions on the board.
+    :vartype row_transitions: int
+    :ivar contents: Zobrist content key of every row, see :meth:`Grid.row_content`.
+    :vartype contents: list[int]
+    :ivar hash: Zobrist hash of the cells.
+    :vartype hash: int
+    """
+    def __init__(self, num_rows=20, num_cols=10, cell_size=30):
+        super().__init__(num_rows, num_cols, cell_size)
+        self.full_mask = (1 << self.num_cols) - 1
+        self.rows = [0] * self.num_rows
+        self.recompute_features()
+
+    def row_transitions_of(self, mask):
+        """
+        Число переходов занято/пусто в ряду, стены считаются занятыми
+
+        :param mask: The occupancy bitmask of the row.
+        :type mask: int
+        :returns: The number of transitions.
+        :rtype: int
+        """
+        walled = mask << 1 | 1 | 1 << (self.num_cols + 1)
+        return ((walled ^ walled >> 1) & ((1 << (self.num_cols + 1)) - 1)).bit_count()
+
+    def column_profile(self, rows, column):
+        """
+        Высота столбца и число дыр в нем по списку масок рядов
+
+        :param rows: Occupancy bitmask per row.
+        :type rows: list[int]
+        :param column: The column index to scan.
+        :type column: int
+        :returns: The column height and the number of holes in the column.
+        :rtype: tuple[int, int]
+        """
+        bit = 1 << column
+        height = 0
+        holes = 0
+        for row, mask in enumerate(rows):
+            if mask & bit:
+                if height == 0:
+                    height = len(rows) - row
+            elif height > 0:
+                holes += 1
+        return height, holes
+
+    def recompute_features(self):
+        """
+        Полный пересчет высот, дыр, переходов и хеша сетки
+
+        :returns: None
+        :rtype: None
+        """
+        self.heights = [0] * self.num_cols
+        self.holes = 0
+        for column in range(self.num_cols):
+            self.heights[column], holes = self.column_profile(self.rows, column)
+            self.holes += holes
+        self.transitions = [self.row_transitions_of(mask) for mask in self.rows]
+        self.row_transitions = sum(self.transitions)
+        self.contents = [self.row_content(row) for row in range(self.num_rows)]
+        self.hash = self.rows_hash(self.num_rows)
+
+    def is_empty(self, row, column):
+        """
+        Проверка, пуста ли определенная ячейка в сетке
+
+        :param row: The row index to check.
+        :type row: int
+        :param column: The column index to check.
+        :type column: int
+        :returns: Boolean indicating if the cell is empty.
+        :rtype: bool
+        """
+        return not self.rows[row] >> column & 1
+
+    def set_cell(self, row, column, value):
+        """
+        Запись значения в ячейку сетки с обновлением маски ряда и признаков
+
+        :param row: The row index of the cell.
+        :type row: int
+        :param column: The column index of the cell.
+        :type column: int
+        :param value: The block id to store, 0 for an empty cell.
+        :type value: int
+        :returns: None
+        :rtype: None
+        """
+        cells = self.grid[row]
+        zobrist = self.zobrist
+        content = self.contents[row]
+        updated = content ^ zobrist.cell(column, int(cells[column])) ^ zobrist.cell(column, value)
+        self.hash ^= zobrist.row(row, content) ^ zobrist.row(row, updated)
+        self.contents[row] = updated
+        cells[column] = value
+        bit = 1 << column
+        mask = self.rows[row]
+        if bool(value) == bool(mask & bit):
+            return
+        if not value:
+            self.rows[row] = mask & ~bit
+            self.recompute_features()
+            return
+        mask |= bit
+        self.rows[row] = mask
+        top = self.num_rows - self.heights[column]
+        if row < top:
+            self.holes += top - row - 1
+            self.heights[column] = self.num_rows - row
+        else:
+            self.holes -= 1
+        transitions = self.row_transitions_of(mask)
+        self.row_transitions += transitions - self.transitions[row]
+        self.transitions[row] = transitions
+
+    def can_place(self, shape, row_offset, column_offset):
+        """
+        Проверка столкновений: одна операция AND на каждый ряд блока
+
+        :param shape: The block rotation to check.
+        :type shape: Shape
+        :param row_offset: The row offset of the block.
+        :type row_offset: int
+        :param column_offset: The column offset of the block.
+        :type column_offset: int
+        :returns: Boolean indicating if the placement is valid.
+        :rtype: bool
+        """
+        shift = column_offset + shape.min_column
+        if (row_offset + shape.min_row < 0 or row_offset + shape.max_row >= self.num_rows or
+                shift < 0 or column_offset + shape.max_column >= self.num_cols):
+            return False
+        rows = self.rows
+        for row, mask in shape.row_masks:
+            if rows[row + row_offset] & mask << shift:
+                return False
+        return True
+
+    def drop_distance(self, shape, row_offset, column_offset):
+        """
+        Расстояние падения по нижнему профилю блока и высотам столбцов
+
+        Если блок находится под нависающей ячейкой хотя бы в одном столбце,
+        расстояние ищется проверкой масок ряд за рядом.
+
+        :param shape: The block rotation, at a valid placement.
+        :type shape: Shape
+        :param row_offset: The row offset of the block.
+        :type row_offset: int
+        :param column_offset: The column offset of the block.
+        :type column_offset: int
+        :returns: The number of rows to the landing position.
+        :rtype: int
+        """
+        num_rows = self.num_rows
+        heights = self.heights
+        distance = num_rows
+        for column, bottom in shape.bottoms:
+            gap = num_rows - heights[column + column_offset] - bottom - row_offset - 1
+            if gap < 0:
+                return super().drop_distance(shape, row_offset, column_offset)
+            if gap < distance:
+                distance = gap
+        return distance
+
+    def is_row_full(self, row):
+        """
+        Проверка полного заполнения ряда в сетке
+
+        :param row: The row index to check.
+        :type row: int
+        :returns: Boolean indicating if the row is full.
+        :rtype: bool
+        """
+        return self.rows[row] == self.full_mask
+
+    def clear_row(self, row):
+        """
+        Очищение ряда в сетке
+
+        :param row: The row index to clear.
+        :type row: int
+        :returns: None
+        :rtype: None
+        """
+        self.rows[row] = 0
+        self.grid[row] = [0] * self.num_cols
+        self.recompute_features()
+
+    def move_row_down(self, row, num_rows):
+        """
+        Перемещение рядов и расположенных над ним, на указанное количество рядов
+
+        :param row: The row index to start the movement.
+        :type row: int
+        :param num_rows: The number of rows to move down.
+        :type num_rows: int
+        :returns: None
+        :rtype: None
+        """
+        self.rows[row + num_rows] = self.rows[row]
+        self.grid[row + num_rows] = self.grid[row]
+        self.rows[row] = 0
+        self.grid[row] = [0] * self.num_cols
+        self.recompute_features()
+
+    def clear_full_rows(self):
+        """
+        Очищение заполненных рядов вырезанием из списков и добавлением пустых рядов сверху
+
+        Высоты столбцов уменьшаются на число удаленных рядов, а дыры не
+        меняются; пересчитываются только столбцы, вершина которых была в
+        удаленном ряду. Хеш сдвинутых рядов пересчитывается по одному ключу
+        содержимого на ряд.
+
+        :returns: The number of rows cleared, their indices are kept in ``cleared_rows``.
+        :rtype: int
+        """
+        rows = self.rows
+        full_mask = self.full_mask
+        # ряд 0 не проверяется, как и в Grid.clear_full_rows
+        cleared = [row for row in range(1, self.num_rows) if rows[row] == full_mask]
+        self.cleared_rows = cleared
+        if not cleared:
+            return 0
+        exposed = [column for column, height in enumerate(self.heights) if self.num_rows - height in cleared]
+        holes_before = sum(self.column_profile(rows, column)[1] for column in exposed)
+        # ряды ниже последнего удаленного не сдвигаются, их ключи остаются в хеше
+        moved = cleared[-1] + 1
+        self.hash ^= self.rows_hash(moved)
+        empty_transitions = self.row_transitions_of(0)
+        for row in cleared:
+            del rows[row]
+            del self.transitions[row]
+            del self.contents[row]
+            rows.insert(0, 0)
+            self.transitions.insert(0, empty_transitions)
+            self.contents.insert(0, 0)
+        self.remove_rows(cleared)
+        count = len(cleared)
+        self.row_transitions += empty_transitions * count
+        self.heights = [height - count for height in self.heights]
+        for column in exposed:
+            self.heights[column], holes = self.column_profile(rows, column)
+            self.holes += holes
+        self.holes -= holes_before
+        self.hash ^= self.rows_hash(moved)
+        return count
+
+    def add_garbage(self, count, hole):
+        """
+        Сдвиг доски вверх и добавление снизу мусорных рядов с одной дырой
+
+        :param count: The number of garbage rows.
+        :type count: int
+        :param hole: The empty column of the garbage rows.
+        :type hole: int
+        :returns: True if filled cells were pushed out over the top.
+        :rtype: bool
+        """
+        if count <= 0:
+            return False
+        overflow = super().add_garbage(count, hole)
+        count = min(count, self.num_rows)
+        self.rows[:self.num_rows - count] = self.rows[count:]
+        self.rows[self.num_rows - count:] = [self.full_mask & ~(1 << hole)] * count
+        self.recompute_features()
+        return overflow
+
+    def rows_hash(self, num_rows):
+        """
+        Вклад верхних рядов в хеш Зобриста, по ключам содержимого рядов
+
+        :param num_rows: The number of rows to hash, counted from the top.
+        :type num_rows: int
+        :returns: XOR of the row keys.
+        :rtype: int
+        """
+        key = 0
+        row_key = self.zobrist.row
+        contents = self.contents
+        for row in range(num_rows):
+            if contents[row]:
+                key ^= row_key(row, contents[row])
+        return key
+
+    def zobrist_hash(self):
+        """
+        64-битный хеш Зобриста всех ячеек сетки
+
+        :returns: The incrementally maintained hash.
+        :rtype: int
+        """
+        return self.hash
+
+    def snapshot(self):
+        """
+        Неизменяемый снимок сетки вместе с признаками и хешем
+
+        :returns: State that can be passed to :meth:`restore`.
+        :rtype: tuple
+        """
+        return (tuple(self.rows), tuple(map(tuple, self.grid)), tuple(self.heights), self.holes,
+                tuple(self.transitions), self.row_transitions, tuple(self.contents), self.hash)
+
+    def restore(self, state):
+        """
+        Восстановление сетки из снимка
+
+        :param state: A value returned by :meth:`snapshot`.
+        :type state: tuple
+        :returns: None
+        :rtype: None
+        """
+        rows, grid, heights, self.holes, transitions, self.row_transitions, contents, self.hash = state
+        self.rows = list(rows)
+        self.grid = [list(row) for row in grid]
+        self.heights = list(heights)
+        self.transitions = list(transitions)
+        self.contents = list(contents)
+
+    def features(self):
+        """
+        Признаки доски из инкрементально поддерживаемых значений
+
+        :returns: The feature vector of the board.
+        :rtype: Features
+        """
+        return make_features(self.heights, self.holes, self.row_transitions, self.num_rows)
+
+    def features_after(self, shape, row_offset, column_offset):
+        """
+        Признаки доски после гипотетической фиксации блока, без изменения сетки
+
+        :param shape: The block rotation to place, must be a valid placement.
+        :type shape: Shape
+        :param row_offset: The row offset of the block.
+        :type row_offset: int
+        :param column_offset: The column offset of the block.
+        :type column_offset: int
+        :returns: The number of rows the placement clears and the resulting features.
+        :rtype: tuple[int, Features]
+        """
+        num_rows = self.num_rows
+        heights = self.heights[:]
+        holes = self.holes
+        for row, column in shape.offsets:
+            row += row_offset
+            column += column_offset
+            top = num_rows - heights[column]
+            if row < top:
+                holes += top - row - 1
+                heights[column] = num_rows - row
+            else:
+                holes -= 1
+        shift = column_offset + shape.min_column
+        transitions = self.row_transitions
+        cleared = []
+        for row, mask in shape.row_masks:
+            row += row_offset
+            mask = self.rows[row] | mask << shift
+            transitions -= self.transitions[row]
+            if mask == self.full_mask and row > 0:
+                cleared.append(row)
+            else:
+                transitions += self.row_transitions_of(mask)
+        lines = len(cleared)
+        if lines:
+            transitions += self.row_transitions_of(0) * lines
+            exposed = [column for column, height in enumerate(heights) if num_rows - height in cleared]
+            heights = [height - lines for height in heights]
+            if exposed:
+                rows = self.rows[:]
+                for row, mask in shape.row_masks:
+                    rows[row + row_offset] |= mask << shift
+                remaining = [0] * lines + [mask for row, mask in enumerate(rows) if row not in cleared]
+                for column in exposed:
+                    heights[column], column_holes = self.column_profile(remaining, column)
+                    holes += column_holes - self.column_profile(rows, column)[1]
+        return lines, make_features(heights, holes, transitions, num_rows)
+
+    def reset(self):
+        """
+        Сбросить сетку, установив для всех ячеек значение "empty" (0)
+
+        :returns: None
+        :rtype: None
+        """
+        super().reset()
+        self.rows = [0] * self.num_rows
+        self.recompute_features()
+
+    def copy(self):
+        """
+        Независимая копия сетки
+
+        :returns: A grid with the same cells that can be changed separately.
+        :rtype: BitGrid
+        """
+        clone = super().copy()
+        clone.rows = self.rows[:]
+        clone.heights = self.heights[:]
+        clone.transitions = self.transitions[:]
+        clone.contents = self.contents[:]
+        return clone
+
+    def occupancy_key(self):
+        """
+        Хешируемый ключ занятых ячеек сетки, без учета цветов
+
+        :returns: One bitmask per row.
+        :rtype: tuple[int]
+        """
+        return tuple(self.rows)
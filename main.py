@@ -1,63 +1,168 @@
+from time import perf_counter
+# Время до первого кадра считается от запуска скрипта, включая импорты
+STARTED = perf_counter()
+import argparse, os, random
 import pygame, sys
 from game import Game
-from colors import Colors
+from grid import BitGrid
+from audio import Audio, pre_init
+from controls import InputHandler, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP
+from renderer import Renderer, fit_cell_size, window_size
+from profiler import Profiler, ProfilerOverlay
+from replay import ReplayRecorder, GRAVITY, RESET, apply_replay_action
 
-pygame.init()
+# Шаг симуляции (гравитация) не зависит от частоты отрисовки
+GRAVITY_INTERVAL = 0.2
+# Не догоняем больше стольких шагов после долгой паузы
+MAX_CATCH_UP = 5
+# Показ панели профилировщика
+PROFILER_KEY = pygame.K_F3
 
-title_font = pygame.font.Font(None, 40)
-score_surface = title_font.render("Score", True, Colors.white)
-next_surface = title_font.render("Next", True, Colors.white)
-game_over_surface = title_font.render("GAME OVER", True, Colors.white)
+KEY_ACTIONS = {pygame.K_LEFT: LEFT, pygame.K_RIGHT: RIGHT, pygame.K_DOWN: DOWN, pygame.K_UP: ROTATE,
+               pygame.K_SPACE: HARD_DROP}
+
+parser = argparse.ArgumentParser(description="Python Tetris")
+parser.add_argument("--rows", type=int, default=20, help="board height in cells")
+parser.add_argument("--cols", type=int, default=10, help="board width in cells")
+parser.add_argument("--cell-size", type=int, default=None,
+                    help="cell size in pixels, fitted to the screen by default")
+parser.add_argument("--spawn-column", type=int, default=None, help="column of new blocks, centered by default")
+args = parser.parse_args()
+if args.rows < 4 or args.cols < 4:
+    parser.error("the board must be at least 4x4")
+if args.spawn_column is not None and not 0 <= args.spawn_column <= args.cols - 4:
+    parser.error(f"the spawn column must be between 0 and {args.cols - 4}")
 
-score_rect = pygame.Rect(320, 55, 170, 60)
-next_rect = pygame.Rect(320, 215, 170, 180)
+# Только нужные модули pygame; микшер настраивается до инициализации
+pre_init()
+pygame.display.init()
+pygame.font.init()
 
-screen = pygame.display.set_mode((500, 620))
+title_font = pygame.font.Font(None, 40)
+
+cell_size = args.cell_size or fit_cell_size(args.rows, args.cols)
+grid = BitGrid(args.rows, args.cols, cell_size)
+screen = pygame.display.set_mode(window_size(grid))
 pygame.display.set_caption("Python Tetris")
 
-clock = pygame.time.Clock()
+seed = random.getrandbits(32)
+game = Game(grid, seed, args.spawn_column)
+# Журнал пишется, только если задана TETRIS_REPLAY, иначе он рос бы всю сессию
+replay_path = os.environ.get("TETRIS_REPLAY")
+if replay_path:
+    recorder = ReplayRecorder(game, seed)
+    apply = recorder.apply
+else:
+    recorder = None
 
-game = Game()
+    def apply(action, timestamp):
+        apply_replay_action(game, action)
+# Звуки декодируются в фоне, музыка включается после первого кадра
+audio = Audio()
+audio.attach(game)
+renderer = Renderer(game, screen, title_font)
+inputs = InputHandler()
+# Кадры пишутся в JSONL, если задана TETRIS_PROFILE; иначе профилировщик включается клавишей
+profiler = Profiler(os.environ.get("TETRIS_PROFILE"), memory=bool(os.environ.get("TETRIS_PROFILE_MEMORY")))
+profiler.attach(game)
+overlay = ProfilerOverlay(profiler, renderer, pygame.font.Font(None, 20))
+first_frame = True
+sounds_noted = False
 
-GAME_UPDATE = pygame.USEREVENT
-pygame.time.set_timer(GAME_UPDATE, 200)
+# Окно свернуто или скрыто: не рисуем и не двигаем блок
+paused = False
+# Окно без фокуса: блок падает, но кадры не рисуются
+focused = True
+next_tick = perf_counter() + GRAVITY_INTERVAL
 
 while True:
-    for event in pygame.event.get():
+    if paused or game.game_over:
+        timeout = 0  # ждать событие без ограничения
+    else:
+        wake = next_tick
+        pending = inputs.next_time()
+        if pending is not None:
+            wake = min(wake, pending)
+        timeout = max(1, int((wake - perf_counter()) * 1000) + 1)
+    events = [pygame.event.wait(timeout)] + pygame.event.get()
+    # отметка времени берется сразу после выборки событий
+    received = perf_counter()
+    profiler.begin_frame()
+
+    for event in events:
         if event.type == pygame.QUIT:
+            if recorder is not None:
+                with open(replay_path, "wb") as replay_file:
+                    replay_file.write(recorder.finish())
+            profiler.close()
             pygame.quit()
             sys.exit()
+        if event.type in (pygame.WINDOWMINIMIZED, pygame.WINDOWHIDDEN):
+            paused = True
+            inputs.clear()
+        elif event.type == pygame.WINDOWFOCUSLOST:
+            # отпускание клавиш без фокуса не приходит, но игра продолжается
+            focused = False
+            inputs.clear()
+        elif event.type == pygame.WINDOWFOCUSGAINED:
+            focused = True
+            renderer.invalidate()
+        elif event.type in (pygame.WINDOWRESTORED, pygame.WINDOWSHOWN):
+            if paused:
+                paused = False
+                next_tick = perf_counter() + GRAVITY_INTERVAL
+            renderer.invalidate()
+        elif event.type == pygame.WINDOWEXPOSED:
+            renderer.invalidate()
         if event.type == pygame.KEYDOWN:
             if game.game_over == True:
-                game.game_over = False
-                game.reset()
-            if event.key == pygame.K_LEFT and game.game_over == False:
-                game.move_left()
-            if event.key == pygame.K_RIGHT and game.game_over == False:
-                game.move_right()
-            if event.key == pygame.K_DOWN and game.game_over == False:
-                game.move_down()
-                game.update_score(0, 1)
-            if (event.key == pygame.K_UP and game.game_over == False):
-                game.rotate()
-        if event.type == GAME_UPDATE and game.game_over == False:
-            game.move_down()
+                apply(RESET, received)
+                next_tick = received + GRAVITY_INTERVAL
+            if event.key in KEY_ACTIONS:
+                inputs.press(KEY_ACTIONS[event.key], received)
+            elif event.key == PROFILER_KEY:
+                overlay.toggle()
+        if event.type == pygame.KEYUP and event.key in KEY_ACTIONS:
+            inputs.release(KEY_ACTIONS[event.key], received)
 
-    # Drawing
-    score_value_surface = title_font.render(str(game.score), True, Colors.white)
-
-    screen.fill(Colors.dark_blue)
-    screen.blit(score_surface, (365, 20, 50, 50))
-    screen.blit(next_surface, (375, 180, 50, 50))
+    profiler.mark("events")
+    if paused:
+        continue
 
-    if game.game_over == True:
-        screen.blit(game_over_surface, (320, 450, 50, 50))
+    # Simulation: ввод и гравитация применяются в порядке их отметок времени
+    now = perf_counter()
+    steps = 0
+    for timestamp, action in inputs.poll(now):
+        while timestamp >= next_tick and game.game_over == False and steps < MAX_CATCH_UP:
+            apply(GRAVITY, next_tick)
+            next_tick += GRAVITY_INTERVAL
+            steps += 1
+        if game.game_over == False:
+            apply(action, timestamp)
+    while now >= next_tick and game.game_over == False and steps < MAX_CATCH_UP:
+        apply(GRAVITY, next_tick)
+        next_tick += GRAVITY_INTERVAL
+        steps += 1
+    if now >= next_tick:
+        next_tick = now + GRAVITY_INTERVAL
+    profiler.mark("simulation")
 
-    pygame.draw.rect(screen, Colors.light_blue, score_rect, 0, 10)
-    screen.blit(score_value_surface, score_value_surface.get_rect(centerx=score_rect.centerx,
-                                                                  centery=score_rect.centery))
-    pygame.draw.rect(screen, Colors.light_blue, next_rect, 0, 10)
-    game.draw(screen)
-
-    pygame.display.update()
-    clock.tick(60)
+    # Drawing
+    if focused:
+        dirty_rects = renderer.render()
+        overlay_rect = overlay.draw(screen, now, force=dirty_rects == [screen.get_rect()])
+        if overlay_rect is not None:
+            dirty_rects.append(overlay_rect)
+        profiler.mark("draw")
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+        profiler.mark("update")
+    profiler.end_frame()
+    if first_frame:
+        first_frame = False
+        profiler.note("startup", {"first_frame": perf_counter() - STARTED, "sounds_ready": audio.ready.is_set(),
+                                  "audio_buffer_latency": audio.buffer_latency()})
+        audio.start_music()
+    if not sounds_noted and audio.ready.is_set():
+        sounds_noted = True
+        profiler.note("sounds", {"decode": audio.load_time})
@@ -0,0 +1,419 @@
+import json
+import tracemalloc
+from array import array
+from time import perf_counter
+
+from colors import Colors
+
+# Число последних кадров, по которым считаются процентили
+FRAME_HISTORY = 600
+QUANTILES = (50, 95, 99)
+# Разделы кадра главного цикла в порядке вызова Profiler.mark
+FRAME_SECTIONS = ("events", "simulation", "draw", "update")
+# Методы, время и число вызовов которых считаются, как ("game" или "grid", имя метода)
+HOT_PATHS = (("game", "move_down"), ("game", "hard_drop"), ("game", "lock_block"), ("grid", "clear_full_rows"))
+# Оверлей перерисовывается не чаще, чем раз в столько секунд
+OVERLAY_INTERVAL = 0.5
+
+
+class RingBuffer:
+    """
+    Кольцевой буфер фиксированного размера для времен кадров.
+
+    Память выделяется один раз; новое значение заменяет самое старое.
+
+    :param size: The capacity.
+    :type size: int
+    :ivar values: The stored values, in insertion order only until the buffer wraps.
+    :vartype values: array.array
+    :ivar count: The number of stored values, at most ``size``.
+    :vartype count: int
+    """
+    __slots__ = ("values", "index", "count")
+
+    def __init__(self, size=FRAME_HISTORY):
+        self.values = array("d", bytes(8 * size))
+        self.index = 0
+        self.count = 0
+
+    def append(self, value):
+        """
+        Добавление значения с вытеснением самого старого.
+
+        :param value: The value.
+        :type value: float
+        :returns: None
+        :rtype: None
+        """
+        values = self.values
+        values[self.index] = value
+        self.index = (self.index + 1) % len(values)
+        if self.count < len(values):
+            self.count += 1
+
+    def samples(self):
+        """
+        Сохраненные значения от старых к новым.
+
+        :returns: The values.
+        :rtype: list[float]
+        """
+        if self.count < len(self.values):
+            return self.values[:self.count].tolist()
+        return (self.values[self.index:] + self.values[:self.index]).tolist()
+
+    def percentiles(self, quantiles=QUANTILES):
+        """
+        Процентили по ближайшему рангу.
+
+        :param quantiles: Percentiles to compute, 0-100.
+        :type quantiles: tuple[int]
+        :returns: The value of every percentile, empty if the buffer is empty.
+        :rtype: dict[int, float]
+        """
+        if not self.count:
+            return {}
+        ordered = sorted(self.values[:self.count])
+        last = len(ordered) - 1
+        return {quantile: ordered[min(last, max(0, -(-quantile * len(ordered) // 100) - 1))]
+                for quantile in quantiles}
+
+
+class Profiler:
+    """
+    Замеры времени кадров главного цикла и горячих методов игры.
+
+    Кадр делится на разделы :data:`FRAME_SECTIONS`: главный цикл вызывает
+    :meth:`begin_frame` после ожидания событий и :meth:`mark` в конце каждого
+    раздела, время ожидания в кадр не входит. Методы :data:`HOT_PATHS`
+    оборачиваются на экземплярах игры и сетки только пока профилировщик
+    включен, и их время (с вложенными вызовами) и число вызовов
+    записываются отдельно. Выключенный профилировщик стоит одну проверку
+    флага на вызов :meth:`mark`.
+
+    :param export: JSONL file that receives one line per frame, none by default.
+    :type export: str or None
+    :param memory: Record allocated bytes per frame with ``tracemalloc``.
+    :type memory: bool
+    :param size: Frames kept for the percentiles.
+    :type size: int
+    :ivar enabled: Whether frames are recorded.
+    :vartype enabled: bool
+    :ivar buffers: Seconds per frame of every section, hot path and ``"frame"`` in total.
+    :vartype buffers: dict[str, RingBuffer]
+    :ivar calls: Calls of every hot path since the profiler was created.
+    :vartype calls: dict[str, int]
+    :ivar frames: Frames recorded.
+    :vartype frames: int
+    :ivar notes: One-off measurements such as startup times, by name.
+    :vartype notes: dict[str, dict]
+    """
+    def __init__(self, export=None, memory=False, size=FRAME_HISTORY):
+        self.size = size
+        self.memory = memory
+        self.enabled = False
+        self.buffers = {}
+        self.calls = {}
+        self.current = {}
+        self.frame_calls = {}
+        self.frames = 0
+        self.frame_start = None
+        self.last_mark = None
+        self.memory_start = 0
+        self.games = []
+        self.notes = {}
+        self.export = open(export, "a", buffering=1) if export else None
+        if export:
+            self.enable()
+
+    def enable(self):
+        """
+        Включение записи кадров и обертывание горячих методов подключенных игр.
+
+        :returns: None
+        :rtype: None
+        """
+        if self.enabled:
+            return
+        self.enabled = True
+        self.frame_start = None
+        for game in self.games:
+            self.instrument(game)
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        """
+        Выключение записи: обертки снимаются, ``tracemalloc`` останавливается.
+
+        :returns: None
+        :rtype: None
+        """
+        if not self.enabled:
+            return
+        self.enabled = False
+        for game in self.games:
+            for owner, name in HOT_PATHS:
+                target = game if owner == "game" else game.grid
+                target.__dict__.pop(name, None)
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def toggle(self):
+        """
+        Переключение записи.
+
+        :returns: Whether the profiler is enabled now.
+        :rtype: bool
+        """
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    def attach(self, game):
+        """
+        Подключение игры, горячие методы которой замеряются.
+
+        :param game: The game.
+        :type game: Game
+        :returns: None
+        :rtype: None
+        """
+        self.games.append(game)
+        if self.enabled:
+            self.instrument(game)
+
+    def instrument(self, game):
+        """
+        Обертывание методов :data:`HOT_PATHS` атрибутами экземпляров игры и сетки.
+
+        :param game: The game.
+        :type game: Game
+        :returns: None
+        :rtype: None
+        """
+        for owner, name in HOT_PATHS:
+            target = game if owner == "game" else game.grid
+            setattr(target, name, self.timed(name, getattr(type(target), name).__get__(target)))
+
+    def timed(self, name, method):
+        """
+        Обертка метода, добавляющая его время и вызов к текущему кадру.
+
+        :param name: The name under which the time is recorded.
+        :type name: str
+        :param method: The bound method.
+        :type method: callable
+        :returns: The wrapper.
+        :rtype: callable
+        """
+        current = self.current
+        frame_calls = self.frame_calls
+
+        def wrapper(*args):
+            start = perf_counter()
+            try:
+                return method(*args)
+            finally:
+                current[name] = current.get(name, 0.0) + perf_counter() - start
+                frame_calls[name] = frame_calls.get(name, 0) + 1
+        return wrapper
+
+    def begin_frame(self):
+        """
+        Начало кадра; незаконченный предыдущий кадр отбрасывается.
+
+        :returns: None
+        :rtype: None
+        """
+        if not self.enabled:
+            return
+        self.current.clear()
+        self.frame_calls.clear()
+        self.frame_start = self.last_mark = perf_counter()
+        if self.memory:
+            tracemalloc.reset_peak()
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+
+    def mark(self, section):
+        """
+        Конец раздела кадра: время с предыдущей отметки добавляется к разделу.
+
+        :param section: The section name, usually one of :data:`FRAME_SECTIONS`.
+        :type section: str
+        :returns: None
+        :rtype: None
+        """
+        if not self.enabled or self.frame_start is None:
+            return
+        now = perf_counter()
+        self.current[section] = self.current.get(section, 0.0) + now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self):
+        """
+        Конец кадра: времена разделов попадают в буферы и в файл экспорта.
+
+        :returns: The frame as written to the export file: ``frame`` number, ``seconds`` per
+            section, hot path ``calls`` and, with ``memory``, allocated and peak bytes; None
+            if the profiler is disabled.
+        :rtype: dict or None
+        """
+        if not self.enabled or self.frame_start is None:
+            return None
+        record = dict(self.current)
+        record["frame"] = self.last_mark - self.frame_start
+        self.frame_start = None
+        for name, seconds in record.items():
+            buffer = self.buffers.get(name)
+            if buffer is None:
+                buffer = self.buffers[name] = RingBuffer(self.size)
+            buffer.append(seconds)
+        for name, count in self.frame_calls.items():
+            self.calls[name] = self.calls.get(name, 0) + count
+        self.frames += 1
+        line = {"frame": self.frames, "seconds": record, "calls": dict(self.frame_calls)}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            line["memory"] = {"allocated": current - self.memory_start, "peak": peak - self.memory_start}
+        if self.export is not None:
+            self.export.write(json.dumps(line) + "\n")
+        return line
+
+    def note(self, name, values):
+        """
+        Запись разового замера; в файл экспорта он попадает, даже если профилировщик выключен.
+
+        :param name: The measurement name, e.g. ``"startup"``.
+        :type name: str
+        :param values: The measured values, JSON-serializable.
+        :type values: dict
+        :returns: None
+        :rtype: None
+        """
+        self.notes[name] = values
+        if self.export is not None:
+            self.export.write(json.dumps({"note": name, **values}) + "\n")
+
+    def summary(self, quantiles=QUANTILES):
+        """
+        Процентили времени разделов по последним кадрам.
+
+        :param quantiles: Percentiles to compute.
+        :type quantiles: tuple[int]
+        :returns: Percentiles in seconds and total calls (hot paths only) of every section.
+        :rtype: dict[str, dict]
+        """
+        result = {}
+        for name, buffer in self.buffers.items():
+            result[name] = {f"p{quantile}": value for quantile, value in buffer.percentiles(quantiles).items()}
+            if name in self.calls:
+                result[name]["calls"] = self.calls[name]
+        return result
+
+    def close(self):
+        """
+        Закрытие файла экспорта.
+
+        :returns: None
+        :rtype: None
+        """
+        self.disable()
+        if self.export is not None:
+            self.export.close()
+            self.export = None
+
+
+class ProfilerOverlay:
+    """
+    Панель с процентилями кадра под панелями счета и следующего блока.
+
+    Панель обновляется не чаще :data:`OVERLAY_INTERVAL` и после полной
+    перерисовки окна, поэтому почти не искажает замеры.
+
+    :param profiler: The profiler to show.
+    :type profiler: Profiler
+    :param renderer: The renderer, whose background and layout are reused.
+    :type renderer: Renderer
+    :param font: Font of the overlay lines.
+    :type font: pygame.font.Font
+    :ivar rect: The area of the screen the overlay uses.
+    :vartype rect: pygame.Rect
+    :ivar visible: Whether the overlay is shown.
+    :vartype visible: bool
+    """
+    def __init__(self, profiler, renderer, font):
+        import pygame
+        self.profiler = profiler
+        self.renderer = renderer
+        self.font = font
+        line_height = font.get_linesize()
+        self.rect = pygame.Rect(renderer.next_rect.left, renderer.game_over_rect.bottom + 8,
+                                renderer.next_rect.width, line_height * (len(FRAME_SECTIONS) + 3))
+        self.visible = False
+        self.shown_at = None
+
+    def toggle(self):
+        """
+        Показ или скрытие панели; профилировщик включается вместе с ней.
+
+        :returns: None
+        :rtype: None
+        """
+        self.visible = not self.visible
+        if self.visible:
+            self.shown_at = None
+            self.profiler.enable()
+        elif self.profiler.export is None:
+            self.profiler.disable()
+
+    def lines(self):
+        """
+        Строки панели: p50/p95/p99 каждого раздела и время до первого кадра в миллисекундах.
+
+        :returns: The lines.
+        :rtype: list[str]
+        """
+        summary = self.profiler.summary()
+        lines = ["ms      p50   p95   p99"]
+        for name in FRAME_SECTIONS + ("frame",):
+            values = summary.get(name)
+            if values:
+                lines.append(f"{name[:6]:6} " + " ".join(f"{values[f'p{quantile}'] * 1000:5.2f}"
+                                                          for quantile in QUANTILES))
+        startup = self.profiler.notes.get("startup")
+        if startup:
+            lines.append(f"first frame {startup['first_frame'] * 1000:.0f}")
+        return lines
+
+    def draw(self, screen, now, force=False):
+        """
+        Перерисовка панели, если пора.
+
+        :param screen: The surface to draw on.
+        :type screen: pygame.Surface
+        :param now: The current ``perf_counter`` time.
+        :type now: float
+        :param force: Redraw regardless of the interval, e.g. after a full redraw of the window.
+        :type force: bool
+        :returns: The changed area, or None if nothing was drawn.
+        :rtype: pygame.Rect or None
+        """
+        if not self.visible:
+            # после скрытия панель один раз стирается
+            if self.shown_at is None:
+                return None
+            self.shown_at = None
+            screen.blit(self.renderer.background, self.rect, self.rect)
+            return self.rect
+        if not force and self.shown_at is not None and now - self.shown_at < OVERLAY_INTERVAL:
+            return None
+        self.shown_at = now
+        screen.blit(self.renderer.background, self.rect, self.rect)
+        y = self.rect.top
+        for line in self.lines():
+            screen.blit(self.font.render(line, True, Colors.white), (self.rect.left, y))
+            y += self.font.get_linesize()
+        return self.rect
@@ -0,0 +1,121 @@
+import random
+from collections import deque
+from itertools import islice
+
+# id блоков в мешке, как в blocks.py
+KINDS = (1, 2, 3, 4, 5, 6, 7)
+
+
+class BagRandomizer:
+    """
+    Генератор блоков по схеме "7-мешок" с собственным зерном.
+
+    Каждые семь блоков подряд содержат все виды по одному разу. Мешки
+    перемешиваются заранее по мере надобности, поэтому просмотр вперед не
+    меняет последовательность.
+
+    :param seed: Seed of the generator, None for a random one.
+    :type seed: int or None
+    :ivar rng: The private random number generator.
+    :vartype rng: random.Random
+    :ivar queue: Upcoming block ids, the current bag first.
+    :vartype queue: collections.deque
+    :ivar drawn: The number of blocks drawn since the current bag sequence started.
+    :vartype drawn: int
+    """
+    def __init__(self, seed=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.queue = deque()
+        self.drawn = 0
+
+    def fill(self, count):
+        """
+        Перемешивание новых мешков, пока в очереди не окажется хотя бы ``count`` блоков.
+
+        :param count: The required queue length.
+        :type count: int
+        :returns: None
+        :rtype: None
+        """
+        while len(self.queue) < count:
+            bag = list(KINDS)
+            self.rng.shuffle(bag)
+            self.queue.extend(bag)
+
+    def next(self):
+        """
+        Выдача следующего блока.
+
+        :returns: The id of the next block.
+        :rtype: int
+        """
+        if not self.queue:
+            self.fill(1)
+        self.drawn += 1
+        return self.queue.popleft()
+
+    def peek(self, count):
+        """
+        Просмотр следующих блоков без их выдачи.
+
+        :param count: The number of blocks to look ahead.
+        :type count: int
+        :returns: Ids of the next ``count`` blocks, in order.
+        :rtype: list[int]
+        """
+        self.fill(count)
+        return list(islice(self.queue, count))
+
+    def bag(self):
+        """
+        Блоки, оставшиеся в текущем мешке.
+
+        :returns: Ids of the blocks not yet drawn from the current bag.
+        :rtype: list[int]
+        """
+        return list(islice(self.queue, -self.drawn % len(KINDS)))
+
+    def new_bag(self):
+        """
+        Отбрасывание остатка текущего мешка, следующий блок будет из нового мешка.
+
+        :returns: None
+        :rtype: None
+        """
+        for _ in range(-self.drawn % len(KINDS)):
+            self.queue.popleft()
+        self.drawn = 0
+
+    def state(self):
+        """
+        Снимок состояния генератора.
+
+        :returns: State that can be passed to :meth:`set_state`.
+        :rtype: tuple
+        """
+        return self.rng.getstate(), tuple(self.queue), self.drawn
+
+    def set_state(self, state):
+        """
+        Восстановление генератора из снимка.
+
+        :param state: A value returned by :meth:`state`.
+        :type state: tuple
+        :returns: None
+        :rtype: None
+        """
+        rng_state, queue, self.drawn = state
+        self.rng.setstate(rng_state)
+        self.queue = deque(queue)
+
+    def clone(self):
+        """
+        Независимая копия генератора с той же будущей последовательностью.
+
+        :returns: The copy.
+        :rtype: BagRandomizer
+        """
+        clone = BagRandomizer(self.seed)
+        clone.set_state(self.state())
+        return clone
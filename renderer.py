@@ -0,0 +1,263 @@
+import pygame
+from colors import Colors
+from tiles import CachedText, atlas_for
+
+BOARD_X, BOARD_Y = 11, 11
+# Положение панелей для доски 20x10 с ячейками 30 пикселей; для других
+# размеров панели сдвигаются вправо на разницу ширины доски
+SCORE_RECT = pygame.Rect(320, 55, 170, 60)
+NEXT_RECT = pygame.Rect(320, 215, 170, 180)
+GAME_OVER_POSITION = (320, 450)
+WINDOW_SIZE = (500, 620)
+DEFAULT_BOARD_WIDTH, DEFAULT_BOARD_HEIGHT = 300, 600
+# Размер ячейки блока в панели "Next", не зависящий от размера ячейки доски
+PREVIEW_CELL_SIZE = 30
+# Наибольший размер доски на экране, под который подбирается размер ячейки
+MAX_BOARD_SIZE = (1200, 900)
+
+
+def fit_cell_size(num_rows, num_cols, cell_size=30, max_size=MAX_BOARD_SIZE):
+    """
+    Размер ячейки, при котором доска помещается на экран, не больше заданного.
+
+    :param num_rows: The number of rows of the board.
+    :type num_rows: int
+    :param num_cols: The number of columns of the board.
+    :type num_cols: int
+    :param cell_size: The preferred cell size in pixels.
+    :type cell_size: int
+    :param max_size: The largest board size in pixels as (width, height).
+    :type max_size: tuple[int, int]
+    :returns: The cell size, at least 1 pixel.
+    :rtype: int
+    """
+    return max(1, min(cell_size, max_size[0] // num_cols, max_size[1] // num_rows))
+
+
+def panel_shift(grid):
+    """
+    Сдвиг панелей вправо относительно раскладки доски 20x10.
+
+    :param grid: The board.
+    :type grid: Grid
+    :returns: The horizontal shift in pixels.
+    :rtype: int
+    """
+    return grid.num_cols * grid.cell_size - DEFAULT_BOARD_WIDTH
+
+
+def window_size(grid):
+    """
+    Размер окна, в котором помещаются доска и панели.
+
+    :param grid: The board.
+    :type grid: Grid
+    :returns: The window size as (width, height).
+    :rtype: tuple[int, int]
+    """
+    return (WINDOW_SIZE[0] + max(0, panel_shift(grid)),
+            WINDOW_SIZE[1] + max(0, grid.num_rows * grid.cell_size - DEFAULT_BOARD_HEIGHT))
+
+
+class Renderer:
+    """
+    Отрисовка игры с обновлением только измененных областей окна.
+
+    Зафиксированные блоки хранятся в отдельной поверхности и перерисовываются
+    только в ячейках, затронутых ``lock_block``/``clear_full_rows``. Поверх нее
+    выводятся падающий блок с призраком, панель следующего блока и счет.
+
+    :param game: The game to draw.
+    :type game: Game
+    :param screen: The surface to draw on, usually the display surface.
+    :type screen: pygame.Surface
+    :param font: Font for the labels and the score.
+    :type font: pygame.font.Font
+    :ivar board: Off-screen surface with the locked cells.
+    :vartype board: pygame.Surface
+    :ivar score_rect: The score panel, right of the board.
+    :vartype score_rect: pygame.Rect
+    :ivar next_rect: The next block panel, right of the board.
+    :vartype next_rect: pygame.Rect
+    :ivar dirty_cells: Cells of ``board`` that must be repainted, as (row, column).
+    :vartype dirty_cells: set[tuple[int, int]]
+    """
+    def __init__(self, game, screen, font):
+        self.game = game
+        self.screen = screen
+        self.font = font
+        grid = game.grid
+        shift = panel_shift(grid)
+        self.score_rect = SCORE_RECT.move(shift, 0)
+        self.next_rect = NEXT_RECT.move(shift, 0)
+        self.background = self.draw_background()
+        self.board = pygame.Surface((grid.num_cols * grid.cell_size, grid.num_rows * grid.cell_size))
+        self.board.fill(Colors.dark_blue)
+        self.board_rect = self.board.get_rect(topleft=(BOARD_X, BOARD_Y))
+        self.score_text = CachedText(font, Colors.white)
+        self.game_over_surface = font.render("GAME OVER", True, Colors.white)
+        self.game_over_rect = self.game_over_surface.get_rect(
+            topleft=(GAME_OVER_POSITION[0] + shift, GAME_OVER_POSITION[1]))
+        self.dirty_cells = set()
+        self.redraw_all = True
+        self.shown = {}
+        game.subscribe("lock", self.on_lock)
+        game.subscribe("clear", self.on_clear)
+        game.subscribe("garbage", lambda count, hole: self.on_clear(count))
+        game.subscribe("reset", self.invalidate)
+
+    def draw_background(self):
+        """
+        Поверхность с неизменной частью окна: фон, подписи и панели.
+
+        :returns: The background surface.
+        :rtype: pygame.Surface
+        """
+        background = pygame.Surface(self.screen.get_size())
+        background.fill(Colors.dark_blue)
+        shift = self.score_rect.x - SCORE_RECT.x
+        background.blit(self.font.render("Score", True, Colors.white), (365 + shift, 20, 50, 50))
+        background.blit(self.font.render("Next", True, Colors.white), (375 + shift, 180, 50, 50))
+        pygame.draw.rect(background, Colors.light_blue, self.score_rect, 0, 10)
+        pygame.draw.rect(background, Colors.light_blue, self.next_rect, 0, 10)
+        return background
+
+    def on_lock(self):
+        """
+        Отметка ячеек зафиксированного блока для перерисовки.
+
+        :returns: None
+        :rtype: None
+        """
+        for position in self.game.current_block.get_cell_positions():
+            self.dirty_cells.add((position.row, position.column))
+
+    def on_clear(self, rows_cleared):
+        """
+        Отметка всей доски для перерисовки после удаления или добавления рядов.
+
+        :param rows_cleared: The number of rows cleared or added.
+        :type rows_cleared: int
+        :returns: None
+        :rtype: None
+        """
+        grid = self.game.grid
+        self.dirty_cells.update((row, column) for row in range(grid.num_rows) for column in range(grid.num_cols))
+
+    def invalidate(self):
+        """
+        Полная перерисовка окна при следующем вызове :meth:`render`.
+
+        :returns: None
+        :rtype: None
+        """
+        self.redraw_all = True
+
+    def update_board(self):
+        """
+        Перерисовка отмеченных ячеек на поверхности доски плитками из атласа.
+
+        :returns: None
+        :rtype: None
+        """
+        grid = self.game.grid
+        size = grid.cell_size
+        cells = grid.grid
+        tiles = atlas_for(size, grid.colors).tiles
+        self.board.blits([(tiles[cells[row][column]], (column * size, row * size))
+                          for row, column in self.dirty_cells], False)
+        self.dirty_cells.clear()
+
+    def block_rect(self, block, offset_x, offset_y):
+        """
+        Прямоугольник на экране, занимаемый блоком.
+
+        :param block: The block to measure.
+        :type block: Block
+        :param offset_x: The x-coordinate offset used to draw the block.
+        :type offset_x: int
+        :param offset_y: The y-coordinate offset used to draw the block.
+        :type offset_y: int
+        :returns: The bounding rectangle of the block cells.
+        :rtype: pygame.Rect
+        """
+        shape = block.shape
+        size = self.game.grid.cell_size
+        return pygame.Rect(offset_x + (block.column_offset + shape.min_column) * size,
+                           offset_y + (block.row_offset + shape.min_row) * size,
+                           shape.width * size, shape.height * size)
+
+    def changed(self, name, value):
+        """
+        Проверка, изменилось ли значение с прошлой отрисовки.
+
+        :param name: The name of the tracked value.
+        :type name: str
+        :param value: The current value.
+        :returns: True if the value differs from the one shown last time.
+        :rtype: bool
+        """
+        if self.shown.get(name, self) == value:
+            return False
+        self.shown[name] = value
+        return True
+
+    def render(self):
+        """
+        Отрисовка изменений с прошлого вызова.
+
+        :returns: Rectangles of the screen that changed, for ``pygame.display.update``.
+        :rtype: list[pygame.Rect]
+        """
+        game = self.game
+        screen = self.screen
+        dirty = []
+        full = self.redraw_all
+        if full:
+            self.redraw_all = False
+            self.shown.clear()
+            grid = game.grid
+            self.dirty_cells.update((row, column) for row in range(grid.num_rows) for column in range(grid.num_cols))
+            screen.blit(self.background, (0, 0))
+
+        block = game.current_block
+        size = game.grid.cell_size
+        ghost_y = BOARD_Y + game.drop_distance() * size
+        block_rects = [self.block_rect(block, BOARD_X, ghost_y), self.block_rect(block, BOARD_X, BOARD_Y)]
+        previous_rects = self.shown.get("block_rects")
+        board_changed = bool(self.dirty_cells)
+        if board_changed:
+            self.update_board()
+        if self.changed("block", (id(block), block.rotation_state, block.row_offset, block.column_offset)) \
+                or board_changed:
+            if board_changed or previous_rects is None:
+                areas = [self.board_rect]
+            else:
+                areas = previous_rects + block_rects
+            for area in areas:
+                area = area.clip(self.board_rect)
+                screen.blit(self.board, area, area.move(-BOARD_X, -BOARD_Y))
+                dirty.append(area)
+            block.draw(screen, BOARD_X, ghost_y, ghost=True, cell_size=size)
+            block.draw(screen, BOARD_X, BOARD_Y, cell_size=size)
+            self.shown["block_rects"] = block_rects
+
+        score_rect = self.score_rect
+        if self.changed("score", game.score):
+            screen.blit(self.background, score_rect, score_rect)
+            text = self.score_text.render(game.score)
+            screen.blit(text, text.get_rect(centerx=score_rect.centerx, centery=score_rect.centery))
+            dirty.append(score_rect)
+
+        following = game.next_block
+        if self.changed("next", (id(following), following.id)):
+            screen.blit(self.background, self.next_rect, self.next_rect)
+            following.draw(screen, *game.preview_offset(), cell_size=PREVIEW_CELL_SIZE)
+            dirty.append(self.next_rect)
+
+        if self.changed("game_over", game.game_over):
+            screen.blit(self.background, self.game_over_rect, self.game_over_rect)
+            if game.game_over:
+                screen.blit(self.game_over_surface, self.game_over_rect)
+            dirty.append(self.game_over_rect)
+        return [screen.get_rect()] if full else dirty
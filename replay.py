@@ -0,0 +1,295 @@
+import struct
+from time import perf_counter
+
+from block import SPAWN_COLUMN
+from controls import LEFT, RIGHT, DOWN, ROTATE, HARD_DROP, apply_action
+from game import Game, RULES_VERSION
+from grid import BitGrid
+
+MAGIC = b"TXRP"
+# Версия 2 добавила в заголовок размер доски и столбец появления блоков
+FORMAT_VERSION = 2
+GRAVITY, LOCK, RESET = "gravity", "lock", "reset"
+# Код события хранится в младших 4 битах, интервал в миллисекундах - в старших
+OPCODES = {LEFT: 0, RIGHT: 1, ROTATE: 2, DOWN: 3, HARD_DROP: 4, GRAVITY: 5, LOCK: 6, RESET: 7}
+ACTIONS = {code: action for action, code in OPCODES.items()}
+END = 15
+HEADER_V1 = struct.Struct("<4sBHQ")
+HEADER = struct.Struct("<4sBHQHHH")
+FOOTER = struct.Struct("<Q")
+
+
+def write_varint(out, value):
+    """
+    Запись неотрицательного числа в формате varint (7 бит на байт).
+
+    :param out: The buffer to append to.
+    :type out: bytearray
+    :param value: The number to write.
+    :type value: int
+    :returns: None
+    :rtype: None
+    """
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, position):
+    """
+    Чтение числа в формате varint.
+
+    :param data: The encoded bytes.
+    :type data: bytes
+    :param position: Offset of the first byte.
+    :type position: int
+    :returns: The number and the offset right after it.
+    :rtype: tuple[int, int]
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class ReplayRecorder:
+    """
+    Запись игры в компактный двоичный журнал.
+
+    Журнал содержит заголовок (сигнатура, версия формата, версия правил,
+    зерно генератора, размер доски и столбец появления блоков), поток событий с интервалами в миллисекундах в формате
+    varint и итоговые счет и хеш Зобриста для проверки.
+
+    :param game: The game to record, created with ``seed``.
+    :type game: Game
+    :param seed: The seed the game was created with.
+    :type seed: int
+    :param clock: Function returning the current time in seconds.
+    :type clock: callable
+    """
+    def __init__(self, game, seed, clock=perf_counter):
+        self.game = game
+        self.clock = clock
+        grid = game.grid
+        self.data = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, RULES_VERSION, seed, grid.num_rows,
+                                          grid.num_cols, SPAWN_COLUMN + game.spawn_shift))
+        self.last = None
+        game.subscribe("lock", self.on_lock)
+
+    def record(self, action, timestamp=None):
+        """
+        Запись события.
+
+        :param action: A ``controls`` action, ``GRAVITY``, ``LOCK`` or ``RESET``.
+        :type action: str
+        :param timestamp: Time of the event, the current time by default.
+        :type timestamp: float or None
+        :returns: None
+        :rtype: None
+        """
+        if timestamp is None:
+            timestamp = self.clock()
+        milliseconds = round(timestamp * 1000)
+        delta = 0 if self.last is None else max(0, milliseconds - self.last)
+        if self.last is None or milliseconds > self.last:
+            self.last = milliseconds
+        write_varint(self.data, delta << 4 | OPCODES[action])
+
+    def apply(self, action, timestamp=None):
+        """
+        Применение действия к игре с записью.
+
+        :param action: A ``controls`` action, ``GRAVITY`` or ``RESET``.
+        :type action: str
+        :param timestamp: Time of the action, the current time by default.
+        :type timestamp: float or None
+        :returns: None
+        :rtype: None
+        """
+        self.record(action, timestamp)
+        apply_replay_action(self.game, action)
+
+    def on_lock(self):
+        """
+        Запись фиксации блока с тем же временем, что и вызвавшее ее событие.
+
+        :returns: None
+        :rtype: None
+        """
+        self.record(LOCK, None if self.last is None else self.last / 1000)
+
+    def finish(self):
+        """
+        Завершение журнала итоговыми счетом и хешем.
+
+        :returns: The complete log.
+        :rtype: bytes
+        """
+        data = bytearray(self.data)
+        write_varint(data, END)
+        write_varint(data, self.game.score)
+        return bytes(data + FOOTER.pack(self.game.zobrist_hash()))
+
+
+def apply_replay_action(game, action):
+    """
+    Применение события журнала к игре; ``LOCK`` ничего не делает.
+
+    :param game: The game to update.
+    :type game: Game
+    :param action: A ``controls`` action, ``GRAVITY``, ``LOCK`` or ``RESET``.
+    :type action: str
+    :returns: None
+    :rtype: None
+    """
+    if action == GRAVITY:
+        game.move_down()
+    elif action == RESET:
+        game.game_over = False
+        game.reset()
+    elif action != LOCK:
+        apply_action(game, action)
+
+
+class Replay:
+    """
+    Разобранный журнал игры.
+
+    :param data: A log produced by :meth:`ReplayRecorder.finish`.
+    :type data: bytes
+    :raises ValueError: If the data is not a replay or uses another rules version.
+    :ivar seed: The seed of the recorded game.
+    :vartype seed: int
+    :ivar num_rows: Board height of the recorded game.
+    :vartype num_rows: int
+    :ivar num_cols: Board width of the recorded game.
+    :vartype num_cols: int
+    :ivar spawn_column: Left column of the spawn area, None for the centered default.
+    :vartype spawn_column: int or None
+    :ivar times: Time of every event in milliseconds from the first one.
+    :vartype times: list[int]
+    :ivar actions: Every event, in order.
+    :vartype actions: list[str]
+    :ivar score: The final score.
+    :vartype score: int
+    :ivar hash: The final Zobrist hash of the game.
+    :vartype hash: int
+    """
+    def __init__(self, data):
+        magic, version, rules, self.seed = HEADER_V1.unpack_from(data)
+        if magic != MAGIC or version not in (1, FORMAT_VERSION):
+            raise ValueError("not a replay log")
+        if rules != RULES_VERSION:
+            raise ValueError(f"replay uses rules version {rules}, expected {RULES_VERSION}")
+        if version == 1:
+            # журналы первой версии писались только на доске 20x10
+            self.num_rows, self.num_cols, self.spawn_column = 20, 10, None
+            position = HEADER_V1.size
+        else:
+            self.num_rows, self.num_cols, self.spawn_column = HEADER.unpack_from(data)[4:]
+            position = HEADER.size
+        self.times = []
+        self.actions = []
+        moment = 0
+        while True:
+            value, position = read_varint(data, position)
+            code = value & 0xF
+            if code == END:
+                break
+            moment += value >> 4
+            self.times.append(moment)
+            self.actions.append(ACTIONS[code])
+        self.score, position = read_varint(data, position)
+        (self.hash,) = FOOTER.unpack_from(data, position)
+
+
+class ReplayPlayer:
+    """
+    Безоконное воспроизведение журнала с переходом к любому событию.
+
+    При первом проходе каждые ``interval`` событий сохраняется снимок игры,
+    поэтому переход к событию стоит не больше ``interval`` шагов.
+
+    :param replay: The parsed log.
+    :type replay: Replay
+    :param interval: The number of events between keyframes.
+    :type interval: int
+    :param cell_size: Cell size of the replayed board in pixels.
+    :type cell_size: int
+    :ivar game: The game being replayed.
+    :vartype game: Game
+    :ivar position: The number of events applied so far.
+    :vartype position: int
+    :ivar keyframes: Game snapshots taken before events ``0``, ``interval``, ``2 * interval``...
+    :vartype keyframes: list[tuple]
+    """
+    def __init__(self, replay, interval=256, cell_size=30):
+        self.replay = replay
+        self.interval = interval
+        self.game = Game(BitGrid(replay.num_rows, replay.num_cols, cell_size), replay.seed, replay.spawn_column)
+        self.position = 0
+        self.locks = 0
+        self.game.subscribe("lock", self.on_lock)
+        self.keyframes = [self.game.snapshot()]
+
+    def on_lock(self):
+        """
+        Подсчет фиксаций блоков для проверки журнала.
+
+        :returns: None
+        :rtype: None
+        """
+        self.locks += 1
+
+    def step(self):
+        """
+        Применение следующего события.
+
+        :returns: None
+        :rtype: None
+        """
+        apply_replay_action(self.game, self.replay.actions[self.position])
+        self.position += 1
+        if self.position % self.interval == 0 and self.position // self.interval == len(self.keyframes):
+            self.keyframes.append(self.game.snapshot())
+
+    def seek(self, position):
+        """
+        Переход к состоянию после ``position`` событий.
+
+        :param position: The number of events to have applied.
+        :type position: int
+        :returns: The game in that state.
+        :rtype: Game
+        """
+        position = max(0, min(position, len(self.replay.actions)))
+        keyframe = min(position // self.interval, len(self.keyframes) - 1)
+        if not keyframe * self.interval <= self.position <= position:
+            self.game.restore(self.keyframes[keyframe])
+            self.position = keyframe * self.interval
+        while self.position < position:
+            self.step()
+        return self.game
+
+    def run(self):
+        """
+        Воспроизведение журнала до конца с проверкой результата.
+
+        :returns: The game after the last event.
+        :rtype: Game
+        :raises ValueError: If the replayed locks, score or hash differ from the log.
+        """
+        self.seek(0)
+        self.locks = 0
+        self.seek(len(self.replay.actions))
+        if self.locks != self.replay.actions.count(LOCK):
+            raise ValueError("replay desynchronized: lock count differs")
+        if self.game.score != self.replay.score or self.game.zobrist_hash() != self.replay.hash:
+            raise ValueError("replay desynchronized: final state differs")
+        return self.game
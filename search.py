@@ -0,0 +1,183 @@
+from collections import deque
+
+
+class Placement:
+    """
+    Конечное положение блока и последовательность ходов, которая к нему приводит.
+
+    :ivar rotation: Rotation state of the block when it locks.
+    :vartype rotation: int
+    :ivar row: Row offset of the block when it locks.
+    :vartype row: int
+    :ivar column: Column offset of the block when it locks.
+    :vartype column: int
+    :ivar path: Moves from the start position, each one of ``"left"``, ``"right"``,
+        ``"rotate"`` or ``"down"``. The final ``"down"`` that locks the block is not included.
+    :vartype path: tuple[str]
+    """
+    __slots__ = ("rotation", "row", "column", "path")
+
+    def __init__(self, rotation, row, column, path):
+        self.rotation = rotation
+        self.row = row
+        self.column = column
+        self.path = path
+
+    def __repr__(self):
+        return f"Placement({self.rotation}, {self.row}, {self.column}, {self.path})"
+
+
+class PlacementSearch:
+    """
+    Поиск всех достижимых конечных положений блока.
+
+    Переходы повторяют правила :class:`Game`: ``move_left``, ``move_right``,
+    ``rotate`` и ``move_down`` применяются только если новая позиция проходит
+    :meth:`Grid.can_place`. Поиск идет в ширину по пространству
+    (поворот, ряд, столбец), поэтому найденные пути кратчайшие.
+
+    :ivar table: Transposition table mapping (board key, block id, start state) to placements.
+    :vartype table: dict
+    """
+    def __init__(self):
+        self.table = {}
+
+    def placements(self, grid, block):
+        """
+        Перечисление конечных положений блока с путями к ним.
+
+        Положения с одинаковым набором занятых ячеек объединяются, остается
+        самый короткий путь.
+
+        :param grid: The board to search on.
+        :type grid: Grid
+        :param block: The block at its start position.
+        :type block: Block
+        :returns: Every distinct reachable placement.
+        :rtype: list[Placement]
+        """
+        start = (block.rotation_state, block.row_offset, block.column_offset)
+        key = (grid.occupancy_key(), block.id, start)
+        result = self.table.get(key)
+        if result is None:
+            result = self.table[key] = self._search(grid, block.shapes, start)
+        return result
+
+    def _search(self, grid, shapes, start):
+        """
+        Поиск в ширину от начального состояния.
+
+        :param grid: The board to search on.
+        :type grid: Grid
+        :param shapes: Shapes of every rotation of the block.
+        :type shapes: tuple[Shape]
+        :param start: Start state as (rotation, row, column).
+        :type start: tuple[int, int, int]
+        :returns: Every distinct reachable placement.
+        :rtype: list[Placement]
+        """
+        can_place = grid.can_place
+        if not can_place(shapes[start[0]], start[1], start[2]):
+            return []
+        parents = {start: None}
+        queue = deque([start])
+        placements = {}
+        while queue:
+            state = queue.popleft()
+            rotation, row, column = state
+            shape = shapes[rotation]
+            next_rotation = (rotation + 1) % len(shapes)
+            for move, candidate in (("left", (rotation, row, column - 1)),
+                                    ("right", (rotation, row, column + 1)),
+                                    ("rotate", (next_rotation, row, column)),
+                                    ("down", (rotation, row + 1, column))):
+                if candidate in parents:
+                    continue
+                if can_place(shapes[candidate[0]], candidate[1], candidate[2]):
+                    parents[candidate] = (state, move)
+                    queue.append(candidate)
+                elif move == "down":
+                    cells = frozenset((r + row, c + column) for r, c in shape.offsets)
+                    if cells not in placements:
+                        placements[cells] = Placement(rotation, row, column, self._path(parents, state))
+        return list(placements.values())
+
+    @staticmethod
+    def _path(parents, state):
+        """
+        Восстановление пути до состояния по таблице родителей.
+
+        :param parents: Map of state to (parent state, move), None for the start.
+        :type parents: dict
+        :param state: The state to reach.
+        :type state: tuple[int, int, int]
+        :returns: Moves from the start state.
+        :rtype: tuple[str]
+        """
+        path = []
+        while parents[state] is not None:
+            state, move = parents[state]
+            path.append(move)
+        return tuple(reversed(path))
+
+    def best(self, game, evaluate, depth=1):
+        """
+        Выбор лучшего положения текущего блока, с учетом следующего при ``depth=2``.
+
+        :param game: The game whose ``current_block`` and ``next_block`` are placed.
+        :type game: Game
+        :param evaluate: Scores a board after placement, higher is better. Called as
+            ``evaluate(grid, lines_cleared)`` with the total lines cleared so far.
+        :type evaluate: callable
+        :param depth: 1 to place the current block, 2 to also place the next block.
+        :type depth: int
+        :returns: The best value and the placements achieving it, or (None, []) when no
+            placement exists.
+        :rtype: tuple[float, list[Placement]]
+        """
+        blocks = [game.current_block, game.next_block][:depth]
+        return self._best(game.grid, blocks, evaluate, 0)
+
+    def _best(self, grid, blocks, evaluate, lines):
+        """
+        Рекурсивный перебор положений для оставшихся блоков.
+
+        :param grid: The board before placing ``blocks[0]``.
+        :type grid: Grid
+        :param blocks: Blocks still to place, in order.
+        :type blocks: list[Block]
+        :param evaluate: The board evaluation function.
+        :type evaluate: callable
+        :param lines: Lines cleared by the placements made so far.
+        :type lines: int
+        :returns: The best value and the placements achieving it.
+        :rtype: tuple[float, list[Placement]]
+        """
+        block = blocks[0]
+        best_value, best_line = None, []
+        for placement in self.placements(grid, block):
+            board = grid.copy()
+            cleared = lines + board.place(block.shapes[placement.rotation], placement.row,
+                                          placement.column, block.id)
+            if len(blocks) > 1:
+                value, line = self._best(board, blocks[1:], evaluate, cleared)
+                if value is None:
+                    # следующий блок не помещается: после фиксации игра окончена
+                    value, line = float("-inf"), []
+            else:
+                value, line = evaluate(board, cleared), []
+            if best_value is None or value > best_value:
+                best_value, best_line = value, [placement] + line
+        return best_value, best_line
+
+
+def find_placements(game):
+    """
+    Все достижимые конечные положения текущего блока игры.
+
+    :param game: The game to search.
+    :type game: Game
+    :returns: Every distinct reachable placement of ``game.current_block``.
+    :rtype: list[Placement]
+    """
+    return PlacementSearch().placements(game.grid, game.current_block)
@@ -0,0 +1,651 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import sys
+from time import monotonic
+
+from controls import LEFT, RIGHT, DOWN, ROTATE, HARD_DROP, apply_action
+from game import Game
+
+# Шаг гравитации на сервере, как GRAVITY_INTERVAL в main.py
+GRAVITY_INTERVAL = 0.2
+# Разрешение колеса таймеров и число его ячеек
+TICK = 0.01
+WHEEL_SLOTS = 512
+# Число мусорных рядов сопернику за 0-4 удаленных ряда
+GARBAGE_LINES = (0, 0, 1, 2, 4)
+ROOM_SIZE = 2
+# Клиент, который не успевает читать, отключается при таком объеме неотправленных данных
+MAX_BUFFER = 1 << 16
+ACTIONS = (LEFT, RIGHT, DOWN, ROTATE, HARD_DROP)
+# Очередь входящих соединений; при стандартных 100 одновременные подключения сбрасываются
+BACKLOG = 1024
+
+log = logging.getLogger(__name__)
+
+
+class Timer:
+    """
+    Запланированный вызов в :class:`TimerWheel`.
+
+    :ivar tick: The wheel tick at which the callback fires.
+    :vartype tick: int
+    :ivar callback: Called without arguments when the timer fires.
+    :vartype callback: callable
+    :ivar cancelled: True after :meth:`cancel`.
+    :vartype cancelled: bool
+    """
+    __slots__ = ("tick", "callback", "cancelled")
+
+    def __init__(self, tick, callback):
+        self.tick = tick
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Отмена вызова; таймер удаляется из колеса, когда до него доходит очередь.
+
+        :returns: None
+        :rtype: None
+        """
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Колесо таймеров: одна очередь с дискретными тиками для всех игр процесса.
+
+    Таймер попадает в ячейку ``(тик срабатывания) % slots``, поэтому
+    добавление и срабатывание стоят O(1), а каждый тик просматривает только
+    одну ячейку. Таймеры дальше одного оборота колеса остаются в ячейке до
+    своего тика.
+
+    :param tick: Duration of a tick in seconds.
+    :type tick: float
+    :param slots: The number of slots of the wheel.
+    :type slots: int
+    :param clock: Function returning the current time in seconds.
+    :type clock: callable
+    :ivar ticks: Ticks elapsed since the wheel was created.
+    :vartype ticks: int
+    :ivar time: Time of the last processed tick.
+    :vartype time: float
+    :ivar count: The number of scheduled timers, including cancelled ones not yet removed.
+    :vartype count: int
+    """
+    def __init__(self, tick=TICK, slots=WHEEL_SLOTS, clock=monotonic):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.clock = clock
+        self.time = clock()
+        self.ticks = 0
+        self.count = 0
+
+    def schedule(self, delay, callback):
+        """
+        Вызов функции через заданное время, округленное вверх до тика.
+
+        :param delay: Delay in seconds from the last processed tick.
+        :type delay: float
+        :param callback: Called without arguments.
+        :type callback: callable
+        :returns: The timer, which can be cancelled.
+        :rtype: Timer
+        """
+        tick = self.ticks + max(1, math.ceil(delay / self.tick - 1e-9))
+        timer = Timer(tick, callback)
+        self.slots[tick % len(self.slots)].append(timer)
+        self.count += 1
+        return timer
+
+    def advance(self, now=None):
+        """
+        Обработка всех тиков до заданного момента.
+
+        Исключение в вызове записывается в журнал и не мешает остальным таймерам.
+
+        :param now: The current time, ``clock()`` by default.
+        :type now: float or None
+        :returns: The number of callbacks called.
+        :rtype: int
+        """
+        if now is None:
+            now = self.clock()
+        fired = 0
+        slots = self.slots
+        while self.time + self.tick <= now:
+            self.time += self.tick
+            self.ticks += 1
+            index = self.ticks % len(slots)
+            slot = slots[index]
+            if not slot:
+                continue
+            # вызовы могут планировать новые таймеры в эту же ячейку
+            slots[index] = []
+            waiting = []
+            for timer in slot:
+                if timer.cancelled:
+                    self.count -= 1
+                elif timer.tick > self.ticks:
+                    waiting.append(timer)
+                else:
+                    self.count -= 1
+                    fired += 1
+                    try:
+                        timer.callback()
+                    except Exception:
+                        log.exception("timer callback failed")
+            slots[index].extend(waiting)
+        return fired
+
+    def delay(self):
+        """
+        Время до следующего тика.
+
+        :returns: Seconds until the next tick is due, never negative.
+        :rtype: float
+        """
+        return max(0.0, self.time + self.tick - self.clock())
+
+
+class Session:
+    """
+    Игра одного клиента на сервере.
+
+    :ivar id: Session number, unique within the server.
+    :vartype id: int
+    :ivar game: The game of the client.
+    :vartype game: Game
+    :ivar writer: Stream to the client.
+    :vartype writer: asyncio.StreamWriter
+    :ivar room: The versus room, None for a solo game.
+    :vartype room: Room or None
+    :ivar timer: The pending gravity timer.
+    :vartype timer: Timer or None
+    :ivar seq: Number of the last state sent.
+    :vartype seq: int
+    """
+    __slots__ = ("id", "game", "writer", "room", "timer", "seq")
+
+    def __init__(self, id, writer):
+        self.id = id
+        self.game = None
+        self.writer = writer
+        self.room = None
+        self.timer = None
+        self.seq = 0
+
+    def send(self, message):
+        """
+        Отправка сообщения строкой JSON без ожидания; медленный клиент отключается.
+
+        :param message: The message.
+        :type message: dict
+        :returns: None
+        :rtype: None
+        """
+        writer = self.writer
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > MAX_BUFFER:
+            writer.close()
+            return
+        writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+    def state(self):
+        """
+        Состояние игры для клиента: маски рядов, блоки, счет.
+
+        :returns: A ``"state"`` message.
+        :rtype: dict
+        """
+        game = self.game
+        block = game.current_block
+        self.seq += 1
+        return {"type": "state", "id": self.id, "seq": self.seq, "score": game.score,
+                "rows": game.grid.rows,
+                "block": [block.id, block.rotation_state, block.row_offset, block.column_offset],
+                "next": game.next_block.id, "game_over": game.game_over}
+
+
+class Room:
+    """
+    Комната для игры против соперника: общее зерно и обмен мусорными рядами.
+
+    :ivar name: The room name.
+    :vartype name: str
+    :ivar sessions: Players in the room.
+    :vartype sessions: list[Session]
+    :ivar rng: Source of the garbage hole columns.
+    :vartype rng: random.Random
+    :ivar started: True once the room is full and the games run.
+    :vartype started: bool
+    """
+    __slots__ = ("name", "sessions", "seed", "rng", "started")
+
+    def __init__(self, name, seed):
+        self.name = name
+        self.sessions = []
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.started = False
+
+
+class GameServer:
+    """
+    Сервер asyncio, на котором в одном процессе идут игры многих клиентов.
+
+    Протокол - строки JSON по TCP. Клиент отправляет
+    ``{"type": "join", "room": <имя или null>, "seed": <необязательно>}`` и затем
+    ``{"type": "input", "action": <"left"|"right"|"down"|"rotate"|"hard_drop"|"reset">}``.
+    Сервер отвечает ``"joined"``, ``"start"`` с зерном, ``"state"`` после
+    изменений (не чаще раза за тик), ``"garbage"``, ``"end"`` с победителем
+    комнаты и ``"error"``. После конца игры ``"reset"`` начинает новую
+    одиночную игру с новым ``"start"``.
+
+    Гравитация всех игр управляется одним :class:`TimerWheel`; состояния
+    рассылаются после обработки тика только тем клиентам, чья игра изменилась.
+
+    :param gravity_interval: Seconds between gravity steps of every game.
+    :type gravity_interval: float
+    :param tick: Resolution of the timer wheel in seconds.
+    :type tick: float
+    :ivar sessions: Connected clients by session id.
+    :vartype sessions: dict[int, Session]
+    :ivar rooms: Versus rooms by name.
+    :vartype rooms: dict[str, Room]
+    :ivar dirty: Sessions whose state must be sent after the current tick.
+    :vartype dirty: set[Session]
+    :ivar handlers: Tasks serving the connected clients.
+    :vartype handlers: set[asyncio.Task]
+    :ivar lag: The largest delay of a tick behind its due time, in seconds.
+    :vartype lag: float
+    """
+    def __init__(self, gravity_interval=GRAVITY_INTERVAL, tick=TICK):
+        self.gravity_interval = gravity_interval
+        self.wheel = TimerWheel(tick)
+        self.sessions = {}
+        self.rooms = {}
+        self.dirty = set()
+        self.next_id = 1
+        self.server = None
+        self.ticker = None
+        self.handlers = set()
+        self.lag = 0.0
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Запуск приема соединений и колеса таймеров.
+
+        :param host: Address to listen on.
+        :type host: str
+        :param port: Port to listen on, 0 for a free one.
+        :type port: int
+        :returns: The port the server listens on.
+        :rtype: int
+        """
+        self.server = await asyncio.start_server(self.handle, host, port, backlog=BACKLOG)
+        self.ticker = asyncio.create_task(self.run_wheel())
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """
+        Остановка сервера и отключение клиентов.
+
+        :returns: None
+        :rtype: None
+        """
+        self.ticker.cancel()
+        self.server.close()
+        for session in list(self.sessions.values()):
+            session.writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def run_wheel(self):
+        """
+        Цикл колеса таймеров: ожидание тика, гравитация и рассылка состояний.
+
+        :returns: None
+        :rtype: None
+        """
+        wheel = self.wheel
+        while True:
+            await asyncio.sleep(wheel.delay())
+            self.lag = max(self.lag, wheel.clock() - wheel.time - wheel.tick)
+            wheel.advance()
+            self.flush()
+
+    def flush(self):
+        """
+        Отправка состояний измененных игр.
+
+        :returns: None
+        :rtype: None
+        """
+        for session in self.dirty:
+            session.send(session.state())
+        self.dirty.clear()
+
+    async def handle(self, reader, writer):
+        """
+        Обработка соединения клиента.
+
+        :param reader: Stream from the client.
+        :type reader: asyncio.StreamReader
+        :param writer: Stream to the client.
+        :type writer: asyncio.StreamWriter
+        :returns: None
+        :rtype: None
+        """
+        session = Session(self.next_id, writer)
+        self.next_id += 1
+        self.sessions[session.id] = session
+        handler = asyncio.current_task()
+        self.handlers.add(handler)
+        try:
+            async for line in reader:
+                try:
+                    message = json.loads(line)
+                    kind = message["type"]
+                except (ValueError, KeyError, TypeError):
+                    session.send({"type": "error", "message": "malformed message"})
+                    continue
+                if kind == "join":
+                    self.join(session, message.get("room"), message.get("seed"))
+                elif kind == "input":
+                    self.input(session, message.get("action"))
+                else:
+                    session.send({"type": "error", "message": f"unknown message type {kind!r}"})
+        except ConnectionError:
+            pass
+        except (ValueError, asyncio.LimitOverrunError):
+            # строка длиннее предела StreamReader, дальше поток не разобрать
+            session.send({"type": "error", "message": "message too long"})
+        finally:
+            self.handlers.discard(handler)
+            self.leave(session)
+            writer.close()
+
+    def join(self, session, room_name=None, seed=None):
+        """
+        Начало одиночной игры или вход в комнату.
+
+        :param session: The joining client.
+        :type session: Session
+        :param room_name: The versus room, None for a solo game.
+        :type room_name: str or None
+        :param seed: Seed of a solo game or of a new room, random by default.
+        :type seed: int or None
+        :returns: None
+        :rtype: None
+        """
+        if room_name is not None and not isinstance(room_name, str):
+            session.send({"type": "error", "message": "room must be a string or null"})
+            return
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+            session.send({"type": "error", "message": "seed must be an integer or null"})
+            return
+        if session.room is not None or (session.game is not None and not session.game.game_over):
+            session.send({"type": "error", "message": "already joined"})
+            return
+        if seed is None:
+            seed = random.getrandbits(32)
+        if room_name is None:
+            session.send({"type": "joined", "id": session.id, "room": None})
+            self.start_game(session, seed)
+            return
+        room = self.rooms.get(room_name)
+        if room is None:
+            room = self.rooms[room_name] = Room(room_name, seed)
+        elif room.started:
+            session.send({"type": "error", "message": "room is full"})
+            return
+        room.sessions.append(session)
+        session.room = room
+        session.send({"type": "joined", "id": session.id, "room": room_name})
+        if len(room.sessions) == ROOM_SIZE:
+            room.started = True
+            for player in room.sessions:
+                self.start_game(player, room.seed)
+
+    def start_game(self, session, seed):
+        """
+        Создание игры клиента и запуск ее гравитации.
+
+        :param session: The client.
+        :type session: Session
+        :param seed: Seed of the block randomizer.
+        :type seed: int
+        :returns: None
+        :rtype: None
+        """
+        session.game = Game(seed=seed)
+        if session.room is not None:
+            session.game.subscribe("clear", lambda rows_cleared: self.attack(session, rows_cleared))
+        session.send({"type": "start", "seed": seed,
+                      "players": [player.id for player in session.room.sessions] if session.room else [session.id]})
+        self.dirty.add(session)
+        self.schedule_gravity(session)
+
+    def schedule_gravity(self, session):
+        """
+        Планирование следующего шага гравитации игры.
+
+        :param session: The client.
+        :type session: Session
+        :returns: None
+        :rtype: None
+        """
+        session.timer = self.wheel.schedule(self.gravity_interval, lambda: self.gravity(session))
+
+    def gravity(self, session):
+        """
+        Шаг гравитации игры и планирование следующего.
+
+        :param session: The client.
+        :type session: Session
+        :returns: None
+        :rtype: None
+        """
+        session.timer = None
+        game = session.game
+        game.move_down()
+        self.dirty.add(session)
+        if game.game_over:
+            self.finish(session)
+        else:
+            self.schedule_gravity(session)
+
+    def input(self, session, action):
+        """
+        Применение действия клиента к его игре.
+
+        :param session: The client.
+        :type session: Session
+        :param action: One of ``controls`` actions, or ``"reset"`` after a solo game over.
+        :type action: str
+        :returns: None
+        :rtype: None
+        """
+        game = session.game
+        if game is None:
+            session.send({"type": "error", "message": "not in a game"})
+            return
+        if action == "reset":
+            # новая игра вместо game.reset(): у игры из комнаты остаются подписки на атаки
+            if game.game_over and session.room is None:
+                self.start_game(session, random.getrandbits(32))
+            return
+        if action not in ACTIONS:
+            session.send({"type": "error", "message": f"unknown action {action!r}"})
+            return
+        if game.game_over:
+            return
+        apply_action(game, action)
+        self.dirty.add(session)
+        if game.game_over:
+            self.finish(session)
+
+    def attack(self, session, rows_cleared):
+        """
+        Отправка мусорных рядов соперникам за удаленные ряды.
+
+        :param session: The player who cleared the rows.
+        :type session: Session
+        :param rows_cleared: The number of rows cleared.
+        :type rows_cleared: int
+        :returns: None
+        :rtype: None
+        """
+        room = session.room
+        lines = GARBAGE_LINES[min(rows_cleared, len(GARBAGE_LINES) - 1)]
+        if not lines or room is None:
+            return
+        hole = room.rng.randrange(session.game.grid.num_cols)
+        for player in room.sessions:
+            if player is not session and player.game is not None and not player.game.game_over:
+                player.game.receive_garbage(lines, hole)
+                player.send({"type": "garbage", "lines": lines, "from": session.id})
+                self.dirty.add(player)
+                if player.game.game_over:
+                    self.finish(player)
+
+    def finish(self, session):
+        """
+        Конец игры клиента: остановка гравитации и определение победителя комнаты.
+
+        :param session: The client whose game is over.
+        :type session: Session
+        :returns: None
+        :rtype: None
+        """
+        if session.timer is not None:
+            session.timer.cancel()
+            session.timer = None
+        room = session.room
+        if room is None or not room.started:
+            return
+        alive = [player for player in room.sessions if player.game is not None and not player.game.game_over]
+        if len(alive) <= 1:
+            winner = alive[0].id if alive else None
+            for player in room.sessions:
+                if player.timer is not None:
+                    player.timer.cancel()
+                    player.timer = None
+                # партия окончена и для победителя, игроки могут войти в новую комнату
+                player.game.game_over = True
+                player.room = None
+                player.send({"type": "end", "winner": winner})
+            room.sessions = []
+            self.rooms.pop(room.name, None)
+
+    def leave(self, session):
+        """
+        Отключение клиента; в начатой комнате он проигрывает.
+
+        :param session: The client.
+        :type session: Session
+        :returns: None
+        :rtype: None
+        """
+        self.sessions.pop(session.id, None)
+        self.dirty.discard(session)
+        if session.timer is not None:
+            session.timer.cancel()
+            session.timer = None
+        room = session.room
+        if room is None:
+            return
+        if room.started:
+            session.game.game_over = True
+            self.finish(session)
+        elif session in room.sessions:
+            room.sessions.remove(session)
+            if not room.sessions:
+                self.rooms.pop(room.name, None)
+
+
+async def load_test(host, port, clients, duration, interval=0.1):
+    """
+    Нагрузочная проверка: одиночные клиенты сбрасывают блоки через интервал.
+
+    :param host: Server address.
+    :type host: str
+    :param port: Server port.
+    :type port: int
+    :param clients: The number of concurrent connections.
+    :type clients: int
+    :param duration: Seconds to run.
+    :type duration: float
+    :param interval: Seconds between the inputs of every client.
+    :type interval: float
+    :returns: The number of clients and the states received per second.
+    :rtype: dict
+    """
+    received = [0]
+
+    async def client(index):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(json.dumps({"type": "join", "seed": index}).encode() + b"\n")
+
+        async def read():
+            async for line in reader:
+                if line.startswith(b'{"type":"state"'):
+                    received[0] += 1
+
+        task = asyncio.create_task(read())
+        end = monotonic() + duration
+        action = json.dumps({"type": "input", "action": LEFT}).encode() + b"\n"
+        while monotonic() < end:
+            writer.write(action)
+            await asyncio.sleep(interval)
+        # сервер закрывает соединение сам, получив конец потока
+        writer.write_eof()
+        await task
+        writer.close()
+
+    start = monotonic()
+    await asyncio.gather(*(client(index) for index in range(clients)))
+    return {"clients": clients, "states_per_second": received[0] / (monotonic() - start)}
+
+
+def main(argv=None):
+    """
+    Запуск сервера или нагрузочной проверки из командной строки.
+
+    :param argv: Command-line arguments, ``sys.argv[1:]`` by default.
+    :type argv: list[str] or None
+    :returns: The exit status.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Host headless Tetris games over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--load", type=int, default=None, metavar="CLIENTS",
+                        help="run a loopback load test with this many clients instead")
+    parser.add_argument("--duration", type=float, default=10.0, help="load test length in seconds")
+    args = parser.parse_args(argv)
+
+    async def serve():
+        server = GameServer()
+        port = await server.start(args.host, 0 if args.load else args.port)
+        if args.load:
+            result = await load_test(args.host, port, args.load, args.duration)
+            result["max_tick_lag"] = server.lag
+            print(json.dumps(result))
+            await server.close()
+            return
+        print(f"listening on {args.host}:{port}", file=sys.stderr)
+        await server.server.serve_forever()
+
+    asyncio.run(serve())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+from blocks import BLOCKS
+from grid import GARBAGE as GARBAGE_CELL
+from replay import write_varint, read_varint
+
+# Коды операций кадра
+KEYFRAME, LOCK, CLEAR, GARBAGE, PIECE, SHIFT, DROP, ROTATE, NEXT, SCORE, GAME_OVER = range(11)
+# Число поворотов каждого вида блока, чтобы декодер применял ROTATE без таблиц форм
+ROTATIONS = {block_class().id: len(block_class.shapes) for block_class in BLOCKS}
+# Опорный кадр отправляется не реже, чем раз в столько кадров
+KEYFRAME_INTERVAL = 300
+
+
+def zigzag(value):
+    """
+    Отображение целого со знаком в неотрицательное для varint: 0, -1, 1, -2, ...
+
+    :param value: The signed number.
+    :type value: int
+    :returns: The unsigned number.
+    :rtype: int
+    """
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    """
+    Обратное преобразование к :func:`zigzag`.
+
+    :param value: The unsigned number.
+    :type value: int
+    :returns: The signed number.
+    :rtype: int
+    """
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+class StreamEncoder:
+    """
+    Кодирование изменений игры в компактные двоичные кадры: опорные кадры и разности.
+
+    Кадр начинается с номера (varint), за которым идут операции. Опорный кадр
+    содержит всю доску по 4 бита на ячейку; разностный - ячейки
+    зафиксированного блока (событие ``"lock"``), индексы удаленных рядов
+    (``Grid.cleared_rows``), мусорные ряды и перемещения блока короткими
+    кодами ``SHIFT``/``DROP``/``ROTATE``. Если кадр потерян, декодер
+    отказывается применять следующие разности, и отправитель должен вызвать
+    :meth:`request_keyframe`; то же нужно после ``Game.restore``, который не
+    посылает событий.
+
+    :param game: The game to encode.
+    :type game: Game
+    :param keyframe_interval: Frames between forced keyframes.
+    :type keyframe_interval: int
+    :ivar seq: Number of the last encoded frame.
+    :vartype seq: int
+    :ivar pending: Board operations recorded since the last frame.
+    :vartype pending: bytearray
+    """
+    def __init__(self, game, keyframe_interval=KEYFRAME_INTERVAL):
+        self.game = game
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self.pending = bytearray()
+        self.force_keyframe = True
+        self.since_keyframe = 0
+        self.piece = None
+        self.piece_block = None
+        self.next_id = None
+        self.score = None
+        self.game_over = None
+        game.subscribe("lock", self.on_lock)
+        game.subscribe("clear", self.on_clear)
+        game.subscribe("garbage", self.on_garbage)
+        game.subscribe("reset", self.request_keyframe)
+
+    def request_keyframe(self):
+        """
+        Следующий кадр будет опорным, например после потери кадра у получателя.
+
+        :returns: None
+        :rtype: None
+        """
+        self.force_keyframe = True
+
+    def on_lock(self):
+        """
+        Запись ячеек зафиксированного блока.
+
+        :returns: None
+        :rtype: None
+        """
+        block = self.game.current_block
+        num_cols = self.game.grid.num_cols
+        out = self.pending
+        positions = block.get_cell_positions()
+        out.append(LOCK)
+        out.append(block.id)
+        out.append(len(positions))
+        for position in positions:
+            write_varint(out, position.row * num_cols + position.column)
+        # после фиксации текущим становится другой блок
+        self.piece_block = None
+
+    def on_clear(self, rows_cleared):
+        """
+        Запись индексов удаленных рядов.
+
+        :param rows_cleared: The number of rows cleared.
+        :type rows_cleared: int
+        :returns: None
+        :rtype: None
+        """
+        out = self.pending
+        out.append(CLEAR)
+        cleared = self.game.grid.cleared_rows
+        out.append(len(cleared))
+        for row in cleared:
+            write_varint(out, row)
+
+    def on_garbage(self, count, hole):
+        """
+        Запись мусорных рядов.
+
+        :param count: The number of garbage rows.
+        :type count: int
+        :param hole: The empty column of the garbage rows.
+        :type hole: int
+        :returns: None
+        :rtype: None
+        """
+        out = self.pending
+        out.append(GARBAGE)
+        write_varint(out, count)
+        write_varint(out, hole)
+        # блок мог подняться вместе с доской
+        self.piece_block = None
+
+    def write_keyframe(self, out):
+        """
+        Запись всей доски: размеры и цвета ячеек по 4 бита.
+
+        :param out: The frame buffer.
+        :type out: bytearray
+        :returns: None
+        :rtype: None
+        """
+        grid = self.game.grid
+        out.append(KEYFRAME)
+        write_varint(out, grid.num_rows)
+        write_varint(out, grid.num_cols)
+        cells = [int(value) for row in grid.grid for value in row]
+        if len(cells) % 2:
+            cells.append(0)
+        out.extend(cells[index] << 4 | cells[index + 1] for index in range(0, len(cells), 2))
+
+    def frame(self):
+        """
+        Кадр со всеми изменениями после предыдущего кадра.
+
+        :returns: The encoded frame; it only holds the sequence number if nothing changed.
+        :rtype: bytes
+        """
+        game = self.game
+        self.seq += 1
+        out = bytearray()
+        write_varint(out, self.seq)
+        self.since_keyframe += 1
+        if self.force_keyframe or self.since_keyframe >= self.keyframe_interval:
+            self.force_keyframe = False
+            self.since_keyframe = 0
+            self.write_keyframe(out)
+            self.piece_block = self.next_id = self.score = self.game_over = None
+        else:
+            out += self.pending
+        self.pending.clear()
+
+        block = game.current_block
+        piece = (block.rotation_state, block.row_offset, block.column_offset)
+        if block is not self.piece_block:
+            out.append(PIECE)
+            out.append(block.id)
+            out.append(block.rotation_state)
+            write_varint(out, zigzag(block.row_offset))
+            write_varint(out, zigzag(block.column_offset))
+        elif piece != self.piece:
+            rotations = (piece[0] - self.piece[0]) % len(block.shapes)
+            if rotations:
+                out.append(ROTATE)
+                out.append(rotations)
+            if piece[2] != self.piece[2]:
+                out.append(SHIFT)
+                write_varint(out, zigzag(piece[2] - self.piece[2]))
+            if piece[1] != self.piece[1]:
+                out.append(DROP)
+                write_varint(out, zigzag(piece[1] - self.piece[1]))
+        self.piece_block = block
+        self.piece = piece
+        if game.next_block.id != self.next_id:
+            self.next_id = game.next_block.id
+            out.append(NEXT)
+            out.append(self.next_id)
+        if game.score != self.score:
+            self.score = game.score
+            out.append(SCORE)
+            write_varint(out, game.score)
+        if game.game_over != self.game_over:
+            self.game_over = game.game_over
+            out.append(GAME_OVER)
+            out.append(int(game.game_over))
+        return bytes(out)
+
+
+class StreamDecoder:
+    """
+    Восстановление доски и состояния блока из кадров :class:`StreamEncoder`.
+
+    :ivar seq: Number of the last applied frame, 0 before the first keyframe.
+    :vartype seq: int
+    :ivar grid: Cell colors, as in ``Grid.grid``.
+    :vartype grid: list[list[int]]
+    :ivar piece: The falling block as (id, rotation, row offset, column offset).
+    :vartype piece: tuple[int, int, int, int] or None
+    :ivar next_id: Id of the next block.
+    :vartype next_id: int or None
+    :ivar score: The score.
+    :vartype score: int
+    :ivar game_over: The game over flag.
+    :vartype game_over: bool
+    :ivar synced: False until a keyframe arrives and after a missed frame.
+    :vartype synced: bool
+    """
+    def __init__(self):
+        self.seq = 0
+        self.grid = []
+        self.num_cols = 0
+        self.piece = None
+        self.next_id = None
+        self.score = 0
+        self.game_over = False
+        self.synced = False
+
+    def apply(self, frame):
+        """
+        Применение кадра.
+
+        Разностный кадр применяется только если он следует сразу за
+        предыдущим; иначе декодер ждет опорный кадр.
+
+        :param frame: A frame from :meth:`StreamEncoder.frame`.
+        :type frame: bytes
+        :raises ValueError: If the frame has an unknown operation.
+        :returns: True if the frame was applied, False if a keyframe is needed.
+        :rtype: bool
+        """
+        seq, position = read_varint(frame, 0)
+        keyframe = position < len(frame) and frame[position] == KEYFRAME
+        if not keyframe and (not self.synced or seq != self.seq + 1):
+            self.synced = False
+            return False
+        self.seq = seq
+        self.synced = True
+        length = len(frame)
+        while position < length:
+            op = frame[position]
+            position += 1
+            if op == KEYFRAME:
+                num_rows, position = read_varint(frame, position)
+                self.num_cols, position = read_varint(frame, position)
+                size = num_rows * self.num_cols
+                packed = frame[position:position + (size + 1) // 2]
+                position += (size + 1) // 2
+                cells = []
+                for byte in packed:
+                    cells.append(byte >> 4)
+                    cells.append(byte & 0x0F)
+                self.grid = [cells[row * self.num_cols:(row + 1) * self.num_cols] for row in range(num_rows)]
+            elif op == LOCK:
+                value, count = frame[position], frame[position + 1]
+                position += 2
+                for _ in range(count):
+                    index, position = read_varint(frame, position)
+                    self.grid[index // self.num_cols][index % self.num_cols] = value
+            elif op == CLEAR:
+                count = frame[position]
+                position += 1
+                for _ in range(count):
+                    row, position = read_varint(frame, position)
+                    del self.grid[row]
+                    self.grid.insert(0, [0] * self.num_cols)
+            elif op == GARBAGE:
+                count, position = read_varint(frame, position)
+                hole, position = read_varint(frame, position)
+                count = min(count, len(self.grid))
+                del self.grid[:count]
+                self.grid.extend([0 if column == hole else GARBAGE_CELL for column in range(self.num_cols)]
+                                 for _ in range(count))
+            elif op == PIECE:
+                kind, rotation = frame[position], frame[position + 1]
+                row, position = read_varint(frame, position + 2)
+                column, position = read_varint(frame, position)
+                self.piece = (kind, rotation, unzigzag(row), unzigzag(column))
+            elif op == ROTATE:
+                kind, rotation, row, column = self.piece
+                self.piece = (kind, (rotation + frame[position]) % ROTATIONS[kind], row, column)
+                position += 1
+            elif op == SHIFT:
+                delta, position = read_varint(frame, position)
+                kind, rotation, row, column = self.piece
+                self.piece = (kind, rotation, row, column + unzigzag(delta))
+            elif op == DROP:
+                delta, position = read_varint(frame, position)
+                kind, rotation, row, column = self.piece
+                self.piece = (kind, rotation, row + unzigzag(delta), column)
+            elif op == NEXT:
+                self.next_id = frame[position]
+                position += 1
+            elif op == SCORE:
+                self.score, position = read_varint(frame, position)
+            elif op == GAME_OVER:
+                self.game_over = bool(frame[position])
+                position += 1
+            else:
+                raise ValueError(f"unknown stream operation {op}")
+        return True
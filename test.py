@@ -1,11 +1,17 @@
+import os
+import random
+import subprocess
+import sys
+
 import pytest
 from unittest.mock import Mock, patch
 from game import Game  
+from grid import Grid, BitGrid
+from blocks import IBlock, TBlock
 
 @pytest.fixture
 def game():
-    with patch('pygame.mixer.Sound'), patch('pygame.mixer.music'):
-        return Game()
+    return Game()
 
 def test_update_score(game):
     game.update_score(1, 10)
@@ -36,11 +42,920 @@ def test_move_down(game):
         game.current_block.move.assert_called_with(1, 0)
 
 def test_block_fits(game):
-    with patch.object(game.current_block, 'get_cell_positions', return_value=[]), patch.object(game.grid, 'is_empty', return_value=True):
-        assert game.block_fits() is True
+    with patch.object(game.grid, 'fits', return_value=False) as fits:
+        assert game.block_fits() is False
+        fits.assert_called_once_with(game.current_block)
+    assert game.block_fits() is True
 
 def test_block_inside(game):
-    with patch.object(game.current_block, 'get_cell_positions', return_value=[]), patch.object(game.grid, 'is_inside', return_value=True):
-        assert game.block_inside() is True
+    block = game.current_block
+    with patch.object(game.grid, 'shape_inside', return_value=False) as shape_inside:
+        assert game.block_inside() is False
+        shape_inside.assert_called_once_with(block.shapes[block.rotation_state], block.row_offset,
+                                             block.column_offset)
+    assert game.block_inside() is True
+    block.move(0, -game.grid.num_cols)
+    assert game.block_inside() is False
+
+def test_bitgrid_clear_full_rows_matches_grid():
+    grid, bitgrid = Grid(), BitGrid()
+    for g in (grid, bitgrid):
+        for column in range(g.num_cols):
+            g.set_cell(19, column, 1)
+            g.set_cell(17, column, 2)
+        g.set_cell(18, 4, 3)
+        g.set_cell(16, 0, 5)
+        assert g.clear_full_rows() == 2
+    assert bitgrid.grid == grid.grid
+    assert bitgrid.rows[19] == 1 << 4
+    assert bitgrid.rows[18] == 1
+
+def test_bitgrid_fits(game):
+    block = game.current_block
+    assert game.grid.fits(block)
+    position = block.get_cell_positions()[0]
+    game.grid.set_cell(position.row, position.column, 1)
+    assert not game.grid.fits(block)
+    assert game.block_fits() is False
+
+def test_shape_tables_are_shared():
+    first, second = TBlock(), TBlock()
+    assert first.shapes is second.shapes
+    assert len(IBlock.shapes) == 4
+    shape = IBlock.shapes[1]
+    assert (shape.min_row, shape.max_row, shape.min_column, shape.max_column) == (0, 3, 2, 2)
+    assert shape.row_masks == ((0, 1), (1, 1), (2, 1), (3, 1))
+
+def test_can_place_matches_between_backends():
+    grid, bitgrid = Grid(), BitGrid()
+    for row, column in [(19, 0), (19, 1), (18, 5), (10, 9), (15, 3)]:
+        grid.set_cell(row, column, 6)
+        bitgrid.set_cell(row, column, 6)
+    for shape in IBlock.shapes + TBlock.shapes:
+        for row in range(-2, 21):
+            for column in range(-3, 11):
+                assert grid.can_place(shape, row, column) == bitgrid.can_place(shape, row, column)
+
+def test_engine_does_not_import_pygame():
+    code = "import sys, game; assert 'pygame' not in sys.modules and 'numpy' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+def test_events_are_emitted(game):
+    events = []
+    game.subscribe("lock", lambda: events.append("lock"))
+    game.subscribe("clear", lambda rows: events.append(("clear", rows)))
+    for column in range(game.grid.num_cols):
+        if column not in range(3, 7):
+            game.grid.set_cell(19, column, 1)
+    game.current_block = IBlock()
+    while "lock" not in events:
+        game.move_down()
+    assert events == ["lock", ("clear", 1)]
+    assert game.score == 100
+
+def test_batch_game_matches_game():
+    import numpy as np
+    from batch import BatchGame, NOOP, LEFT, RIGHT, ROTATE, DOWN
+    rng = random.Random(7)
+    batch = BatchGame(1, seed=3)
+    game = Game()
+    batch.kind[0] = game.current_block.id
+    batch.row[0], batch.column[0] = game.current_block.row_offset, game.current_block.column_offset
+    batch.next_kind[0] = game.next_block.id
+    moves = {LEFT: game.move_left, RIGHT: game.move_right, ROTATE: game.rotate}
+    for _ in range(3000):
+        if game.game_over:
+            break
+        action = rng.choice([NOOP, LEFT, RIGHT, ROTATE, DOWN, DOWN])
+        if action == DOWN:
+            game.move_down()
+            game.update_score(0, 1)
+        elif action in moves:
+            moves[action]()
+        batch.step(np.array([action]), gravity=False)
+        batch.next_kind[0] = game.next_block.id
+        if not game.game_over:
+            game.move_down()
+            batch.step(np.array([NOOP]))
+            batch.next_kind[0] = game.next_block.id
+        assert batch.boards[0].tolist() == game.grid.grid
+        assert batch.score[0] == game.score
+        assert batch.kind[0] == game.current_block.id
+        assert (batch.rotation[0], batch.row[0], batch.column[0]) == (
+            game.current_block.rotation_state, game.current_block.row_offset, game.current_block.column_offset)
+    assert batch.game_over[0] == game.game_over
+
+def test_batch_game_observation_is_zero_copy():
+    from batch import BatchGame, DOWN
+    batch = BatchGame(8, seed=1)
+    observation = batch.observation()
+    for _ in range(200):
+        batch.step([DOWN] * 8)
+    assert observation is batch.boards
+    assert observation.any()
+
+def test_find_placements_paths_reach_placement(game):
+    from search import find_placements
+    # у блока O мало положений, поэтому блок задан явно
+    game.current_block = TBlock()
+    for column in range(game.grid.num_cols - 1):
+        game.grid.set_cell(19, column, 1)
+    game.grid.set_cell(18, 0, 1)
+    placements = find_placements(game)
+    assert len(placements) > 10
+    for placement in placements:
+        block = type(game.current_block)()
+        trial = Game(game.grid.copy())
+        trial.current_block = block
+        actions = {"left": trial.move_left, "right": trial.move_right,
+                   "rotate": trial.rotate, "down": trial.move_down}
+        for move in placement.path:
+            actions[move]()
+        assert (block.rotation_state, block.row_offset, block.column_offset) == (
+            placement.rotation, placement.row, placement.column)
+        trial.move_down()
+        assert trial.current_block is not block
+
+def test_search_two_plies_uses_transposition_table(game):
+    from search import PlacementSearch
+    search = PlacementSearch()
+    value, line = search.best(game, lambda grid, lines: lines * 10 - max(grid.occupancy_key()), depth=2)
+    assert len(line) == 2
+    assert len(search.table) > 1
+    size = len(search.table)
+    search.best(game, lambda grid, lines: 0, depth=2)
+    assert len(search.table) == size
+
+def test_incremental_features_match_full_scan():
+    from search import find_placements
+    rng = random.Random(5)
+    game = Game()
+    for _ in range(200):
+        if game.game_over:
+            break
+        block = game.current_block
+        for placement in find_placements(game):
+            shape = block.shapes[placement.rotation]
+            lines, features = game.grid.features_after(shape, placement.row, placement.column)
+            assert (lines, features) == Grid.features_after(game.grid, shape, placement.row, placement.column)
+        placement = rng.choice(find_placements(game))
+        block.rotation_state, block.row_offset, block.column_offset = (
+            placement.rotation, placement.row, placement.column)
+        game.lock_block()
+        assert game.grid.features() == Grid.features(game.grid)
+
+def test_features_values():
+    grid = BitGrid()
+    grid.set_cell(19, 0, 1)
+    grid.set_cell(17, 0, 1)
+    grid.set_cell(19, 2, 1)
+    features = grid.features()
+    assert features.heights == (3, 0, 1) + (0,) * 7
+    assert features.holes == 1
+    assert features.bumpiness == 3 + 1 + 1
+    assert features.wells == 1
+    assert features.row_transitions == 18 * 2 + 2 + 4
+
+def test_zobrist_hash_is_incremental(game):
+    rng = random.Random(11)
+    for _ in range(2000):
+        if game.game_over:
+            break
+        rng.choice([game.move_left, game.move_right, game.rotate, game.move_down, game.move_down])()
+        assert game.grid.zobrist_hash() == Grid.zobrist_hash(game.grid)
+    assert game.grid.zobrist_hash() != 0
+
+def test_snapshot_and_restore(game):
+    rng = random.Random(3)
+    for _ in range(300):
+        rng.choice([game.move_left, game.move_right, game.rotate, game.move_down])()
+    state = game.snapshot()
+    key = game.zobrist_hash()
+    grid = [row[:] for row in game.grid.grid]
+    features = game.grid.features()
+    score = game.score
+    for _ in range(300):
+        rng.choice([game.move_left, game.move_right, game.rotate, game.move_down])()
+    assert game.zobrist_hash() != key
+    game.restore(state)
+    assert game.zobrist_hash() == key
+    assert game.grid.grid == grid
+    assert game.grid.features() == features
+    assert game.score == score
+
+def test_seeded_randomizer_is_reproducible():
+    first, second = Game(seed=42), Game(seed=42)
+    upcoming = first.upcoming(10)
+    clone = first.randomizer.clone()
+    assert upcoming[:7] == clone.peek(7)
+    drawn = []
+    for _ in range(10):
+        first.lock_block()
+        second.lock_block()
+        drawn.append(first.next_block.id)
+        assert first.current_block.id == second.current_block.id
+    assert drawn == upcoming
+    assert [clone.next() for _ in range(10)] == upcoming
+
+def test_bag_contains_each_block_once():
+    game = Game(seed=1)
+    kinds = [game.current_block.id, game.next_block.id] + [block.id for block in game.blocks]
+    assert sorted(kinds) == [1, 2, 3, 4, 5, 6, 7]
+
+def test_blocks_are_pooled():
+    game = Game(seed=9)
+    pooled = {id(block) for pair in game.pool.values() for block in pair}
+    for _ in range(50):
+        game.lock_block()
+        assert id(game.current_block) in pooled and id(game.next_block) in pooled
+        assert game.current_block is not game.next_block
+
+def test_renderer_matches_full_redraw():
+    import pygame
+    from renderer import Renderer
+    pygame.font.init()
+    font = pygame.font.Font(None, 40)
+    game = Game(seed=4)
+    screen = pygame.Surface((500, 620))
+    renderer = Renderer(game, screen, font)
+    assert renderer.render() == [screen.get_rect()]
+    assert renderer.render() == []
+    game.move_left()
+    assert 0 < len(renderer.render()) <= 4
+    rng = random.Random(2)
+    for _ in range(400):
+        rng.choice([game.move_left, game.move_right, game.rotate, game.move_down, game.move_down])()
+        renderer.render()
+    fresh = pygame.Surface((500, 620))
+    Renderer(game, fresh, font).render()
+    assert pygame.image.tobytes(screen, "RGB") == pygame.image.tobytes(fresh, "RGB")
+
+def test_tile_draw_matches_rects():
+    import pygame
+    game = Game(seed=6)
+    for _ in range(40):
+        game.move_down()
+    expected = pygame.Surface((500, 620))
+    for row in range(game.grid.num_rows):
+        for column in range(game.grid.num_cols):
+            pygame.draw.rect(expected, game.grid.colors[game.grid.grid[row][column]],
+                             pygame.Rect(column * 30 + 11, row * 30 + 11, 29, 29))
+    for position in game.current_block.get_cell_positions():
+        pygame.draw.rect(expected, game.current_block.colors[game.current_block.id],
+                         pygame.Rect(position.column * 30 + 11, position.row * 30 + 11, 29, 29))
+    screen = pygame.Surface((500, 620))
+    game.grid.draw(screen)
+    game.current_block.draw(screen, 11, 11)
+    assert pygame.image.tobytes(screen, "RGB") == pygame.image.tobytes(expected, "RGB")
+
+def test_cached_text_renders_once():
+    import pygame
+    from tiles import CachedText
+    pygame.font.init()
+    text = CachedText(pygame.font.Font(None, 40), (255, 255, 255))
+    first = text.render(10)
+    assert text.render(10) is first
+    assert text.render(20) is not first
+
+def test_input_handler_das_and_arr():
+    from controls import InputHandler, LEFT, RIGHT, ROTATE
+    inputs = InputHandler(das=0.1, arr=0.02, clock=lambda: 0.0)
+    inputs.press(LEFT, 1.0)
+    inputs.press(ROTATE, 1.005)
+    assert inputs.poll(1.05) == [(1.0, LEFT), (1.005, ROTATE)]
+    assert inputs.next_time() == pytest.approx(1.1)
+    actions = inputs.poll(1.145)
+    assert [action for timestamp, action in actions] == [LEFT, LEFT, LEFT]
+    assert [timestamp for timestamp, action in actions] == pytest.approx([1.1, 1.12, 1.14])
+    inputs.press(RIGHT, 1.15)
+    inputs.release(RIGHT, 1.3)
+    actions = inputs.poll(1.35)
+    assert actions[0] == (1.15, RIGHT)
+    assert [timestamp for timestamp, action in actions if action == RIGHT][1:] == pytest.approx([1.25, 1.27, 1.29])
+    assert [timestamp for timestamp, action in actions if action == LEFT] == []
+    assert [timestamp for timestamp, action in inputs.poll(1.43)] == pytest.approx([1.4, 1.42])
+    inputs.release(LEFT, 1.47)
+    assert [timestamp for timestamp, action in inputs.poll(2.0)] == pytest.approx([1.44, 1.46])
+    assert inputs.next_time() is None
+
+def test_hard_drop_matches_repeated_move_down():
+    rng = random.Random(8)
+    for seed in range(5):
+        game = Game(seed=seed)
+        for _ in range(60):
+            if game.game_over:
+                break
+            for _ in range(rng.randrange(12)):
+                rng.choice([game.move_left, game.move_right, game.rotate, game.move_down])()
+            block = game.current_block
+            shape = block.shape
+            expected = 0
+            while game.grid.can_place(shape, block.row_offset + expected + 1, block.column_offset):
+                expected += 1
+            assert game.drop_distance() == expected
+            assert Grid.drop_distance(game.grid, shape, block.row_offset, block.column_offset) == expected
+            assert game.ghost_position() == block.row_offset + expected
+            game.hard_drop()
+            assert game.current_block is not block
+            assert game.grid.features() == Grid.features(game.grid)
+
+def test_drop_distance_under_overhang():
+    grid = BitGrid()
+    for column in range(3, 7):
+        grid.set_cell(10, column, 1)
+    shape = IBlock.shapes[0]
+    assert grid.drop_distance(shape, 12, 3) == 6
+    assert grid.drop_distance(shape, 0, 3) == 8
+
+def test_replay_roundtrip_and_seek():
+    from controls import LEFT, RIGHT, ROTATE, DOWN, HARD_DROP
+    from replay import Replay, ReplayPlayer, ReplayRecorder, GRAVITY, LOCK, RESET
+    rng = random.Random(12)
+    game = Game(seed=77)
+    recorder = ReplayRecorder(game, 77)
+    moment = 0.0
+    states = [game.zobrist_hash()]
+    for _ in range(3000):
+        moment += rng.random() * 0.1
+        if game.game_over:
+            recorder.apply(RESET, moment)
+        else:
+            recorder.apply(rng.choice([LEFT, RIGHT, ROTATE, DOWN, GRAVITY, GRAVITY, HARD_DROP]), moment)
+        states.append(game.zobrist_hash())
+    data = recorder.finish()
+    assert len(data) < 3 * 3000
+    replay = Replay(data)
+    assert replay.seed == 77
+    moves = [action for action in replay.actions if action != LOCK]
+    assert len(moves) == 3000
+    player = ReplayPlayer(replay, interval=100)
+    assert player.run().score == game.score
+    for position in (2500, 10, 1234, 0):
+        target = [index for index, action in enumerate(replay.actions) if action != LOCK][position]
+        assert player.seek(target).zobrist_hash() == states[position]
+
+def test_replay_detects_tampering():
+    from replay import Replay, ReplayPlayer, ReplayRecorder, GRAVITY
+    game = Game(seed=5)
+    recorder = ReplayRecorder(game, 5)
+    for index in range(200):
+        recorder.apply(GRAVITY, index * 0.2)
+    data = bytearray(recorder.finish())
+    data[-9] ^= 1
+    with pytest.raises(ValueError):
+        ReplayPlayer(Replay(bytes(data))).run()
+
+def test_replay_keeps_board_size():
+    from controls import LEFT, HARD_DROP
+    from grid import BitGrid
+    from replay import Replay, ReplayPlayer, ReplayRecorder, GRAVITY, HEADER, HEADER_V1
+    game = Game(BitGrid(24, 12), 4, spawn_column=2)
+    recorder = ReplayRecorder(game, 4)
+    for index in range(300):
+        recorder.apply((LEFT, GRAVITY, GRAVITY, HARD_DROP)[index % 4], index * 0.1)
+    data = recorder.finish()
+    replay = Replay(data)
+    assert (replay.num_rows, replay.num_cols, replay.spawn_column) == (24, 12, 2)
+    played = ReplayPlayer(replay).run()
+    assert (played.grid.num_rows, played.grid.num_cols) == (24, 12) and played.zobrist_hash() == game.zobrist_hash()
+    # журнал первой версии воспроизводится на доске 20x10
+    old = Game(seed=4)
+    recorder = ReplayRecorder(old, 4)
+    for index in range(100):
+        recorder.apply(GRAVITY, index * 0.1)
+    data = recorder.finish()
+    data = HEADER_V1.pack(*HEADER.unpack_from(data)[:4]) + data[HEADER.size:]
+    data = data[:4] + b"\x01" + data[5:]
+    assert ReplayPlayer(Replay(data)).run().zobrist_hash() == old.zobrist_hash()
+
+def test_tournament_pool_matches_serial(tmp_path):
+    from tournament import ResultWriter, run_tournament, summarize
+    serial = sorted(run_tournament("agents:HeuristicAgent", range(3), max_pieces=30, workers=1))
+    pooled = sorted(run_tournament("agents:HeuristicAgent", range(3), max_pieces=30, workers=2))
+    assert [(r.seed, r.score, r.lines, r.pieces, r.steps) for r in serial] == \
+           [(r.seed, r.score, r.lines, r.pieces, r.steps) for r in pooled]
+    assert all(result.pieces == 30 and not result.game_over for result in serial)
+    summary = summarize(serial)
+    assert summary["games"] == 3 and summary["score_min"] <= summary["score_mean"] <= summary["score_max"]
+    writer = ResultWriter(str(tmp_path / "results.jsonl"))
+    for result in serial:
+        writer.write(result)
+    writer.close()
+    assert len((tmp_path / "results.jsonl").read_text().splitlines()) == 3
+
+def test_heuristic_agent_clears_lines():
+    from agents import HeuristicAgent
+    from tournament import play_game
+    result = play_game(HeuristicAgent(), seed=4, max_pieces=100)
+    assert result.lines >= 30 and not result.game_over
+
+def test_tuner_resumes_from_checkpoint(tmp_path):
+    from tuning import CrossEntropyTuner
+    settings = dict(population=6, games=2, max_pieces=15, seed=3, workers=1)
+    straight = CrossEntropyTuner(**settings)
+    straight.run(2)
+    path = str(tmp_path / "tuning.json")
+    first = CrossEntropyTuner(checkpoint=path, **settings)
+    first.run(1)
+    resumed = CrossEntropyTuner(checkpoint=path, **settings)
+    assert resumed.generation == 1 and resumed.cache == first.cache
+    resumed.run(2)
+    assert resumed.mean == straight.mean and resumed.history == straight.history
+    candidate = resumed.sample()[0]
+    fitness = resumed.evaluate([candidate])
+    cached = len(resumed.cache)
+    assert resumed.evaluate([candidate]) == fitness and len(resumed.cache) == cached
+
+def test_tuner_pool_matches_serial():
+    from tuning import CrossEntropyTuner
+    serial = CrossEntropyTuner(population=4, games=2, max_pieces=10, workers=1)
+    pooled = CrossEntropyTuner(population=4, games=2, max_pieces=10, workers=2)
+    serial.run(1)
+    pooled.run(1)
+    assert serial.cache == pooled.cache and serial.best == pooled.best
+
+def test_array_grid_matches_bit_grid():
+    from controls import LEFT, RIGHT, ROTATE, DOWN, HARD_DROP, apply_action
+    from arraygrid import ArrayGrid
+    rng = random.Random(9)
+    reference = Game(seed=21)
+    array_game = Game(ArrayGrid(), seed=21)
+    cells = array_game.grid.grid
+    for _ in range(4000):
+        action = rng.choice([LEFT, RIGHT, ROTATE, DOWN, DOWN, HARD_DROP])
+        for each in (reference, array_game):
+            apply_action(each, action)
+            if each.game_over:
+                each.game_over = False
+                each.reset()
+        assert array_game.grid.rows == reference.grid.rows
+    assert array_game.grid.grid is cells
+    assert cells.tolist() == reference.grid.grid
+    assert array_game.grid.features() == reference.grid.features()
+    assert array_game.zobrist_hash() == reference.zobrist_hash()
+    board = array_game.grid.copy()
+    board.set_cell(0, 0, 3)
+    assert cells[0, 0] == reference.grid.grid[0][0]
+
+def test_env_observation_shares_memory():
+    import numpy as np
+    from env import TetrisEnv, PRIMITIVE_ACTIONS
+    env = TetrisEnv()
+    observation = env.reset(seed=1)
+    board = observation["board"]
+    assert np.shares_memory(board, env.game.grid.grid) and not board.flags.writeable
+    done = False
+    while not done:
+        observation, reward, done, info = env.step(PRIMITIVE_ACTIONS.index("hard_drop"))
+        assert observation["board"] is board
+        assert board.tolist() == env.game.grid.grid.tolist()
+    assert env.game.game_over
+    with pytest.raises(ValueError):
+        env.step(0)
+    assert env.reset(seed=1)["board"] is board and not board.any()
+
+def test_env_placement_actions():
+    from agents import HeuristicAgent
+    from env import TetrisEnv, PLACEMENT
+    env = TetrisEnv(PLACEMENT, max_steps=50)
+    env.reset(seed=2)
+    agent = HeuristicAgent()
+    agent.search = env.search
+    total = 0
+    done = False
+    while not done:
+        placements = env.legal_actions()
+        assert env.action_count() == len(placements) > 0
+        value, line = agent.search.best(env.game, agent.evaluate)
+        observation, reward, done, info = env.step(placements.index(line[0]))
+        total += reward
+    assert info["steps"] == 50 and info["lines"] > 10 and total == env.game.score
+
+def test_timer_wheel_fires_in_order():
+    from server import TimerWheel
+    now = [0.0]
+    wheel = TimerWheel(tick=0.01, slots=8, clock=lambda: now[0])
+    fired = []
+    wheel.schedule(0.03, lambda: fired.append("a"))
+    late = wheel.schedule(0.2, lambda: fired.append("late"))
+    cancelled = wheel.schedule(0.05, lambda: fired.append("cancelled"))
+    cancelled.cancel()
+    wheel.schedule(0.1, lambda: fired.append("b"))
+    now[0] = 0.1 + 1e-9
+    assert wheel.advance() == 2 and fired == ["a", "b"]
+    assert not late.cancelled and wheel.count == 1
+    now[0] = 0.3
+    wheel.advance()
+    assert fired == ["a", "b", "late"] and wheel.count == 0
+    # исключение в одном вызове не останавливает остальные
+    wheel.schedule(0.01, lambda: 1 / 0)
+    wheel.schedule(0.01, lambda: fired.append("after"))
+    now[0] = 0.4
+    assert wheel.advance() == 2 and fired[-1] == "after" and wheel.count == 0
+
+def test_garbage_lifts_board_on_every_backend():
+    from arraygrid import ArrayGrid
+    from grid import BitGrid, Grid, GARBAGE
+    for grid in (Grid(), BitGrid(), ArrayGrid()):
+        grid.set_cell(19, 0, 3)
+        assert grid.add_garbage(2, 4) is False
+        assert list(grid.grid[17]) == [3] + [0] * 9
+        assert list(grid.grid[19]) == [GARBAGE] * 4 + [0] + [GARBAGE] * 5
+    reference = Grid()
+    reference.grid = [list(row) for row in grid.grid]
+    assert grid.features() == Grid.features(reference)
+    assert grid.zobrist_hash() == Grid.zobrist_hash(grid)
+    game = Game(seed=3)
+    events = []
+    game.subscribe("garbage", lambda count, hole: events.append((count, hole)))
+    game.receive_garbage(2, 7)
+    game.receive_garbage(19, 0)
+    assert game.game_over and events == [(2, 7), (19, 0)]
+
+def test_server_versus_room_over_loopback():
+    import asyncio
+    import json
+    from server import GameServer
+
+    async def scenario():
+        server = GameServer(gravity_interval=0.02)
+        port = await server.start()
+        clients = [await asyncio.open_connection("127.0.0.1", port) for _ in range(2)]
+        for reader, writer in clients:
+            writer.write(b'{"type": "join", "room": "duel", "seed": 8}\n')
+
+        async def expect(reader, kind):
+            while True:
+                message = json.loads(await reader.readline())
+                if message["type"] == kind:
+                    return message
+
+        starts = [await expect(reader, "start") for reader, writer in clients]
+        assert starts[0]["seed"] == starts[1]["seed"] == 8
+        state = await expect(clients[0][0], "state")
+        assert len(state["rows"]) == 20 and state["game_over"] is False
+        loser, winner = clients
+        for _ in range(60):
+            loser[1].write(b'{"type": "input", "action": "hard_drop"}\n')
+        end = await expect(winner[0], "end")
+        assert end["winner"] == starts[1]["players"][1]
+        for reader, writer in clients:
+            writer.close()
+        await server.close()
+        return server
+
+    server = asyncio.run(scenario())
+    assert not server.sessions and not server.rooms
+
+def test_server_drops_client_with_long_line():
+    import asyncio
+    import json
+    from server import GameServer
+
+    async def scenario():
+        server = GameServer()
+        port = await server.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b'{"type": "join", "room": "duel"}\n')
+        writer.write(b'{"type": "input", "action": "' + b"x" * 70000 + b'"}\n')
+        messages = [json.loads(line) async for line in reader]
+        assert messages[0]["type"] == "joined" and messages[-1]["type"] == "error"
+        writer.close()
+        await server.close()
+        return server
+
+    server = asyncio.run(scenario())
+    assert not server.sessions and not server.rooms
+
+class FakeWriter:
+    def __init__(self):
+        self.messages = []
+        self.transport = self
+
+    def is_closing(self):
+        return False
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def write(self, data):
+        import json
+        self.messages.append(json.loads(data))
+
+def test_server_reset_after_versus_win_and_bad_join():
+    from server import GameServer, Session
+    server = GameServer()
+    winner, loser = Session(1, FakeWriter()), Session(2, FakeWriter())
+    server.join(winner, "duel", True)
+    server.join(winner, ["duel"], 8)
+    assert [message["type"] for message in winner.writer.messages] == ["error", "error"]
+    assert winner.room is None and not server.rooms
+    for session in (winner, loser):
+        server.join(session, "duel", 8)
+    versus = winner.game
+    loser.game.game_over = True
+    server.finish(loser)
+    assert winner.writer.messages[-1]["type"] == "end" and winner.room is None
+    server.input(winner, "reset")
+    assert winner.game is not versus and not winner.game.game_over
+    assert winner.writer.messages[-1]["type"] == "start"
+    winner.game.emit("clear", 2)
+    # старая игра комнаты уже не атакует
+    versus.emit("clear", 2)
+    assert loser.writer.messages[-1]["type"] == "end"
+    winner.timer.cancel()
+
+def test_stream_decoder_rebuilds_board():
+    import json
+    from controls import LEFT, RIGHT, ROTATE, DOWN, HARD_DROP, apply_action
+    from stream import StreamDecoder, StreamEncoder
+    rng = random.Random(14)
+    game = Game(seed=14)
+    encoder = StreamEncoder(game, keyframe_interval=500)
+    decoder = StreamDecoder()
+    delta_bytes = full_bytes = 0
+    for step in range(3000):
+        for _ in range(rng.randrange(3)):
+            apply_action(game, rng.choice([LEFT, RIGHT, ROTATE, DOWN, DOWN, DOWN, HARD_DROP]))
+            if rng.random() < 0.01:
+                game.receive_garbage(rng.randrange(1, 3), rng.randrange(10))
+            if game.game_over:
+                game.game_over = False
+                game.reset()
+        frame = encoder.frame()
+        assert decoder.apply(frame)
+        block = game.current_block
+        assert decoder.grid == game.grid.grid
+        assert decoder.piece == (block.id, block.rotation_state, block.row_offset, block.column_offset)
+        assert (decoder.next_id, decoder.score, decoder.game_over) == (game.next_block.id, game.score,
+                                                                       game.game_over)
+        delta_bytes += len(frame)
+        full_bytes += len(json.dumps({"grid": game.grid.grid, "block": decoder.piece, "score": game.score}))
+    assert delta_bytes * 10 < full_bytes
+
+def test_stream_resyncs_after_lost_frame():
+    from controls import HARD_DROP, apply_action
+    from stream import StreamDecoder, StreamEncoder
+    game = Game(seed=2)
+    encoder = StreamEncoder(game)
+    decoder = StreamDecoder()
+    assert decoder.apply(encoder.frame())
+    apply_action(game, HARD_DROP)
+    encoder.frame()  # потерян
+    apply_action(game, HARD_DROP)
+    assert not decoder.apply(encoder.frame()) and not decoder.synced
+    apply_action(game, HARD_DROP)
+    encoder.request_keyframe()
+    assert decoder.apply(encoder.frame()) and decoder.grid == game.grid.grid
+
+def test_bench_reports_and_flags_regressions():
+    from bench import compare, run, synthetic_grid
+    for full_rows in range(5):
+        assert synthetic_grid(full_rows).clear_full_rows() == full_rows
+    results = run(["game.block_fits", "grid.clear_full_rows[2]"], repeats=1, scale=0.01)
+    assert all(result["seconds_per_op"] > 0 for result in results.values())
+    baseline = {"results": {name: {"seconds_per_op": result["seconds_per_op"] / 2}
+                            for name, result in results.items()}}
+    assert [name for name, *rest in compare(results, baseline)] == list(results)
+    assert compare(results, {"results": results}) == []
+
+def test_grids_agree_on_custom_board_size():
+    from controls import LEFT, RIGHT, ROTATE, DOWN, HARD_DROP, apply_action
+    from arraygrid import ArrayGrid
+    rng = random.Random(5)
+    games = [Game(grid_class(40, 16, 12), seed=8, spawn_column=9) for grid_class in (Grid, BitGrid, ArrayGrid)]
+    assert games[0].current_block.column_offset >= 9
+    for _ in range(3000):
+        action = rng.choice([LEFT, RIGHT, RIGHT, ROTATE, DOWN, HARD_DROP, HARD_DROP])
+        for each in games:
+            apply_action(each, action)
+            if each.game_over:
+                each.game_over = False
+                each.reset()
+        reference = games[0].grid
+        assert games[1].grid.grid == reference.grid and games[2].grid.grid.tolist() == reference.grid
+    assert len({each.zobrist_hash() for each in games}) == 1
+    assert games[1].grid.hash == Grid.zobrist_hash(games[1].grid)
+    assert games[0].score == games[1].score == games[2].score
+
+def test_spawn_column_must_fit_the_board():
+    for spawn_column in (-2, 7, 40):
+        with pytest.raises(ValueError):
+            Game(BitGrid(), seed=1, spawn_column=spawn_column)
+    game = Game(BitGrid(20, 12), seed=1, spawn_column=8)
+    game.move_right()
+    game.move_down()
+    assert not game.game_over
+
+def test_large_board_clears_rows():
+    grid = BitGrid(1000, 400, 1)
+    for row in (999, 998, 500):
+        for column in range(400):
+            grid.set_cell(row, column, 2)
+    grid.set_cell(997, 5, 3)
+    grid.set_cell(499, 7, 4)
+    assert grid.clear_full_rows() == 3
+    assert grid.cleared_rows == [500, 998, 999]
+    assert grid.grid[999][5] == 3 and grid.grid[502][7] == 4
+    assert grid.hash == Grid.zobrist_hash(grid)
+    assert grid.features() == BitGrid.features(grid.copy())
+
+def test_renderer_layout_follows_board_size():
+    import pygame
+    from renderer import Renderer, fit_cell_size, window_size
+    pygame.font.init()
+    grid = Grid(60, 30, fit_cell_size(60, 30))
+    assert grid.cell_size == 15
+    game = Game(grid, seed=3)
+    screen = pygame.Surface(window_size(grid))
+    renderer = Renderer(game, screen, pygame.font.Font(None, 40))
+    assert renderer.render() == [screen.get_rect()]
+    assert renderer.score_rect.left > 11 + 30 * 15
+    assert screen.get_rect().contains(renderer.next_rect)
+    assert fit_cell_size(1000, 400) == 1
+    assert window_size(Grid()) == (500, 620)
+
+def test_preview_stays_in_next_panel():
+    from renderer import NEXT_RECT, PREVIEW_CELL_SIZE, panel_shift
+    for num_cols, cell_size, spawn_column in ((10, 30, None), (10, 20, None), (16, 45, 2), (30, 15, 20)):
+        game = Game(Grid(20, num_cols, cell_size), seed=1, spawn_column=spawn_column)
+        panel = NEXT_RECT.move(panel_shift(game.grid), 0)
+        for block, _ in game.pool.values():
+            block.spawn(game.spawn_shift)
+            game.next_block = block
+            x, y = game.preview_offset()
+            for cell in block.get_cell_positions():
+                left = x + cell.column * PREVIEW_CELL_SIZE
+                top = y + cell.row * PREVIEW_CELL_SIZE
+                assert panel.contains((left, top, PREVIEW_CELL_SIZE, PREVIEW_CELL_SIZE))
+
+def test_ring_buffer_percentiles():
+    from profiler import RingBuffer
+    buffer = RingBuffer(100)
+    assert buffer.percentiles() == {}
+    for value in range(1, 251):
+        buffer.append(float(value))
+    assert buffer.count == 100 and buffer.samples() == [float(value) for value in range(151, 251)]
+    assert buffer.percentiles() == {50: 200.0, 95: 245.0, 99: 249.0}
+
+def test_profiler_instruments_hot_paths(tmp_path):
+    import json
+    from controls import HARD_DROP, apply_action
+    from profiler import Profiler
+    game = Game(seed=1)
+    profiler = Profiler()
+    profiler.attach(game)
+    profiler.begin_frame()
+    apply_action(game, HARD_DROP)
+    assert profiler.end_frame() is None and "hard_drop" not in vars(game)
+    path = tmp_path / "profile.jsonl"
+    profiler = Profiler(str(path), memory=True)
+    profiler.attach(game)
+    for _ in range(3):
+        profiler.begin_frame()
+        apply_action(game, HARD_DROP)
+        profiler.mark("simulation")
+        profiler.end_frame()
+    profiler.close()
+    assert "hard_drop" not in vars(game) and "clear_full_rows" not in vars(game.grid)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["calls"] for line in lines] == [{"hard_drop": 1, "lock_block": 1, "clear_full_rows": 1}] * 3
+    assert all(line["seconds"]["frame"] >= line["seconds"]["hard_drop"] > 0 for line in lines)
+    assert "peak" in lines[0]["memory"]
+    summary = profiler.summary()
+    assert summary["lock_block"]["calls"] == 3 and set(summary["frame"]) == {"p50", "p95", "p99"}
+
+def test_profiler_overlay_draws_and_clears():
+    import pygame
+    from profiler import Profiler, ProfilerOverlay
+    from renderer import Renderer
+    pygame.font.init()
+    game = Game(seed=2)
+    screen = pygame.Surface((500, 620))
+    renderer = Renderer(game, screen, pygame.font.Font(None, 40))
+    renderer.render()
+    profiler = Profiler()
+    overlay = ProfilerOverlay(profiler, renderer, pygame.font.Font(None, 20))
+    assert overlay.draw(screen, 0.0) is None
+    overlay.toggle()
+    assert profiler.enabled
+    profiler.begin_frame()
+    profiler.mark("events")
+    profiler.end_frame()
+    assert overlay.draw(screen, 1.0) == overlay.rect and screen.get_rect().contains(overlay.rect)
+    assert overlay.draw(screen, 1.1) is None
+    overlay.toggle()
+    assert not profiler.enabled and overlay.draw(screen, 1.2) == overlay.rect
+    fresh = pygame.Surface((500, 620))
+    Renderer(game, fresh, pygame.font.Font(None, 40)).render()
+    assert pygame.image.tobytes(screen, "RGB") == pygame.image.tobytes(fresh, "RGB")
+
+def test_export_replay_frames(tmp_path):
+    import pygame
+    from controls import LEFT, ROTATE, HARD_DROP
+    from export import PNG, RAW, export_many, frame_positions
+    from renderer import Renderer
+    from replay import Replay, ReplayPlayer, ReplayRecorder, GRAVITY
+    rng = random.Random(3)
+    game = Game(seed=9)
+    recorder = ReplayRecorder(game, 9)
+    for index in range(120):
+        recorder.apply(rng.choice([LEFT, ROTATE, GRAVITY, GRAVITY, HARD_DROP]), index * 0.25)
+    source = tmp_path / "game.replay"
+    source.write_bytes(recorder.finish())
+    replay = Replay(source.read_bytes())
+    positions = frame_positions(replay, 20)
+    assert positions[0] == 1 and positions[-1] == len(replay.actions) and positions == sorted(positions)
+    (raw,) = export_many([str(source)], str(tmp_path / "raw"), RAW, fps=20, workers=1)
+    (png,) = export_many([str(source)], str(tmp_path / "png"), PNG, fps=20, workers=1)
+    width, height = raw.size
+    assert raw.frames == png.frames == len(positions)
+    assert raw.rendered == png.rendered < raw.frames // 2
+    data = (tmp_path / "raw" / "game.rgb").read_bytes()
+    assert len(data) == raw.frames * width * height * 3
+    pygame.font.init()
+    player = ReplayPlayer(replay)
+    expected = pygame.Surface(raw.size)
+    Renderer(player.seek(positions[40]), expected, pygame.font.Font(None, 40)).render()
+    frame_size = width * height * 3
+    assert data[40 * frame_size:41 * frame_size] == pygame.image.tobytes(expected, "RGB")
+    concat = (tmp_path / "png" / "game" / "frames.ffconcat").read_text()
+    assert concat.count(".png") == png.rendered + 1
+    assert len(list((tmp_path / "png" / "game").glob("*.png"))) == png.rendered
+    (tmp_path / "other").mkdir()
+    (tmp_path / "other" / "game.replay").write_bytes(source.read_bytes())
+    with pytest.raises(ValueError):
+        list(export_many([str(source), str(tmp_path / "other" / "game.replay")], str(tmp_path / "dup"), RAW))
+    assert not (tmp_path / "dup").exists()
+
+def test_spectator_wall_draws_changed_boards():
+    import pygame
+    from colors import Colors
+    from controls import HARD_DROP, apply_action
+    from stream import StreamDecoder, StreamEncoder
+    from wall import SpectatorWall
+    games = [Game(seed=seed) for seed in range(5)]
+    encoder = StreamEncoder(games[0])
+    decoder = StreamDecoder()
+    decoder.apply(encoder.frame())
+    screen = pygame.Surface((400, 300))
+    wall = SpectatorWall(screen, games + [decoder], columns=3)
+    assert wall.cell_size == 7 and len(wall.tiles) == 6
+    with pytest.raises(ValueError):
+        SpectatorWall(pygame.Surface((40, 30)), games)
+    with pytest.raises(ValueError):
+        SpectatorWall(pygame.Surface((400, 100)), games, columns=1)
+    assert wall.render() == [screen.get_rect()]
+    assert wall.render() == []
+    for _ in range(3):
+        apply_action(games[0], HARD_DROP)
+    decoder.apply(encoder.frame())
+    assert wall.render() == [wall.tiles[0], wall.tiles[5]]
+    grid = games[0].grid
+    block = games[0].current_block
+    colors = Colors.get_cell_colors()
+    for tile in (wall.tiles[0], wall.tiles[5]):
+        for row in range(grid.num_rows):
+            for column in range(grid.num_cols):
+                pixel = tuple(screen.get_at((tile.left + column * 7 + 3, tile.top + row * 7 + 3)))[:3]
+                value = grid.grid[row][column]
+                if any(position.row == row and position.column == column
+                       for position in block.get_cell_positions()):
+                    value = block.id
+                assert pixel == colors[value]
+
+def test_audio_loads_in_background_and_pools_channels(tmp_path):
+    import json
+    import pygame
+    from audio import Audio, BUFFER, EFFECT_CHANNELS, load_sounds, pre_init
+    from profiler import Profiler
+    pygame.mixer.quit()
+    pre_init()
+    with patch.dict(os.environ, {"SDL_AUDIODRIVER": "dummy"}):
+        audio = Audio()
+    assert audio.enabled and audio.ready.wait(5)
+    assert audio.sounds == load_sounds() and audio.load_time is not None
+    assert audio.buffer_latency() == BUFFER / pygame.mixer.get_init()[0] < 0.02
+    with patch("audio.load_sounds", side_effect=FileNotFoundError("Sounds/rotate.ogg")):
+        broken = Audio()
+        assert broken.ready.wait(5)
+    assert broken.sounds == {} and broken.load_time is None
+    broken.play("rotate")
+    game = Game(seed=1)
+    audio.attach(game)
+    assert not audio.music_started
+    for _ in range(EFFECT_CHANNELS + 1):
+        game.rotate()
+    assert audio.next_channel == 1
+    audio.start_music()
+    audio.start_music()
+    assert pygame.mixer.music.get_busy()
+    pygame.mixer.music.stop()
+    pygame.mixer.quit()
+    profiler = Profiler(str(tmp_path / "profile.jsonl"))
+    profiler.note("startup", {"first_frame": 0.1})
+    profiler.close()
+    line = json.loads((tmp_path / "profile.jsonl").read_text())
+    assert line == {"note": "startup", "first_frame": 0.1} and profiler.notes["startup"]["first_frame"] == 0.1
 
 # Additional tests can be written for the draw method and other functionalities.
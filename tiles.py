@@ -0,0 +1,91 @@
+import pygame
+from colors import Colors
+
+_atlases = {}
+# Доля цвета блока в плитке призрака, остальное - цвет пустой ячейки
+GHOST_ALPHA = 0.3
+
+
+class TileAtlas:
+    """
+    Заранее отрисованные плитки ячеек: по одной поверхности на каждый цвет.
+
+    :param cell_size: The size of a grid cell in pixels, the tile is one pixel smaller
+        unless the cells are too small for a gap.
+    :type cell_size: int
+    :param colors: Cell colors indexed by block id.
+    :type colors: list[tuple[int, int, int]]
+    :ivar tiles: One tile surface per color.
+    :vartype tiles: list[pygame.Surface]
+    :ivar ghosts: One dimmed tile per color for the ghost piece.
+    :vartype ghosts: list[pygame.Surface]
+    """
+    def __init__(self, cell_size, colors):
+        self.cell_size = cell_size
+        empty = colors[0]
+        self.tiles = [self.make_tile(color) for color in colors]
+        self.ghosts = [self.make_tile([round(e + (c - e) * GHOST_ALPHA) for c, e in zip(color, empty)])
+                       for color in colors]
+
+    def make_tile(self, color):
+        """
+        Плитка ячейки, залитая цветом.
+
+        :param color: The RGB fill color.
+        :type color: tuple[int, int, int]
+        :returns: The tile surface.
+        :rtype: pygame.Surface
+        """
+        size = self.cell_size - 1 if self.cell_size > 2 else self.cell_size
+        tile = pygame.Surface((size, size))
+        tile.fill(color)
+        if pygame.display.get_init() and pygame.display.get_surface() is not None:
+            tile = tile.convert()
+        return tile
+
+
+def atlas_for(cell_size, colors=None):
+    """
+    Общий атлас плиток для заданного размера ячейки.
+
+    :param cell_size: The size of a grid cell in pixels.
+    :type cell_size: int
+    :param colors: Cell colors indexed by block id, ``Colors.get_cell_colors()`` by default.
+    :type colors: list[tuple[int, int, int]] or None
+    :returns: The cached atlas.
+    :rtype: TileAtlas
+    """
+    colors = tuple(colors if colors is not None else Colors.get_cell_colors())
+    atlas = _atlases.get((cell_size, colors))
+    if atlas is None:
+        atlas = _atlases[(cell_size, colors)] = TileAtlas(cell_size, colors)
+    return atlas
+
+
+class CachedText:
+    """
+    Текст, который перерисовывается шрифтом только при изменении значения.
+
+    :param font: The font to render with.
+    :type font: pygame.font.Font
+    :param color: The text color.
+    :type color: tuple[int, int, int]
+    """
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.value = None
+        self.surface = None
+
+    def render(self, value):
+        """
+        Поверхность с текстом значения, из кеша если значение не менялось.
+
+        :param value: The value to show, converted with ``str``.
+        :returns: The rendered text.
+        :rtype: pygame.Surface
+        """
+        if self.surface is None or value != self.value:
+            self.value = value
+            self.surface = self.font.render(str(value), True, self.color)
+        return self.surface
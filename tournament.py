@@ -0,0 +1,251 @@
+import argparse
+import csv
+import importlib
+import json
+import os
+import statistics
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+
+from controls import HARD_DROP, apply_action
+from game import Game
+
+GameResult = namedtuple("GameResult", ["seed", "score", "lines", "pieces", "steps", "duration",
+                                       "steps_per_second", "game_over"])
+GameResult.__doc__ = """
+Итог одной партии турнира.
+
+- `seed`: Seed of the block randomizer.
+- `score`: Final score.
+- `lines`: Rows cleared.
+- `pieces`: Blocks locked.
+- `steps`: Actions applied to the game, including the hard drop of every block.
+- `duration`: Wall time of the game in seconds.
+- `steps_per_second`: ``steps / duration``.
+- `game_over`: True if the game ended by topping out rather than by a limit.
+"""
+
+DEFAULT_AGENT = "agents:HeuristicAgent"
+
+
+def load_agent(spec):
+    """
+    Загрузка фабрики агента по строке ``"module:callable"``.
+
+    :param spec: The module and attribute, e.g. ``"agents:HeuristicAgent"``.
+    :type spec: str
+    :raises ValueError: If the spec has no ``:``.
+    :returns: The callable that creates an agent.
+    :rtype: callable
+    """
+    module_name, separator, attribute = spec.partition(":")
+    if not separator:
+        raise ValueError(f"agent must be given as module:callable, got {spec!r}")
+    target = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        target = getattr(target, name)
+    return target
+
+
+def play_game(agent, seed, max_pieces=None, max_steps=None):
+    """
+    Партия без окна: агент выбирает ходы для каждого блока, после чего блок сбрасывается.
+
+    :param agent: Called with the game once per block, returns the moves for that block.
+    :type agent: callable
+    :param seed: Seed of the block randomizer.
+    :type seed: int
+    :param max_pieces: Stop after this many locked blocks, no limit by default.
+    :type max_pieces: int or None
+    :param max_steps: Stop after this many actions, no limit by default.
+    :type max_steps: int or None
+    :returns: The result of the game.
+    :rtype: GameResult
+    """
+    game = Game(seed=seed)
+    counters = {"lines": 0, "pieces": 0}
+
+    def on_clear(rows_cleared):
+        counters["lines"] += rows_cleared
+
+    def on_lock():
+        counters["pieces"] += 1
+
+    game.subscribe("clear", on_clear)
+    game.subscribe("lock", on_lock)
+    steps = 0
+    start = perf_counter()
+    while not game.game_over:
+        if max_pieces is not None and counters["pieces"] >= max_pieces:
+            break
+        if max_steps is not None and steps >= max_steps:
+            break
+        for action in agent(game):
+            apply_action(game, action)
+            steps += 1
+        apply_action(game, HARD_DROP)
+        steps += 1
+    duration = perf_counter() - start
+    return GameResult(seed, game.score, counters["lines"], counters["pieces"], steps, duration,
+                      steps / duration if duration > 0 else 0.0, game.game_over)
+
+
+def _play(agent, seed, max_pieces, max_steps):
+    """
+    Задача процесса пула: создание агента и одна партия.
+
+    :param agent: An agent factory or its ``"module:callable"`` spec.
+    :type agent: callable or str
+    :param seed: Seed of the game.
+    :type seed: int
+    :param max_pieces: The piece limit.
+    :type max_pieces: int or None
+    :param max_steps: The step limit.
+    :type max_steps: int or None
+    :returns: The result of the game.
+    :rtype: GameResult
+    """
+    factory = load_agent(agent) if isinstance(agent, str) else agent
+    return play_game(factory(), seed, max_pieces, max_steps)
+
+
+def run_tournament(agent, seeds, max_pieces=None, max_steps=None, workers=None):
+    """
+    Партии для всех зерен на пуле процессов; результаты выдаются по мере готовности.
+
+    :param agent: An agent factory, picklable (defined at module level), or its
+        ``"module:callable"`` spec. A new agent is made for every game.
+    :type agent: callable or str
+    :param seeds: One game is played per seed.
+    :type seeds: iterable[int]
+    :param max_pieces: The piece limit of every game.
+    :type max_pieces: int or None
+    :param max_steps: The step limit of every game.
+    :type max_steps: int or None
+    :param workers: The number of processes, ``os.cpu_count()`` by default; 1 plays in
+        this process.
+    :type workers: int or None
+    :returns: Results in completion order.
+    :rtype: iterator[GameResult]
+    """
+    seeds = list(seeds)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(seeds) <= 1:
+        for seed in seeds:
+            yield _play(agent, seed, max_pieces, max_steps)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(seeds))) as executor:
+        futures = [executor.submit(_play, agent, seed, max_pieces, max_steps) for seed in seeds]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def summarize(results):
+    """
+    Сводная статистика по результатам партий.
+
+    :param results: Results of the games.
+    :type results: list[GameResult]
+    :returns: Game count, score statistics, mean lines and pieces, total steps per second.
+    :rtype: dict
+    """
+    if not results:
+        return {"games": 0}
+    scores = [result.score for result in results]
+    duration = sum(result.duration for result in results)
+    steps = sum(result.steps for result in results)
+    return {
+        "games": len(results),
+        "score_mean": statistics.fmean(scores),
+        "score_median": statistics.median(scores),
+        "score_stdev": statistics.stdev(scores) if len(scores) > 1 else 0.0,
+        "score_min": min(scores),
+        "score_max": max(scores),
+        "lines_mean": statistics.fmean(result.lines for result in results),
+        "pieces_mean": statistics.fmean(result.pieces for result in results),
+        "game_overs": sum(result.game_over for result in results),
+        "steps_per_second": steps / duration if duration > 0 else 0.0,
+    }
+
+
+class ResultWriter:
+    """
+    Построчная запись результатов в CSV или JSONL, по расширению файла.
+
+    :param path: The output file, ``.csv`` for CSV, anything else for JSON lines.
+    :type path: str
+    """
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.csv = None
+        if path.endswith(".csv"):
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(GameResult._fields)
+
+    def write(self, result):
+        """
+        Запись одного результата с немедленным сбросом на диск.
+
+        :param result: The result to write.
+        :type result: GameResult
+        :returns: None
+        :rtype: None
+        """
+        if self.csv is not None:
+            self.csv.writerow(result)
+        else:
+            self.file.write(json.dumps(result._asdict()) + "\n")
+        self.file.flush()
+
+    def close(self):
+        """
+        Закрытие файла.
+
+        :returns: None
+        :rtype: None
+        """
+        self.file.close()
+
+
+def main(argv=None):
+    """
+    Запуск турнира из командной строки.
+
+    :param argv: Command-line arguments, ``sys.argv[1:]`` by default.
+    :type argv: list[str] or None
+    :returns: The exit status.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Play headless Tetris games on all CPU cores.")
+    parser.add_argument("--agent", default=DEFAULT_AGENT, help="agent factory as module:callable")
+    parser.add_argument("--games", type=int, default=16, help="number of games")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, the rest follow")
+    parser.add_argument("--max-pieces", type=int, default=None, help="piece limit per game")
+    parser.add_argument("--max-steps", type=int, default=None, help="action limit per game")
+    parser.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    parser.add_argument("--output", default=None, help="per-game results, .csv or .jsonl")
+    args = parser.parse_args(argv)
+
+    load_agent(args.agent)  # ошибка в имени агента видна сразу, а не в процессах пула
+    writer = ResultWriter(args.output) if args.output else None
+    results = []
+    try:
+        for result in run_tournament(args.agent, range(args.seed, args.seed + args.games), args.max_pieces,
+                                     args.max_steps, args.workers):
+            results.append(result)
+            if writer is not None:
+                writer.write(result)
+            print(f"seed {result.seed}: score {result.score}, lines {result.lines}, "
+                  f"pieces {result.pieces}, {result.steps_per_second:.0f} steps/s", file=sys.stderr)
+    finally:
+        if writer is not None:
+            writer.close()
+    print(json.dumps(summarize(results), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
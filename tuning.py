@@ -0,0 +1,289 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from agents import FEATURES, HeuristicAgent
+from tournament import play_game
+
+
+def _evaluate(weights, seed, max_pieces, depth):
+    """
+    Задача процесса пула: одна партия агента с заданными весами.
+
+    :param weights: One weight per name in ``agents.FEATURES``.
+    :type weights: tuple[float]
+    :param seed: Seed of the game.
+    :type seed: int
+    :param max_pieces: The piece limit of the game.
+    :type max_pieces: int
+    :param depth: Search depth of the agent.
+    :type depth: int
+    :returns: Lines cleared in the game.
+    :rtype: int
+    """
+    return play_game(HeuristicAgent(weights, depth), seed, max_pieces).lines
+
+
+def cache_key(weights, seed):
+    """
+    Ключ кеша результатов для пары (веса, зерно).
+
+    :param weights: The weights, rounded to 6 digits in the key.
+    :type weights: tuple[float]
+    :param seed: Seed of the game.
+    :type seed: int
+    :returns: The key, a string so that it can be stored in JSON.
+    :rtype: str
+    """
+    return ",".join(f"{weight:.6f}" for weight in weights) + f"@{seed}"
+
+
+class CrossEntropyTuner:
+    """
+    Подбор весов линейной оценки :class:`agents.HeuristicAgent` методом перекрестной энтропии.
+
+    Каждое поколение выбирает кандидатов из нормального распределения,
+    играет ими на общих зернах (одинаковых для всех кандидатов и поколений,
+    чтобы сравнение не зависело от удачи с блоками) и сдвигает распределение к
+    лучшей доле кандидатов. Партии идут на пуле процессов, результаты пар
+    (веса, зерно) кешируются, а состояние сохраняется после каждого поколения.
+
+    :param population: Candidates per generation.
+    :type population: int
+    :param elite: Fraction of the best candidates used to update the distribution.
+    :type elite: float
+    :param games: Games per candidate, played on seeds ``seed .. seed + games - 1``.
+    :type games: int
+    :param max_pieces: The piece limit of every game.
+    :type max_pieces: int
+    :param seed: Seed of the first game and of the sampler.
+    :type seed: int
+    :param noise: Extra variance added after each update, divided by the generation number.
+    :type noise: float
+    :param depth: Search depth of the agent.
+    :type depth: int
+    :param workers: The number of processes, ``os.cpu_count()`` by default; 1 plays in
+        this process.
+    :type workers: int or None
+    :param checkpoint: JSON file the state is saved to, and loaded from if it exists.
+    :type checkpoint: str or None
+    :ivar mean: Mean of the weight distribution.
+    :vartype mean: list[float]
+    :ivar stdev: Standard deviation of every weight.
+    :vartype stdev: list[float]
+    :ivar generation: Generations completed.
+    :vartype generation: int
+    :ivar cache: Lines cleared by (weights, seed), keyed by :func:`cache_key`.
+    :vartype cache: dict[str, int]
+    :ivar best: The best candidate seen as {"weights": ..., "fitness": ...}, or None.
+    :vartype best: dict or None
+    :ivar history: Mean and best fitness of every generation.
+    :vartype history: list[dict]
+    """
+    def __init__(self, population=32, elite=0.25, games=4, max_pieces=300, seed=0, noise=0.1, depth=1,
+                 workers=None, checkpoint=None):
+        self.population = population
+        self.elite = max(1, int(population * elite))
+        self.seeds = list(range(seed, seed + games))
+        self.max_pieces = max_pieces
+        self.noise = noise
+        self.depth = depth
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.checkpoint = checkpoint
+        self.rng = random.Random(seed)
+        self.mean = [0.0] * len(FEATURES)
+        self.stdev = [1.0] * len(FEATURES)
+        self.generation = 0
+        self.cache = {}
+        self.best = None
+        self.history = []
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self.load(checkpoint)
+
+    def state(self):
+        """
+        Состояние оптимизатора для сохранения в JSON.
+
+        :returns: The distribution, generation, sampler state, cache, best and history.
+        :rtype: dict
+        """
+        version, internal, gauss = self.rng.getstate()
+        return {"mean": self.mean, "stdev": self.stdev, "generation": self.generation,
+                "rng": [version, list(internal), gauss], "cache": self.cache, "best": self.best,
+                "history": self.history, "seeds": self.seeds, "max_pieces": self.max_pieces,
+                "depth": self.depth}
+
+    def save(self, path):
+        """
+        Сохранение состояния; файл заменяется атомарно, чтобы прерванная запись не портила его.
+
+        :param path: The checkpoint file.
+        :type path: str
+        :returns: None
+        :rtype: None
+        """
+        temporary = path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.state(), file)
+        os.replace(temporary, path)
+
+    def load(self, path):
+        """
+        Загрузка состояния из контрольной точки.
+
+        :param path: The checkpoint file.
+        :type path: str
+        :raises ValueError: If the checkpoint was made with other seeds, piece limit or depth.
+        :returns: None
+        :rtype: None
+        """
+        with open(path) as file:
+            state = json.load(file)
+        if (state["seeds"], state["max_pieces"], state["depth"]) != (self.seeds, self.max_pieces, self.depth):
+            raise ValueError("checkpoint was made with different seeds, piece limit or depth")
+        self.mean = state["mean"]
+        self.stdev = state["stdev"]
+        self.generation = state["generation"]
+        version, internal, gauss = state["rng"]
+        self.rng.setstate((version, tuple(internal), gauss))
+        self.cache = state["cache"]
+        self.best = state["best"]
+        self.history = state["history"]
+
+    def sample(self):
+        """
+        Кандидаты следующего поколения; первым идет текущее среднее.
+
+        :returns: ``population`` weight vectors, rounded like the cache keys.
+        :rtype: list[tuple[float]]
+        """
+        candidates = [tuple(self.mean)]
+        while len(candidates) < self.population:
+            candidates.append(tuple(self.rng.gauss(mean, stdev) for mean, stdev in zip(self.mean, self.stdev)))
+        return [tuple(round(weight, 6) for weight in weights) for weights in candidates]
+
+    def evaluate(self, candidates, executor=None):
+        """
+        Приспособленность кандидатов: среднее число рядов на общих зернах.
+
+        :param candidates: Weight vectors to evaluate.
+        :type candidates: list[tuple[float]]
+        :param executor: Pool to play the games on, this process if None.
+        :type executor: concurrent.futures.Executor or None
+        :returns: The fitness of every candidate.
+        :rtype: list[float]
+        """
+        tasks = {}
+        for weights in candidates:
+            for seed in self.seeds:
+                key = cache_key(weights, seed)
+                if key not in self.cache:
+                    tasks[key] = (weights, seed)
+        jobs = list(tasks.values())
+        arguments = ([weights for weights, seed in jobs], [seed for weights, seed in jobs],
+                     [self.max_pieces] * len(jobs), [self.depth] * len(jobs))
+        if executor is None:
+            results = map(_evaluate, *arguments)
+        else:
+            results = executor.map(_evaluate, *arguments, chunksize=max(1, len(jobs) // (4 * self.workers)))
+        for key, lines in zip(tasks, results):
+            self.cache[key] = lines
+        return [sum(self.cache[cache_key(weights, seed)] for seed in self.seeds) / len(self.seeds)
+                for weights in candidates]
+
+    def step(self, executor=None):
+        """
+        Одно поколение: выборка, оценка и обновление распределения.
+
+        :param executor: Pool to play the games on, this process if None.
+        :type executor: concurrent.futures.Executor or None
+        :returns: Mean and best fitness of the generation.
+        :rtype: dict
+        """
+        candidates = self.sample()
+        fitness = self.evaluate(candidates, executor)
+        ranked = sorted(zip(fitness, candidates), key=lambda item: item[0], reverse=True)
+        elite = [weights for value, weights in ranked[:self.elite]]
+        self.generation += 1
+        extra = self.noise / self.generation
+        for index in range(len(self.mean)):
+            values = [weights[index] for weights in elite]
+            mean = sum(values) / len(values)
+            variance = sum((value - mean) ** 2 for value in values) / len(values)
+            self.mean[index] = mean
+            self.stdev[index] = math.sqrt(variance + extra)
+        if self.best is None or ranked[0][0] > self.best["fitness"]:
+            self.best = {"weights": list(ranked[0][1]), "fitness": ranked[0][0]}
+        record = {"generation": self.generation, "mean_fitness": sum(fitness) / len(fitness),
+                  "best_fitness": ranked[0][0]}
+        self.history.append(record)
+        if self.checkpoint is not None:
+            self.save(self.checkpoint)
+        return record
+
+    def run(self, generations, callback=None):
+        """
+        Обучение до заданного числа поколений, считая уже пройденные.
+
+        :param generations: Total generations to reach.
+        :type generations: int
+        :param callback: Called with the record of every generation.
+        :type callback: callable or None
+        :returns: The best candidate seen.
+        :rtype: dict or None
+        """
+        if self.generation >= generations:
+            return self.best
+        if self.workers <= 1:
+            while self.generation < generations:
+                record = self.step()
+                if callback is not None:
+                    callback(record)
+            return self.best
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while self.generation < generations:
+                record = self.step(executor)
+                if callback is not None:
+                    callback(record)
+        return self.best
+
+
+def main(argv=None):
+    """
+    Запуск подбора весов из командной строки.
+
+    :param argv: Command-line arguments, ``sys.argv[1:]`` by default.
+    :type argv: list[str] or None
+    :returns: The exit status.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Tune heuristic agent weights with the cross-entropy method.")
+    parser.add_argument("--generations", type=int, default=20, help="total generations to reach")
+    parser.add_argument("--population", type=int, default=32, help="candidates per generation")
+    parser.add_argument("--elite", type=float, default=0.25, help="fraction of candidates kept")
+    parser.add_argument("--games", type=int, default=4, help="games per candidate")
+    parser.add_argument("--max-pieces", type=int, default=300, help="piece limit per game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game and of the sampler")
+    parser.add_argument("--depth", type=int, default=1, choices=(1, 2), help="agent search depth")
+    parser.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    parser.add_argument("--checkpoint", default="tuning.json", help="state file, resumed if it exists")
+    args = parser.parse_args(argv)
+
+    tuner = CrossEntropyTuner(args.population, args.elite, args.games, args.max_pieces, args.seed,
+                              depth=args.depth, workers=args.workers, checkpoint=args.checkpoint)
+
+    def report(record):
+        print(f"generation {record['generation']}: mean {record['mean_fitness']:.1f}, "
+              f"best {record['best_fitness']:.1f}", file=sys.stderr)
+
+    best = tuner.run(args.generations, report)
+    print(json.dumps({"best": best, "features": FEATURES}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
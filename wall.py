@@ -0,0 +1,248 @@
+import argparse
+import math
+import sys
+
+import numpy as np
+import pygame
+
+from blocks import BLOCKS
+from colors import Colors
+from controls import HARD_DROP, apply_action
+from game import Game
+
+# Цвета ячеек по индексу, как в Grid.colors; доска после конца игры затемняется
+PALETTE = np.array(Colors.get_cell_colors(), dtype=np.uint8)
+DIMMED = PALETTE // 2
+# Смещения ячеек каждого поворота по id блока, для блоков из StreamDecoder
+PIECE_OFFSETS = {block_class().id: tuple(shape.offsets for shape in block_class.shapes) for block_class in BLOCKS}
+MARGIN = 6
+
+
+def board_state(source):
+    """
+    Состояние доски игры или декодера потока в общем виде.
+
+    :param source: A live game or a decoder of its stream.
+    :type source: Game or stream.StreamDecoder
+    :returns: Cell colors, the falling block as (id, rotation, row offset, column offset) or
+        None, the score, the game over flag and the board hash (None if the source has none).
+    :rtype: tuple
+    """
+    if isinstance(source, Game):
+        grid = source.grid
+        block = source.current_block
+        piece = (block.id, block.rotation_state, block.row_offset, block.column_offset)
+        return grid.grid, piece, source.score, source.game_over, getattr(grid, "hash", None)
+    return source.grid, source.piece, source.score, source.game_over, None
+
+
+def color_indices(cells, piece):
+    """
+    Индексы цветов доски с падающим блоком.
+
+    :param cells: Cell colors, a list of rows or an array.
+    :type cells: list[list[int]] or numpy.ndarray
+    :param piece: The falling block as (id, rotation, row offset, column offset), or None.
+    :type piece: tuple[int, int, int, int] or None
+    :returns: A new array of shape (rows, cols).
+    :rtype: numpy.ndarray
+    """
+    board = np.array(cells, dtype=np.uint8)
+    if piece is not None:
+        kind, rotation, row_offset, column_offset = piece
+        num_rows, num_cols = board.shape
+        for row, column in PIECE_OFFSETS[kind][rotation]:
+            row += row_offset
+            column += column_offset
+            if 0 <= row < num_rows and 0 <= column < num_cols:
+                board[row, column] = kind
+    return board
+
+
+class SpectatorWall:
+    """
+    Много досок в одном окне для наблюдения за турниром.
+
+    Каждая доска переводится в массив индексов цветов, раскрашивается
+    палитрой одной операцией NumPy, записывается в поверхность размером в
+    одну точку на ячейку через ``surfarray`` и масштабируется в свою
+    область экрана. Доски, состояние которых не изменилось с прошлого
+    кадра, не перерисовываются: для :class:`Game` с :class:`BitGrid`
+    сравниваются хеш доски и положение блока, для остальных - сами массивы.
+
+    :param screen: The surface to draw on.
+    :type screen: pygame.Surface
+    :param sources: Live games or stream decoders; all boards must have the same size.
+    :type sources: list[Game or stream.StreamDecoder]
+    :param font: Font of the score under every board, no labels if None.
+    :type font: pygame.font.Font or None
+    :param columns: Boards per row, chosen to fill the screen by default.
+    :type columns: int or None
+    :raises ValueError: If the boards do not fit on the screen even with 1-pixel cells.
+    :ivar tiles: Screen area of every board.
+    :vartype tiles: list[pygame.Rect]
+    :ivar cell_size: Cell size in pixels on the wall.
+    :vartype cell_size: int
+    """
+    def __init__(self, screen, sources, font=None, columns=None):
+        self.screen = screen
+        self.sources = list(sources)
+        self.font = font
+        cells = board_state(self.sources[0])[0]
+        self.num_rows, self.num_cols = len(cells), len(cells[0])
+        self.label_height = font.get_linesize() if font is not None else 0
+        self.columns = columns or self.best_columns()
+        self.cell_size, self.tiles = self.layout(self.columns)
+        if self.cell_size == 0:
+            raise ValueError(f"{len(self.sources)} boards of {self.num_rows}x{self.num_cols} cells "
+                             f"do not fit on a {self.screen.get_width()}x{self.screen.get_height()} screen")
+        self.small = [pygame.Surface((self.num_cols, self.num_rows)) for _ in self.sources]
+        self.scaled = [pygame.Surface(tile.size) for tile in self.tiles]
+        self.shown = [None] * len(self.sources)
+        self.redraw_all = True
+
+    def layout(self, columns):
+        """
+        Размер ячейки и области досок при заданном числе досок в ряду.
+
+        :param columns: Boards per row.
+        :type columns: int
+        :returns: The cell size (0 if the boards do not fit) and the area of every board.
+        :rtype: tuple[int, list[pygame.Rect]]
+        """
+        width, height = self.screen.get_size()
+        rows = math.ceil(len(self.sources) / columns)
+        cell_size = max(0, min((width - MARGIN * (columns + 1)) // (columns * self.num_cols),
+                               (height - (MARGIN + self.label_height) * rows - MARGIN) // (rows * self.num_rows)))
+        board_width, board_height = self.num_cols * cell_size, self.num_rows * cell_size
+        tiles = []
+        for index in range(len(self.sources)):
+            row, column = divmod(index, columns)
+            tiles.append(pygame.Rect(MARGIN + column * (board_width + MARGIN),
+                                     MARGIN + row * (board_height + self.label_height + MARGIN),
+                                     board_width, board_height))
+        return cell_size, tiles
+
+    def best_columns(self):
+        """
+        Число досок в ряду, при котором ячейки крупнее всего.
+
+        :returns: Boards per row.
+        :rtype: int
+        """
+        return max(range(1, len(self.sources) + 1), key=lambda columns: (self.layout(columns)[0], -columns))
+
+    def set_source(self, index, source):
+        """
+        Замена игры на доске, например после начала новой партии.
+
+        :param index: The board index.
+        :type index: int
+        :param source: The new game or decoder.
+        :type source: Game or stream.StreamDecoder
+        :returns: None
+        :rtype: None
+        """
+        self.sources[index] = source
+        self.shown[index] = None
+
+    def invalidate(self):
+        """
+        Полная перерисовка при следующем вызове :meth:`render`.
+
+        :returns: None
+        :rtype: None
+        """
+        self.redraw_all = True
+
+    def render(self):
+        """
+        Перерисовка изменившихся досок.
+
+        :returns: Rectangles of the screen that changed, for ``pygame.display.update``.
+        :rtype: list[pygame.Rect]
+        """
+        screen = self.screen
+        full = self.redraw_all
+        if full:
+            self.redraw_all = False
+            screen.fill(Colors.dark_blue)
+            self.shown = [None] * len(self.sources)
+        dirty = []
+        for index, source in enumerate(self.sources):
+            cells, piece, score, game_over, board_hash = board_state(source)
+            shown = self.shown[index]
+            key = (board_hash, piece, score, game_over)
+            if shown is not None and board_hash is not None and shown[0] == key:
+                continue
+            board = color_indices(cells, piece)
+            if shown is not None and board_hash is None and shown[0] == key and np.array_equal(shown[1], board):
+                continue
+            self.shown[index] = (key, board if board_hash is None else None)
+            tile = self.tiles[index]
+            small = self.small[index]
+            pygame.surfarray.blit_array(small, (DIMMED if game_over else PALETTE)[board.T])
+            pygame.transform.scale(small, tile.size, self.scaled[index])
+            screen.blit(self.scaled[index], tile)
+            dirty.append(tile)
+            if self.font is not None and (shown is None or shown[0][2] != score):
+                label = pygame.Rect(tile.left, tile.bottom, tile.width, self.label_height)
+                screen.fill(Colors.dark_blue, label)
+                screen.blit(self.font.render(str(score), True, Colors.white), label)
+                dirty.append(label)
+        return [screen.get_rect()] if full else dirty
+
+
+def main(argv=None):
+    """
+    Стена из партий эвристических агентов в одном окне.
+
+    :param argv: Command-line arguments, ``sys.argv[1:]`` by default.
+    :type argv: list[str] or None
+    :returns: The exit status.
+    :rtype: int
+    """
+    from agents import HeuristicAgent
+
+    parser = argparse.ArgumentParser(description="Watch many agent games on one screen.")
+    parser.add_argument("--games", type=int, default=64, help="number of boards")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, the rest follow")
+    parser.add_argument("--size", type=int, nargs=2, default=(1280, 720), metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--fps", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode(args.size)
+    games = [Game(seed=args.seed + index) for index in range(args.games)]
+    agents = [HeuristicAgent() for _ in games]
+    plans = [[] for _ in games]
+    try:
+        wall = SpectatorWall(screen, games, pygame.font.Font(None, 18))
+    except ValueError as error:
+        pygame.quit()
+        parser.error(str(error))
+    clock = pygame.time.Clock()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return 0
+            if event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+                wall.invalidate()
+        # каждая игра делает один ход за кадр
+        for index, game in enumerate(games):
+            if game.game_over:
+                continue
+            if not plans[index]:
+                plans[index] = list(agents[index](game)) + [HARD_DROP]
+            apply_action(game, plans[index].pop(0))
+        dirty = wall.render()
+        if dirty:
+            pygame.display.update(dirty)
+        pygame.display.set_caption(f"Spectator wall: {args.games} boards, {clock.get_fps():.0f} FPS")
+        clock.tick(args.fps)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
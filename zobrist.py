@@ -0,0 +1,114 @@
+import random
+
+# Фиксированное зерно: хеши одинаковы во всех процессах и запусках
+SEED = 0x7E7215
+# Запас по рядам и столбцам для смещений блока за пределами сетки
+MARGIN = 4
+CURRENT, NEXT = 0, 1
+MASK = (1 << 64) - 1
+# Значения ячейки: пусто, id блоков 1-7 и мусорный ряд 8
+VALUES = 9
+
+_tables = {}
+
+
+class ZobristTable:
+    """
+    Случайные 64-битные ключи для хеширования состояния игры.
+
+    :param num_rows: The number of rows of the board.
+    :type num_rows: int
+    :param num_cols: The number of columns of the board.
+    :type num_cols: int
+    :ivar cells: Key per (column, block id) of a cell, flattened as ``column * VALUES + id``.
+    :vartype cells: list[int]
+    :ivar multipliers: Odd multiplier per board row that binds a row's content key to the row.
+    :vartype multipliers: list[int]
+    :ivar kinds: Key per (slot, block id) for the current and next block.
+    :vartype kinds: list[list[int]]
+    :ivar rotations: Key per rotation state of the current block.
+    :vartype rotations: list[int]
+    :ivar rows: Key per row offset of the current block, shifted by ``MARGIN``.
+    :vartype rows: list[int]
+    :ivar columns: Key per column offset of the current block, shifted by ``MARGIN``.
+    :vartype columns: list[int]
+    :ivar bag: Key per block id left in the bag.
+    :vartype bag: list[int]
+
+    Хеш сетки - XOR по рядам значений :meth:`row` от ключа содержимого ряда
+    (XOR ключей :meth:`cell` его ячеек). Ключ содержимого не зависит от
+    номера ряда, поэтому сдвиг ряда при удалении строк пересчитывает одно
+    число, а не все ячейки ряда.
+    """
+    def __init__(self, num_rows, num_cols):
+        rng = random.Random(SEED)
+        self.num_cols = num_cols
+        self.cells = [rng.getrandbits(64) for _ in range(num_cols * VALUES)]
+        self.kinds = [[rng.getrandbits(64) for _ in range(8)] for _ in (CURRENT, NEXT)]
+        self.rotations = [rng.getrandbits(64) for _ in range(4)]
+        self.rows = [rng.getrandbits(64) for _ in range(num_rows + 2 * MARGIN)]
+        self.columns = [rng.getrandbits(64) for _ in range(num_cols + 2 * MARGIN)]
+        self.bag = [rng.getrandbits(64) for _ in range(8)]
+        self.multipliers = [rng.getrandbits(64) | 1 for _ in range(num_rows)]
+
+    def cell(self, column, value):
+        """
+        Ключ ячейки с заданным цветом внутри ряда.
+
+        :param column: The column index of the cell.
+        :type column: int
+        :param value: The block id stored in the cell.
+        :type value: int
+        :returns: The 64-bit key, 0 for an empty cell.
+        :rtype: int
+        """
+        if not value:
+            return 0
+        return self.cells[column * VALUES + value]
+
+    def row(self, row, content):
+        """
+        Вклад ряда в хеш сетки.
+
+        :param row: The row index.
+        :type row: int
+        :param content: XOR of the :meth:`cell` keys of the row.
+        :type content: int
+        :returns: The 64-bit key, 0 for an empty row.
+        :rtype: int
+        """
+        return content * self.multipliers[row] & MASK
+
+    def block(self, block, slot):
+        """
+        Ключ блока: вид, а для текущего блока еще поворот и смещения.
+
+        :param block: The block to hash.
+        :type block: Block
+        :param slot: ``CURRENT`` or ``NEXT``.
+        :type slot: int
+        :returns: The 64-bit key.
+        :rtype: int
+        """
+        key = self.kinds[slot][block.id]
+        if slot == CURRENT:
+            key ^= (self.rotations[block.rotation_state] ^ self.rows[block.row_offset + MARGIN] ^
+                    self.columns[block.column_offset + MARGIN])
+        return key
+
+
+def table_for(num_rows, num_cols):
+    """
+    Общая таблица ключей для сетки заданного размера.
+
+    :param num_rows: The number of rows of the board.
+    :type num_rows: int
+    :param num_cols: The number of columns of the board.
+    :type num_cols: int
+    :returns: The cached table for these dimensions.
+    :rtype: ZobristTable
+    """
+    table = _tables.get((num_rows, num_cols))
+    if table is None:
+        table = _tables[(num_rows, num_cols)] = ZobristTable(num_rows, num_cols)
+    return table